@@ -1,45 +1,99 @@
-from flask import Flask, request, jsonify, send_file, send_from_directory
+from flask import Blueprint, Flask, Response, g, request, jsonify, send_file, send_from_directory, stream_with_context
 from flask_cors import CORS
+from werkzeug.security import safe_join
 import os
 from datetime import datetime
 from dictation import generate_sentences, save_dictation
-from tts_generator import generate_dictation_audio
-from ocr_processor import extract_text_from_image
-from evaluator import evaluate_dictation
-from PIL import Image
+from tts_generator import (
+    PARTIAL_STALE_SECONDS, PARTIAL_SUFFIX, cleanup_stale_markers, generate_dictation_audio,
+    generate_dictation_audio_progressive, is_audio_in_progress, synthesize_sentences
+)
+from tts_backends import DEFAULT_BACKEND, available_backends
+from clip_cache import get_clip_cache
+import gemini_gateway
+import metrics
+import registry
+from gemini_retry import retry_metrics
+from ocr_processor import extract_text_from_pages
+from ocr_cache import get_ocr_cache
+from evaluator import evaluate_dictation, evaluate_dictation_stream
+from jobs import JobQueue, public_job_view
+from evaluation_store import EvaluationStore, DEFAULT_PAGE_SIZE
+from dictation_pool import DictationPool, DEFAULT_BUCKETS, DEFAULT_POOL_SIZE, parse_buckets
+from image_preprocess import prepare_upload
 import io
+import json
+import logging
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
 
 # Konfigurace Flask pro servírování frontendu
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 FRONTEND_DIR = os.path.join(os.path.dirname(BASE_DIR), 'frontend')
 
-app = Flask(__name__, static_folder=FRONTEND_DIR, static_url_path='')
-CORS(app)
+# Všechny routy jsou v blueprintu, aplikaci sestavuje create_app()
+bp = Blueprint('diktator', __name__)
 
 # Konfigurace cest
-DATA_DIR = os.path.join(os.path.dirname(BASE_DIR), 'data')
+DATA_DIR = os.getenv('DATA_DIR') or os.path.join(os.path.dirname(BASE_DIR), 'data')
 DICTATIONS_DIR = os.path.join(DATA_DIR, 'dictations')
 AUDIO_DIR = os.path.join(DATA_DIR, 'audio')
 UPLOADS_DIR = os.path.join(DATA_DIR, 'uploads')
 EVALUATIONS_DIR = os.path.join(DATA_DIR, 'evaluations')
+JOBS_DIR = os.path.join(DATA_DIR, 'jobs')
 
 # Ujistíme se, že adresáře existují
-for directory in [DICTATIONS_DIR, AUDIO_DIR, UPLOADS_DIR, EVALUATIONS_DIR]:
+for directory in [DICTATIONS_DIR, AUDIO_DIR, UPLOADS_DIR, EVALUATIONS_DIR, JOBS_DIR]:
     os.makedirs(directory, exist_ok=True)
 
-@app.route('/')
+# Fronta pro asynchronní úlohy (audio, vyhodnocení)
+job_queue = JobQueue(JOBS_DIR, max_workers=int(os.getenv('JOB_WORKERS', 2)))
+
+# Vyhodnocení (JSON soubory + SQLite index pro /api/evaluations)
+evaluation_store = EvaluationStore(EVALUATIONS_DIR, AUDIO_DIR)
+EVALUATION_ID_PATTERN = re.compile(r'^evaluation_[\w-]+$')
+REQUEST_ID_PATTERN = re.compile(r'^[\w.-]{1,64}$')
+
+# Audio a fotky se po zapsání nemění - klient je smí cachovat natrvalo (v sekundách)
+ARTIFACT_CACHE_MAX_AGE = int(os.getenv('ARTIFACT_CACHE_MAX_AGE', 365 * 24 * 3600))
+# Prefix interní location v nginx pro X-Accel-Redirect (prázdné = soubory posílá Flask)
+ARTIFACT_ACCEL_REDIRECT_PREFIX = os.getenv('ARTIFACT_ACCEL_REDIRECT_PREFIX', '').rstrip('/')
+
+# Max. počet stránek (fotek) jednoho diktátu v /api/evaluate
+MAX_EVALUATION_PAGES = int(os.getenv('EVALUATE_MAX_PAGES', 4))
+
+# Zápis nahraných fotek na disk mimo kritickou cestu synchronního /api/evaluate
+upload_writer = ThreadPoolExecutor(max_workers=2, thread_name_prefix='upload-writer')
+
+# Zásobník předem vygenerovaných diktátů pro okamžité /api/generate
+dictation_pool = DictationPool(
+    os.path.join(DICTATIONS_DIR, 'pool'),
+    generate=generate_sentences,
+    target_size=int(os.getenv('DICTATION_POOL_SIZE', DEFAULT_POOL_SIZE)),
+    buckets=parse_buckets(os.getenv('DICTATION_POOL_BUCKETS', DEFAULT_BUCKETS)),
+    # Předem syntetizované klipy (výchozí slow/speed_factor z frontendu) skončí v cache klipů
+    prerender=synthesize_sentences if os.getenv('DICTATION_POOL_PRERENDER_AUDIO', '1') == '1' else None
+)
+
+@bp.route('/')
 def index():
     """Hlavní stránka - vrátí index.html"""
     return send_from_directory(FRONTEND_DIR, 'index.html')
 
-@app.route('/predesle')
+@bp.route('/predesle')
 def predesle():
     """Skrytá stránka pro zobrazení předešlých diktátů"""
     return send_from_directory(FRONTEND_DIR, 'predesle.html')
 
-@app.route('/api/health', methods=['GET'])
+@bp.route('/api/health', methods=['GET'])
 def health_check():
     """Základní health check endpoint"""
+    cache = get_clip_cache()
+    ocr_cache = get_ocr_cache()
     return jsonify({
         'status': 'ok',
         'timestamp': datetime.now().isoformat(),
@@ -47,10 +101,41 @@ def health_check():
             'dictations': os.path.exists(DICTATIONS_DIR),
             'audio': os.path.exists(AUDIO_DIR),
             'uploads': os.path.exists(UPLOADS_DIR)
-        }
+        },
+        'tts_cache': cache.stats() if cache else None,
+        'ocr_cache': ocr_cache.stats() if ocr_cache else None,
+        'dictation_pool': dictation_pool.stats() if dictation_pool.enabled else None,
+        'gemini': gemini_gateway.stats(),
+        'gemini_retry': retry_metrics(),
+        'tts_backends': {'default': DEFAULT_BACKEND, 'available': available_backends()},
+        'lazy': registry.stats()
     })
 
-@app.route('/api/generate', methods=['POST'])
+@bp.route('/api/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Metriky fází pipeline a HTTP požadavků ve formátu Prometheus"""
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+@bp.before_app_request
+def _start_request_trace():
+    """Trace id požadavku (z X-Request-ID od proxy, jinak nové) a začátek měření"""
+    request_id = request.headers.get('X-Request-ID', '')
+    g.trace_id = metrics.set_trace_id(request_id if REQUEST_ID_PATTERN.match(request_id) else None)
+    g.request_started = time.perf_counter()
+
+@bp.after_app_request
+def _finish_request_trace(response):
+    """Doba a počet požadavků podle endpointu, trace id v hlavičce odpovědi"""
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    if 'request_started' in g:
+        metrics.registry.observe('diktator_http_request_duration_seconds',
+                                 time.perf_counter() - g.request_started, endpoint=endpoint)
+    metrics.registry.inc('diktator_http_requests_total', endpoint=endpoint,
+                         method=request.method, status=response.status_code)
+    response.headers['X-Request-ID'] = g.get('trace_id', '-')
+    return response
+
+@bp.route('/api/generate', methods=['POST'])
 def generate_dictation():
     """Generuje věty pro diktát pomocí LLM"""
     data = request.get_json()
@@ -61,8 +146,11 @@ def generate_dictation():
     if not isinstance(grade, int) or grade < 1 or grade > 9:
         return jsonify({'error': 'Grade must be between 1 and 9'}), 400
     
-    # Generování vět
-    result = generate_sentences(grade, num_sentences)
+    # Hotový diktát ze zásobníku, jinak generování vět přes LLM
+    result = dictation_pool.pop(grade, num_sentences)
+    if result is None:
+        result = generate_sentences(grade, num_sentences)
+    dictation_pool.request_refill()
     
     if 'error' in result:
         return jsonify({'error': result['error']}), 500
@@ -73,43 +161,82 @@ def generate_dictation():
     
     return jsonify(result)
 
-@app.route('/api/dictate', methods=['POST'])
+@bp.route('/api/dictate', methods=['POST'])
 def create_audio():
-    """Vytvoří audio soubor z textu pomocí Google TTS"""
+    """Vytvoří audio soubor z textu (TTS backend podle nasazení nebo pole tts_backend)"""
     data = request.get_json()
     sentences = data.get('sentences', [])
     pause_duration = data.get('pause_duration', 5.0)
     slow = data.get('slow', False)
+    stream = data.get('stream', False)
+    speed_factor = data.get('speed_factor', 0.9)
+    tts_backend = data.get('tts_backend') or DEFAULT_BACKEND
     
     # Validace
     if not sentences or not isinstance(sentences, list):
         return jsonify({'error': 'Sentences array is required'}), 400
+    if not isinstance(speed_factor, (int, float)) or speed_factor < 0.5 or speed_factor > 1.5:
+        return jsonify({'error': 'Speed factor must be between 0.5 and 1.5'}), 400
+    backends = available_backends()
+    if tts_backend not in backends:
+        return jsonify({'error': f"Unknown TTS backend: {tts_backend}"}), 400
+    if not backends[tts_backend]:
+        return jsonify({'error': f"TTS backend is not available: {tts_backend}"}), 400
     
     try:
         # Generování názvu souboru
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"dictation_{timestamp}.mp3"
-        output_path = os.path.join(AUDIO_DIR, filename)
-        
-        # Generování audio
-        generate_dictation_audio(
-            sentences=sentences,
-            output_path=output_path,
-            pause_duration=pause_duration,
-            slow=slow
-        )
+        filename = f"dictation_{timestamp}_{uuid.uuid4().hex[:8]}.mp3"
         
-        return jsonify({
-            'status': 'success',
+        params = {
+            'sentences': sentences,
             'filename': filename,
-            'audio_url': f'/api/audio/{filename}',
-            'file_size': os.path.getsize(output_path)
-        })
+            'pause_duration': pause_duration,
+            'slow': slow,
+            'speed_factor': speed_factor,
+            'tts_backend': tts_backend
+        }
+        
+        # Asynchronní režim - vrátíme hned ID úlohy, stav je na /api/jobs/<id>
+        if data.get('async', False):
+            job = job_queue.submit('dictate', params)
+            return _job_accepted(job)
+        
+        # Ve stream režimu se vrátíme hned po zakódování první části,
+        # zbytek se připojuje na pozadí a /api/audio ho průběžně streamuje
+        result = _run_dictate(params, progressive=bool(stream))
+        result['status'] = 'success'
+        return jsonify(result)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/upload', methods=['POST'])
+def _run_dictate(params, progress=None, progressive=False):
+    """Vygeneruje audio diktátu (sdíleno synchronním endpointem a frontou úloh)"""
+    output_path = os.path.join(AUDIO_DIR, params['filename'])
+    
+    if progress:
+        progress(0.1, 'tts')
+    
+    # Generování audio
+    generate = generate_dictation_audio_progressive if progressive else generate_dictation_audio
+    generate(
+        sentences=params['sentences'],
+        output_path=output_path,
+        pause_duration=params['pause_duration'],
+        slow=params['slow'],
+        speed_factor=params['speed_factor'],
+        backend=params.get('tts_backend')
+    )
+    
+    return {
+        'filename': params['filename'],
+        'audio_url': f"/api/audio/{params['filename']}",
+        'file_size': os.path.getsize(output_path),
+        'streaming': progressive
+    }
+
+@bp.route('/api/upload', methods=['POST'])
 def upload_image():
     """Nahraje fotku diktátu"""
     if 'image' not in request.files:
@@ -122,14 +249,11 @@ def upload_image():
     try:
         # Uložení souboru
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"upload_{timestamp}.jpg"
+        filename = f"upload_{timestamp}_{uuid.uuid4().hex[:8]}.jpg"
         filepath = os.path.join(UPLOADS_DIR, filename)
         
-        # Uložení a případná konverze na JPEG
-        img = Image.open(file.stream)
-        if img.mode in ('RGBA', 'LA', 'P'):
-            img = img.convert('RGB')
-        img.save(filepath, 'JPEG', quality=95)
+        # Předzpracování (EXIF otočení, zmenšení, kontrast) a uložení jako JPEG
+        _write_upload(filepath, prepare_upload(file.stream))
         
         return jsonify({
             'status': 'success',
@@ -140,126 +264,446 @@ def upload_image():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/evaluate', methods=['POST'])
+@bp.route('/api/evaluate', methods=['POST'])
 def evaluate_dictation_endpoint():
-    """Vyhodnotí diktát pomocí OCR a LLM"""
-    if 'image' not in request.files:
-        return jsonify({'error': 'No image file provided'}), 400
-    
-    original_text = request.form.get('original_text', '')
-    if not original_text:
-        return jsonify({'error': 'Original text is required'}), 400
-    
-    # Získání názvu audio souboru (pokud je dostupný)
-    audio_filename = request.form.get('audio_filename', '')
+    """Vyhodnotí diktát pomocí OCR a LLM (jedna nebo více stránek v polích 'image')"""
+    files = [file for file in request.files.getlist('image') if file.filename]
+    error = _validate_evaluation_request(files)
+    if error:
+        return jsonify({'error': error}), 400
     
     try:
-        # Uložení obrázku
-        file = request.files['image']
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"evaluation_{timestamp}.jpg"
-        filepath = os.path.join(UPLOADS_DIR, filename)
-        
-        # Uložení a konverze
-        img = Image.open(file.stream)
-        if img.mode in ('RGBA', 'LA', 'P'):
-            img = img.convert('RGB')
-        img.save(filepath, 'JPEG', quality=95)
-        
-        # OCR - extrakce textu z obrázku
-        ocr_result = extract_text_from_image(filepath)
-        
-        if 'error' in ocr_result:
-            return jsonify({'error': f"OCR failed: {ocr_result['error']}"}), 500
-        
-        written_text = ocr_result['extracted_text']
-        
-        # Vyhodnocení diktátu
-        evaluation = evaluate_dictation(original_text, written_text)
+        params, pages, filepaths = _prepare_evaluation(files)
         
-        if 'error' in evaluation:
-            return jsonify({'error': f"Evaluation failed: {evaluation['error']}"}), 500
+        # Asynchronní režim - obrázky musí být na disku dřív, než úloha vznikne
+        # (úloha přežije i restart a čte obrázky ze souborů)
+        if request.form.get('async', '').lower() in ('1', 'true'):
+            for filepath, image_bytes in zip(filepaths, pages):
+                _write_upload(filepath, image_bytes)
+            job = job_queue.submit('evaluate', params)
+            return _job_accepted(job)
         
-        # Přidání informací o souboru
-        evaluation['image_filename'] = filename
-        evaluation['ocr_text'] = written_text
-        
-        # Přidat audio filename pokud byl poskytnut
-        if audio_filename:
-            evaluation['audio_file'] = audio_filename
-        
-        # Uložení vyhodnocení do souboru
-        import json
-        eval_filename = f"evaluation_{timestamp}.json"
-        eval_filepath = os.path.join(EVALUATIONS_DIR, eval_filename)
-        with open(eval_filepath, 'w', encoding='utf-8') as f:
-            json.dump(evaluation, f, ensure_ascii=False, indent=2)
-        
-        evaluation['evaluation_saved_as'] = eval_filename
+        # Synchronní režim - OCR dostane buffery přímo, zápis na disk běží souběžně
+        persisted = _persist_pages(filepaths, pages)
+        evaluation = _run_evaluation(params, pages=pages, persisted=persisted)
         return jsonify(evaluation)
         
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Evaluation failed: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/evaluate/stream', methods=['POST'])
+def evaluate_dictation_stream_endpoint():
+    """Vyhodnotí diktát jako /api/evaluate, průběh posílá jako server-sent events
+
+    Události (data jsou JSON):
+        accepted - fotky přijaty a předzpracovány ({image_filenames})
+        ocr - text přečtený z fotky, hned po OCR ({ocr_text})
+        partial - dosud rozparsovaná část strukturovaného vyhodnocení ({structured}),
+            posílá se ve výchozím strukturovaném režimu (EVAL_STRUCTURED)
+        delta - další část textu vyhodnocení, jak ho Gemini generuje ({text}),
+            jen při EVAL_STRUCTURED=0
+        result - uložené vyhodnocení se skóre (stejné jako odpověď /api/evaluate)
+        error - chyba, stream končí ({error})
+    """
+    files = [file for file in request.files.getlist('image') if file.filename]
+    error = _validate_evaluation_request(files)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    try:
+        params, pages, filepaths = _prepare_evaluation(files)
+    except Exception as e:
+        logger.exception(f"Evaluation upload failed: {e}")
         return jsonify({'error': str(e)}), 500
+    persisted = _persist_pages(filepaths, pages)
+    trace_id = metrics.get_trace_id()
+    
+    def events():
+        # Generátor běží až při odesílání odpovědi - trace id nastavíme znovu
+        metrics.set_trace_id(trace_id)
+        yield _sse('accepted', {'image_filenames': params['image_filenames']})
+        try:
+            for event, data in _run_evaluation_stream(params, pages, persisted):
+                yield _sse(event, data)
+        except Exception as e:
+            logger.exception(f"Evaluation stream failed: {e}")
+            yield _sse('error', {'error': str(e)})
+    
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        # X-Accel-Buffering: nginx nesmí odpověď bufferovat, jinak by události přišly až na konci
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def _sse(event, data):
+    """Jedna událost server-sent events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _validate_evaluation_request(files):
+    """Chyba ve vstupu vyhodnocení (None = vstup je v pořádku)"""
+    if not files:
+        return 'No image file provided'
+    if len(files) > MAX_EVALUATION_PAGES:
+        return f'Too many pages (max {MAX_EVALUATION_PAGES})'
+    if not request.form.get('original_text', ''):
+        return 'Original text is required'
+    return None
+
+def _prepare_evaluation(files):
+    """Předzpracuje stránky a sestaví parametry vyhodnocení z formuláře
+
+    Returns:
+        tuple: (params, stránky jako JPEG v paměti, cesty stránek v UPLOADS_DIR)
+    """
+    # Id vyhodnocení: čas + náhodná přípona (víc vyhodnocení ve stejné sekundě, více workerů)
+    evaluation_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+    # Názvy stránek: první evaluation_<id>.jpg, další s _p2, _p3, ...
+    filenames = [
+        f"evaluation_{evaluation_id}.jpg" if page == 1 else f"evaluation_{evaluation_id}_p{page}.jpg"
+        for page in range(1, len(files) + 1)
+    ]
+    filepaths = [os.path.join(UPLOADS_DIR, filename) for filename in filenames]
+    
+    # Předzpracování (EXIF otočení, zmenšení, kontrast) - JPEG zůstává v paměti
+    pages = [prepare_upload(file.stream) for file in files]
+    
+    params = {
+        'image_filename': filenames[0],
+        'image_filenames': filenames,
+        'original_text': request.form.get('original_text', ''),
+        # Název audio souboru a ročník (pokud jsou dostupné)
+        'audio_filename': request.form.get('audio_filename', ''),
+        'grade': request.form.get('grade', type=int),
+        'evaluation_id': evaluation_id,
+        # ocr_refresh=1 obejde OCR cache (vynucené nové přečtení fotky)
+        'ocr_refresh': request.form.get('ocr_refresh', '').lower() in ('1', 'true')
+    }
+    return params, pages, filepaths
+
+def _persist_pages(filepaths, pages):
+    """Zapíše stránky na disk na pozadí, vrátí futures zápisu"""
+    return [
+        upload_writer.submit(_write_upload, filepath, image_bytes)
+        for filepath, image_bytes in zip(filepaths, pages)
+    ]
+
+def _write_upload(filepath, image_bytes):
+    """Atomicky zapíše fotku do UPLOADS_DIR (/api/uploads nevrátí poloviční soubor)"""
+    tmp_path = f"{filepath}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(image_bytes)
+    os.replace(tmp_path, filepath)
 
-@app.route('/api/evaluations', methods=['GET'])
+def _run_evaluation(params, progress=None, pages=None, persisted=None):
+    """OCR + vyhodnocení + uložení výsledku (sdíleno synchronním endpointem a frontou úloh)
+
+    pages: stránky v paměti (jinak se čtou z UPLOADS_DIR)
+    persisted: futures zápisu stránek na disk, na které se počká před uložením výsledku
+    """
+    if progress:
+        progress(0.1, 'ocr')
+    written_text = _read_pages(params, pages)
+    
+    # Vyhodnocení diktátu
+    if progress:
+        progress(0.5, 'evaluation')
+    evaluation = evaluate_dictation(params['original_text'], written_text)
+    
+    return _save_evaluation(params, evaluation, written_text, persisted)
+
+def _run_evaluation_stream(params, pages, persisted):
+    """Jako _run_evaluation, ale průběh vrací jako události (event, data) pro /api/evaluate/stream"""
+    written_text = _read_pages(params, pages)
+    yield 'ocr', {'ocr_text': written_text}
+    
+    evaluation = None
+    for kind, payload in evaluate_dictation_stream(params['original_text'], written_text):
+        if kind == 'delta':
+            yield 'delta', {'text': payload}
+        elif kind == 'partial':
+            yield 'partial', {'structured': payload}
+        else:
+            evaluation = payload
+    
+    yield 'result', _save_evaluation(params, evaluation, written_text, persisted)
+
+def _read_pages(params, pages=None):
+    """OCR všech stránek (souběžně), vrátí text spojený v pořadí stránek"""
+    # Starší úlohy ve frontě mají jen image_filename
+    filenames = params.get('image_filenames') or [params['image_filename']]
+    use_cache = not params.get('ocr_refresh')
+    
+    if pages is None:
+        pages = []
+        for filename in filenames:
+            with open(os.path.join(UPLOADS_DIR, filename), 'rb') as f:
+                pages.append(f.read())
+    
+    ocr_result = extract_text_from_pages([(page, 'image/jpeg') for page in pages], use_cache=use_cache)
+    
+    if 'error' in ocr_result:
+        raise RuntimeError(f"OCR failed: {ocr_result['error']}")
+    
+    return ocr_result['extracted_text']
+
+def _save_evaluation(params, evaluation, written_text, persisted=None):
+    """Doplní k vyhodnocení fotky, OCR text, audio a ročník a uloží ho"""
+    if 'error' in evaluation:
+        raise RuntimeError(f"Evaluation failed: {evaluation['error']}")
+    
+    # Přidání informací o souboru
+    filenames = params.get('image_filenames') or [params['image_filename']]
+    evaluation['image_filename'] = filenames[0]
+    if len(filenames) > 1:
+        evaluation['image_filenames'] = filenames
+    evaluation['ocr_text'] = written_text
+    
+    # Přidat audio filename pokud byl poskytnut
+    if params.get('audio_filename'):
+        evaluation['audio_file'] = params['audio_filename']
+    if params.get('grade'):
+        evaluation['grade'] = params['grade']
+    
+    # Fotky musí být na disku dřív, než na ně začne odkazovat uložené vyhodnocení
+    for future in persisted or []:
+        future.result()
+    
+    # Uložení vyhodnocení do souboru a do indexu
+    # Starší úlohy ve frontě mají místo evaluation_id jen timestamp
+    eval_filename = f"evaluation_{params.get('evaluation_id') or params['timestamp']}.json"
+    with metrics.timer('evaluation_save'):
+        evaluation_store.save(evaluation, eval_filename)
+    
+    evaluation['evaluation_saved_as'] = eval_filename
+    return evaluation
+
+def _job_accepted(job):
+    """Odpověď pro přijatou asynchronní úlohu"""
+    return jsonify({
+        'status': job['status'],
+        'job_id': job['id'],
+        'job_url': f"/api/jobs/{job['id']}"
+    }), 202
+
+@bp.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Vrátí stav a výsledek asynchronní úlohy"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(public_job_view(job))
+
+@bp.route('/api/evaluations', methods=['GET'])
 def get_evaluations():
-    """Vrátí seznam všech vyhodnocení"""
-    import json
-    import glob
+    """
+    Vrátí stránku vyhodnocení (nejnovější první).
+    
+    Query parametry: limit, cursor (next_cursor z předchozí stránky),
+    grade, date_from, date_to (YYYY-MM-DD), min_score, max_score.
+    """
+    try:
+        rows, next_cursor = _list_evaluations_page()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     try:
-        # Najdi všechny evaluation soubory
-        eval_files = glob.glob(os.path.join(EVALUATIONS_DIR, 'evaluation_*.json'))
-        
         evaluations = []
-        for eval_file in sorted(eval_files, reverse=True):  # Nejnovější první
-            try:
-                with open(eval_file, 'r', encoding='utf-8') as f:
-                    evaluation = json.load(f)
-                    
-                    # Přidej název souboru pro reference
-                    evaluation['filename'] = os.path.basename(eval_file)
-                    
-                    # Pokud audio_file není v JSON (staré evaluations), zkus najít podle timestampu
-                    if 'audio_file' not in evaluation:
-                        timestamp = os.path.basename(eval_file).replace('evaluation_', '').replace('.json', '')
-                        audio_file = os.path.join(AUDIO_DIR, f'dictation_{timestamp}.mp3')
-                        if os.path.exists(audio_file):
-                            evaluation['audio_file'] = os.path.basename(audio_file)
-                    
-                    evaluations.append(evaluation)
-            except Exception as e:
-                print(f"Error loading evaluation {eval_file}: {e}")
+        for row in rows:
+            evaluation = evaluation_store.load(row['filename'])
+            if evaluation is None:
+                logger.error(f"Error loading evaluation {row['filename']}: file not found")
                 continue
+            
+            # Přidej název souboru pro reference
+            evaluation['filename'] = row['filename']
+            # Audio starých vyhodnocení se dohledalo při importu do indexu
+            if row['audio_file'] and 'audio_file' not in evaluation:
+                evaluation['audio_file'] = row['audio_file']
+            
+            evaluations.append(evaluation)
         
         return jsonify({
             'status': 'success',
             'count': len(evaluations),
-            'evaluations': evaluations
+            'evaluations': evaluations,
+            'next_cursor': next_cursor
         })
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/audio/<filename>', methods=['GET'])
+@bp.route('/api/evaluations/summary', methods=['GET'])
+def get_evaluations_summary():
+    """
+    Vrátí stránku souhrnů vyhodnocení (jen id, čas, skóre, ročník a soubory).
+    
+    Data jsou přímo z indexu, JSON soubory se vůbec neotevírají.
+    Parametry stránkování a filtrů jsou stejné jako u /api/evaluations.
+    """
+    try:
+        rows, next_cursor = _list_evaluations_page()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    summaries = [{
+        'id': row['filename'][:-len('.json')],
+        'timestamp': row['timestamp'],
+        'score': row['score'],
+        'grade': row['grade'],
+        'audio_file': row['audio_file'],
+        'image_filename': row['image_filename']
+    } for row in rows]
+    
+    return jsonify({
+        'status': 'success',
+        'count': len(summaries),
+        'evaluations': summaries,
+        'next_cursor': next_cursor
+    })
+
+@bp.route('/api/evaluations/<evaluation_id>', methods=['GET'])
+def get_evaluation_detail(evaluation_id):
+    """Vrátí jedno kompletní vyhodnocení podle id (název souboru bez .json)"""
+    if not EVALUATION_ID_PATTERN.match(evaluation_id):
+        return jsonify({'error': 'Evaluation not found'}), 404
+    
+    eval_filename = f"{evaluation_id}.json"
+    evaluation = evaluation_store.load(eval_filename)
+    if evaluation is None:
+        return jsonify({'error': 'Evaluation not found'}), 404
+    
+    evaluation['filename'] = eval_filename
+    if 'audio_file' not in evaluation:
+        row = evaluation_store.get_summary(eval_filename)
+        if row and row['audio_file']:
+            evaluation['audio_file'] = row['audio_file']
+    
+    return jsonify(evaluation)
+
+def _list_evaluations_page():
+    """Stránka z indexu vyhodnocení podle query parametrů requestu"""
+    return evaluation_store.list_page(
+        limit=request.args.get('limit', DEFAULT_PAGE_SIZE, type=int),
+        cursor=request.args.get('cursor'),
+        grade=request.args.get('grade', type=int),
+        date_from=request.args.get('date_from'),
+        date_to=request.args.get('date_to'),
+        min_score=request.args.get('min_score', type=float),
+        max_score=request.args.get('max_score', type=float)
+    )
+
+@bp.route('/api/audio/<filename>', methods=['GET'])
 def get_audio(filename):
     """Stáhne audio soubor"""
-    file_path = os.path.join(AUDIO_DIR, filename)
-    if os.path.exists(file_path):
-        return send_file(file_path, mimetype='audio/mpeg')
+    file_path = safe_join(AUDIO_DIR, filename)
+    if file_path and os.path.isfile(file_path):
+        if is_audio_in_progress(file_path):
+            # Soubor se ještě generuje - streamujeme bez cache a bez Range
+            response = Response(_stream_growing_file(file_path), mimetype='audio/mpeg')
+            response.headers['Cache-Control'] = 'no-store'
+            return response
+        return _send_artifact(file_path, 'audio', filename, 'audio/mpeg')
     return jsonify({'error': 'File not found'}), 404
 
-@app.route('/api/uploads/<filename>', methods=['GET'])
+def _send_artifact(file_path, kind, filename, mimetype):
+    """
+    Pošle hotový soubor (audio, fotka), který se po zapsání už nemění.
+    
+    Silný ETag z velikosti a mtime (soubory se zapisují atomicky, přepis
+    změní mtime), Cache-Control immutable, If-None-Match -> 304 a Range ->
+    206 řeší werkzeug (conditional=True). Za reverse proxy může soubor
+    poslat přímo proxy přes X-Accel-Redirect (ARTIFACT_ACCEL_REDIRECT_PREFIX).
+    """
+    if ARTIFACT_ACCEL_REDIRECT_PREFIX:
+        # Nginx: location /_protected/ { internal; alias /app/data/; } - ETag, Range a sendfile řeší proxy
+        response = Response(mimetype=mimetype)
+        response.headers['X-Accel-Redirect'] = f"{ARTIFACT_ACCEL_REDIRECT_PREFIX}/{kind}/{filename}"
+    else:
+        stat = os.stat(file_path)
+        etag = f"{stat.st_size:x}-{stat.st_mtime_ns:x}"
+        response = send_file(file_path, mimetype=mimetype, conditional=True, etag=etag,
+                             max_age=ARTIFACT_CACHE_MAX_AGE)
+    
+    response.cache_control.public = True
+    response.cache_control.max_age = ARTIFACT_CACHE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+def _stream_growing_file(file_path, chunk_size=64 * 1024, poll_interval=0.25):
+    """Streamuje soubor, který se ještě generuje, dokud generování neskončí
+
+    Skončí i tehdy, když soubor ani značka .partial PARTIAL_STALE_SECONDS
+    nepokročily (generování zaniklo s workerem a značka zůstala viset).
+    """
+    marker_path = file_path + PARTIAL_SUFFIX
+    last_marker_mtime = None
+    last_progress = time.monotonic()
+    with open(file_path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if chunk:
+                last_progress = time.monotonic()
+                yield chunk
+                continue
+            try:
+                marker_mtime = os.path.getmtime(marker_path)
+            except FileNotFoundError:
+                # Dočteme to, co se zapsalo těsně před koncem generování
+                rest = f.read()
+                if rest:
+                    yield rest
+                break
+            if marker_mtime != last_marker_mtime:
+                last_marker_mtime = marker_mtime
+                last_progress = time.monotonic()
+            elif time.monotonic() - last_progress > PARTIAL_STALE_SECONDS:
+                logger.warning(f"Stopped streaming stale {file_path}")
+                break
+            time.sleep(poll_interval)
+
+@bp.route('/api/uploads/<filename>', methods=['GET'])
 def get_upload(filename):
     """Stáhne nahraný obrázek"""
-    file_path = os.path.join(UPLOADS_DIR, filename)
-    if os.path.exists(file_path):
-        return send_file(file_path, mimetype='image/jpeg')
+    file_path = safe_join(UPLOADS_DIR, filename)
+    if file_path and os.path.isfile(file_path):
+        return _send_artifact(file_path, 'uploads', filename, 'image/jpeg')
     return jsonify({'error': 'File not found'}), 404
 
+def create_app():
+    """
+    Vytvoří Flask aplikaci (app factory).
+    
+    Používá ji vývojový server (python app.py) i produkční WSGI server
+    (gunicorn -c gunicorn_conf.py, viz wsgi_app = 'app:create_app()').
+    """
+    app = Flask(__name__, static_folder=FRONTEND_DIR, static_url_path='')
+    CORS(app)
+    
+    # Každý záznam logu nese trace id požadavku
+    metrics.configure_logging()
+    app.register_blueprint(bp)
+    
+    # Asynchronní úlohy - handlery a obnovení nedokončených úloh po restartu
+    job_queue.register('dictate', _run_dictate)
+    job_queue.register('evaluate', _run_evaluation)
+    job_queue.resume()
+    
+    # Značky .partial po generováních, která skončila s předchozím workerem
+    stale_markers = cleanup_stale_markers(AUDIO_DIR)
+    if stale_markers:
+        logger.info(f"Removed {stale_markers} stale audio marker(s)")
+    
+    # Jednorázový import starých evaluation_*.json do indexu
+    evaluation_store.ensure_imported()
+    
+    # Doplňování zásobníku diktátů na pozadí
+    dictation_pool.start()
+    
+    return app
+
 if __name__ == '__main__':
     print("Starting diktátOR Flask server...")
     print(f"Data directory: {DATA_DIR}")
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    create_app().run(host='0.0.0.0', port=5000, debug=True)
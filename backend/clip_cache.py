@@ -0,0 +1,177 @@
+"""
+Modul pro perzistentní cache TTS klipů
+
+Klíčem je hash z (text, lang, slow, speed_factor), hodnotou je už dekódované
+a zpomalené PCM audio uložené jako WAV. Při zásahu cache se tedy nevolá
+gTTS ani ffmpeg. Velikost cache je omezená, při překročení se mažou
+nejdéle nepoužité klipy (LRU podle mtime souboru).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import wave
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pydub import AudioSegment
+
+# Výchozí nastavení
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.getenv('DATA_DIR') or os.path.join(os.path.dirname(BASE_DIR), 'data')
+DEFAULT_CACHE_DIR = os.path.join(DATA_DIR, 'tts_cache')
+DEFAULT_MAX_MB = 500
+
+
+class ClipCache:
+    """
+    On-disk LRU cache dekódovaných TTS klipů s počítadly zásahů.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._total_bytes = None  # Spočítá se líně při prvním zápisu
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(text: str, lang: str, slow: bool, speed_factor: float, backend: str = 'gtts') -> str:
+        """
+        Vytvoří klíč cache z parametrů syntézy.
+        
+        Backend gtts se do klíče nezapočítává, aby zůstaly platné klipy
+        uložené před zavedením dalších backendů.
+        """
+        params = [text, lang, bool(slow), round(float(speed_factor), 4)]
+        if backend != 'gtts':
+            params.append(backend)
+        payload = json.dumps(params, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.wav")
+
+    def get(self, key: str):
+        """
+        Vrátí AudioSegment z cache, nebo None při minutí.
+        """
+        from pydub import AudioSegment
+
+        path = self._path(key)
+        try:
+            with wave.open(path, 'rb') as wav:
+                segment = AudioSegment(
+                    data=wav.readframes(wav.getnframes()),
+                    sample_width=wav.getsampwidth(),
+                    frame_rate=wav.getframerate(),
+                    channels=wav.getnchannels()
+                )
+            # Označíme klip jako čerstvě použitý (LRU)
+            os.utime(path, None)
+        except (FileNotFoundError, wave.Error, EOFError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return segment
+
+    def put(self, key: str, segment: AudioSegment):
+        """
+        Uloží klip do cache a případně uvolní místo.
+        """
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with wave.open(tmp_path, 'wb') as wav:
+            wav.setnchannels(segment.channels)
+            wav.setsampwidth(segment.sample_width)
+            wav.setframerate(segment.frame_rate)
+            wav.writeframes(segment.raw_data)
+        size = os.path.getsize(tmp_path)
+
+        with self._lock:
+            # Přepsání existujícího klipu - jeho velikost se už jednou započítala
+            try:
+                previous_size = os.path.getsize(path)
+            except FileNotFoundError:
+                previous_size = 0
+            # Atomické nahrazení, aby souběžné čtení nevidělo poloviční soubor
+            os.replace(tmp_path, path)
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_size()
+            else:
+                self._total_bytes += size - previous_size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _scan_size(self) -> int:
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.wav'):
+                total += entry.stat().st_size
+        return total
+
+    def _evict(self):
+        """
+        Smaže nejdéle nepoužité klipy, dokud cache nespadne pod 90 % limitu.
+        """
+        entries = [e for e in os.scandir(self.cache_dir) if e.name.endswith('.wav')]
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        target = int(self.max_bytes * 0.9)
+        total = sum(e.stat().st_size for e in entries)
+
+        for entry in entries:
+            if total <= target:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                total -= size
+                self.evictions += 1
+            except FileNotFoundError:
+                continue
+
+        self._total_bytes = total
+
+    def stats(self) -> dict:
+        """
+        Vrátí počítadla zásahů/minutí a aktuální velikost cache.
+        """
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_size()
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else None,
+                'size_bytes': self._total_bytes,
+                'max_bytes': self.max_bytes
+            }
+
+
+_clip_cache = None
+_clip_cache_lock = threading.Lock()
+
+
+def get_clip_cache():
+    """
+    Vrátí sdílenou instanci cache, nebo None pokud je cache vypnutá (TTS_CACHE_MAX_MB=0).
+    """
+    global _clip_cache
+    with _clip_cache_lock:
+        if _clip_cache is None:
+            max_mb = float(os.getenv('TTS_CACHE_MAX_MB', DEFAULT_MAX_MB))
+            if max_mb <= 0:
+                return None
+            cache_dir = os.getenv('TTS_CACHE_DIR', DEFAULT_CACHE_DIR)
+            _clip_cache = ClipCache(cache_dir, int(max_mb * 1024 * 1024))
+        return _clip_cache
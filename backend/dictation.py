@@ -1,30 +1,20 @@
 """
 Modul pro generování diktátů pomocí Google Gemini 2.5 Flash
 """
-from google import genai
 import json
 from datetime import datetime
 import os
-from dotenv import load_dotenv
-from gemini_retry import retry_with_backoff
-
-# Načtení environment variables z .env souboru
-load_dotenv()
-
-# Konfigurace Google Gemini klienta
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY not found in environment variables. Please set it in .env file.")
+import gemini_gateway
+import metrics
+from gemini_retry import with_retry
 
 GEMINI_DICTATION_MODEL = os.getenv('GEMINI_DICTATION_MODEL', 'gemini-2.5-flash')
 
-gemini_client = genai.Client(api_key=GEMINI_API_KEY)
 
-
-@retry_with_backoff(max_retries=5, initial_delay=1.0, backoff_factor=2.0, max_delay=60.0)
+@with_retry(breaker_key=GEMINI_DICTATION_MODEL)
 def _call_gemini_dictation_api(prompt: str) -> str:
     """
-    Volá Gemini API pro generování diktátu s retry/backoff logikou.
+    Volá Gemini API pro generování diktátu s retry logikou.
     
     Args:
         prompt: Prompt pro generování diktátu
@@ -32,10 +22,12 @@ def _call_gemini_dictation_api(prompt: str) -> str:
     Returns:
         str: Vygenerovaný text diktátu
     """
-    response = gemini_client.models.generate_content(
+    from google.genai import types
+
+    response = gemini_gateway.generate_content(
         model=GEMINI_DICTATION_MODEL,
         contents=prompt,
-        config=genai.types.GenerateContentConfig(
+        config=types.GenerateContentConfig(
             temperature=0.8,  # Více kreativity
             max_output_tokens=4096  # Zvýšený limit pro delší odpovědi
         )
@@ -53,6 +45,7 @@ def _call_gemini_dictation_api(prompt: str) -> str:
         raise ValueError(error_msg)
 
 
+@metrics.timed('generate_sentences')
 def generate_sentences(grade: int, num_sentences: int = 10) -> dict:
     """
     Generuje věty pro diktát podle ročníku školy.
@@ -96,7 +89,7 @@ Vrať pouze seznam vět, každou na samostatném řádku, bez číslování.
 """
 
     try:
-        # Volání Google Gemini API s retry/backoff logikou
+        # Volání Google Gemini API s retry logikou
         content = _call_gemini_dictation_api(prompt)
         
         # Rozdělení na jednotlivé věty (každá na novém řádku)
@@ -116,6 +109,7 @@ Vrať pouze seznam vět, každou na samostatném řádku, bez číslování.
         return result
         
     except Exception as e:
+        metrics.record_error('generate_sentences')
         return {
             'error': str(e),
             'grade': grade,
@@ -0,0 +1,192 @@
+"""
+Modul pro zásobník předem vygenerovaných diktátů
+
+Pro každý ročník (1-9) a každý podporovaný počet vět drží vlákno na pozadí
+připravených několik diktátů (JSON soubory v data/dictations/pool).
+/api/generate si pak diktát jen vyzvedne a požádá o doplnění zásobníku.
+Volitelně se předem syntetizují i TTS klipy vět (do cache klipů), takže
+následné /api/dictate nevolá gTTS.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # Windows - doplňování bez zámku (jeden proces)
+    fcntl = None
+
+GRADES = range(1, 10)
+# Výchozí vypnuto - doplňování volá Gemini na pozadí pro každý ročník a bucket
+DEFAULT_POOL_SIZE = 0
+DEFAULT_BUCKETS = '10'
+REFILL_ERROR_BACKOFF = 60  # Pauza po chybě generování (např. rate limit), v sekundách
+REFILL_INTERVAL = 30  # Pravidelná kontrola (diktát mohl vyzvednout jiný proces)
+
+
+class DictationPool:
+    """
+    Zásobník hotových diktátů podle (ročník, počet vět).
+    """
+
+    def __init__(
+        self,
+        pool_dir: str,
+        generate: Callable[[int, int], dict],
+        target_size: int = DEFAULT_POOL_SIZE,
+        buckets: list[int] | None = None,
+        prerender: Callable[[list[str]], None] | None = None
+    ):
+        """
+        Args:
+            pool_dir: Adresář zásobníku
+            generate: Funkce (grade, num_sentences) -> dict jako dictation.generate_sentences
+            target_size: Cílový počet diktátů pro každou kombinaci ročník/počet vět
+            buckets: Podporované počty vět
+            prerender: Volitelná funkce, která předem připraví audio pro věty
+        """
+        self.pool_dir = pool_dir
+        self.generate = generate
+        self.target_size = target_size
+        self.buckets = sorted(set(buckets or [10]))
+        self.prerender = prerender
+        self._refill_event = threading.Event()
+        self._thread = None
+        self._lock_file = None
+        os.makedirs(pool_dir, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.target_size > 0
+
+    def _bucket_dir(self, grade: int, num_sentences: int) -> str:
+        return os.path.join(self.pool_dir, f"grade{grade}_n{num_sentences}")
+
+    def _entries(self, grade: int, num_sentences: int) -> list[str]:
+        bucket_dir = self._bucket_dir(grade, num_sentences)
+        try:
+            return sorted(name for name in os.listdir(bucket_dir) if name.endswith('.json'))
+        except FileNotFoundError:
+            return []
+
+    def pop(self, grade: int, num_sentences: int):
+        """
+        Vyzvedne nejstarší připravený diktát, nebo vrátí None.
+
+        Diktát se vrací jen při přesné shodě počtu vět s některým bucketem.
+        """
+        if not self.enabled or num_sentences not in self.buckets:
+            return None
+
+        bucket_dir = self._bucket_dir(grade, num_sentences)
+        for name in self._entries(grade, num_sentences):
+            path = os.path.join(bucket_dir, name)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    dictation = json.load(f)
+                # Úspěšné smazání = diktát je náš (jiný proces ho mohl vzít dřív)
+                os.remove(path)
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue
+
+            dictation['timestamp'] = datetime.now().isoformat()
+            return dictation
+
+        return None
+
+    def stats(self) -> dict:
+        """
+        Vrátí počty připravených diktátů podle bucketu.
+        """
+        return {
+            f"grade{grade}_n{num_sentences}": len(self._entries(grade, num_sentences))
+            for grade in GRADES for num_sentences in self.buckets
+        }
+
+    def request_refill(self):
+        """
+        Probudí vlákno, které zásobník doplní.
+        """
+        self._refill_event.set()
+
+    def start(self):
+        """
+        Spustí vlákno pro doplňování zásobníku (pokud je zásobník zapnutý).
+        """
+        if not self.enabled or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._refill_loop, name='dictation-pool', daemon=True)
+        self._thread.start()
+        self.request_refill()
+
+    def _refill_loop(self):
+        while True:
+            self._refill_event.wait(timeout=REFILL_INTERVAL)
+            self._refill_event.clear()
+
+            # Při více procesech (gunicorn) doplňuje zásobník jen jeden z nich,
+            # ostatní to zkusí znovu, kdyby ten původní skončil
+            if not self._acquire_refill_lock():
+                continue
+
+            try:
+                self.refill()
+            except Exception as e:
+                logger.warning(f"Dictation pool refill failed: {e}")
+                time.sleep(REFILL_ERROR_BACKOFF)
+
+    def refill(self):
+        """
+        Doplní všechny buckety na cílovou velikost.
+        """
+        for grade in GRADES:
+            for num_sentences in self.buckets:
+                missing = self.target_size - len(self._entries(grade, num_sentences))
+                for _ in range(max(0, missing)):
+                    dictation = self.generate(grade, num_sentences)
+                    if 'error' in dictation:
+                        raise RuntimeError(dictation['error'])
+
+                    if self.prerender:
+                        try:
+                            self.prerender(dictation['sentences'])
+                        except Exception as e:
+                            # Audio se případně vygeneruje až v /api/dictate
+                            logger.warning(f"Dictation pool prerender failed: {e}")
+
+                    self._store(grade, num_sentences, dictation)
+
+    def _store(self, grade: int, num_sentences: int, dictation: dict):
+        bucket_dir = self._bucket_dir(grade, num_sentences)
+        os.makedirs(bucket_dir, exist_ok=True)
+        name = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}.json"
+        tmp_path = os.path.join(bucket_dir, f".{name}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(dictation, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, os.path.join(bucket_dir, name))
+
+    def _acquire_refill_lock(self) -> bool:
+        if fcntl is None or self._lock_file is not None:
+            return True
+        self._lock_file = open(os.path.join(self.pool_dir, '.refill.lock'), 'w')
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            self._lock_file.close()
+            self._lock_file = None
+            return False
+
+
+def parse_buckets(value: str) -> list[int]:
+    """
+    Převede '5,10,15' na [5, 10, 15].
+    """
+    return [int(part) for part in value.split(',') if part.strip()]
@@ -0,0 +1,304 @@
+"""
+Modul pro ukládání a indexování vyhodnocení diktátů
+
+Každé vyhodnocení se dál ukládá jako JSON soubor (evaluation_*.json),
+metadata (čas, skóre, ročník, odkazy na audio a fotku) se navíc zapisují
+do SQLite indexu. Seznam vyhodnocení se tak čte z indexu po stránkách
+a JSON soubory se otevírají jen pro vrácenou stránku.
+
+Jednorázový import existujících JSON souborů:
+    python evaluation_store.py import
+"""
+import base64
+import glob
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.getenv('DATA_DIR') or os.path.join(os.path.dirname(BASE_DIR), 'data')
+DEFAULT_EVALUATIONS_DIR = os.path.join(DATA_DIR, 'evaluations')
+DEFAULT_AUDIO_DIR = os.path.join(DATA_DIR, 'audio')
+INDEX_FILENAME = 'index.sqlite3'
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS evaluations (
+    filename TEXT PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    score REAL,
+    grade INTEGER,
+    audio_file TEXT,
+    image_filename TEXT,
+    indexed_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_evaluations_order ON evaluations (timestamp DESC, filename DESC);
+CREATE INDEX IF NOT EXISTS idx_evaluations_grade ON evaluations (grade, timestamp DESC);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class EvaluationStore:
+    """
+    JSON soubory vyhodnocení + SQLite index jejich metadat.
+    """
+
+    def __init__(self, evaluations_dir: str = DEFAULT_EVALUATIONS_DIR, audio_dir: str = DEFAULT_AUDIO_DIR):
+        self.evaluations_dir = evaluations_dir
+        self.audio_dir = audio_dir
+        self.db_path = os.path.join(evaluations_dir, INDEX_FILENAME)
+        self._import_lock = threading.Lock()
+        os.makedirs(evaluations_dir, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def save(self, evaluation: dict, eval_filename: str) -> str:
+        """
+        Uloží vyhodnocení do JSON souboru a zapíše ho do indexu.
+
+        Returns:
+            str: Název uloženého souboru
+        """
+        self.save_many([(evaluation, eval_filename)])
+        return eval_filename
+
+    def save_many(self, items: list[tuple[dict, str]]):
+        """
+        Uloží více vyhodnocení najednou (jedna transakce indexu).
+
+        Args:
+            items: Seznam dvojic (evaluation, eval_filename)
+        """
+        for evaluation, eval_filename in items:
+            eval_filepath = os.path.join(self.evaluations_dir, eval_filename)
+            with open(eval_filepath, 'w', encoding='utf-8') as f:
+                json.dump(evaluation, f, ensure_ascii=False, indent=2)
+
+        with self._connect() as conn:
+            for evaluation, eval_filename in items:
+                self._index_row(conn, evaluation, eval_filename)
+
+    def _index_row(self, conn, evaluation: dict, eval_filename: str):
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO evaluations
+                (filename, timestamp, score, grade, audio_file, image_filename, indexed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                eval_filename,
+                evaluation.get('timestamp') or _timestamp_from_filename(eval_filename),
+                evaluation.get('score'),
+                evaluation.get('grade'),
+                evaluation.get('audio_file'),
+                evaluation.get('image_filename'),
+                datetime.now().isoformat()
+            )
+        )
+
+    def list_page(
+        self,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: str | None = None,
+        grade: int | None = None,
+        date_from: str | None = None,
+        date_to: str | None = None,
+        min_score: float | None = None,
+        max_score: float | None = None
+    ) -> tuple[list[dict], str | None]:
+        """
+        Vrátí stránku indexových záznamů (nejnovější první).
+
+        Args:
+            limit: Velikost stránky (max. MAX_PAGE_SIZE)
+            cursor: Kurzor z předchozí stránky (next_cursor)
+            grade: Filtr podle ročníku
+            date_from: Od data včetně (YYYY-MM-DD)
+            date_to: Do data včetně (YYYY-MM-DD)
+            min_score: Minimální skóre
+            max_score: Maximální skóre
+
+        Returns:
+            tuple: (záznamy, next_cursor nebo None)
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        conditions = []
+        params = []
+
+        if cursor:
+            cursor_timestamp, cursor_filename = decode_cursor(cursor)
+            conditions.append('(timestamp < ? OR (timestamp = ? AND filename < ?))')
+            params.extend([cursor_timestamp, cursor_timestamp, cursor_filename])
+        if grade is not None:
+            conditions.append('grade = ?')
+            params.append(int(grade))
+        if date_from:
+            conditions.append('timestamp >= ?')
+            params.append(date.fromisoformat(date_from).isoformat())
+        if date_to:
+            conditions.append('timestamp < ?')
+            params.append((date.fromisoformat(date_to) + timedelta(days=1)).isoformat())
+        if min_score is not None:
+            conditions.append('score >= ?')
+            params.append(float(min_score))
+        if max_score is not None:
+            conditions.append('score <= ?')
+            params.append(float(max_score))
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        query = f"""
+            SELECT filename, timestamp, score, grade, audio_file, image_filename
+            FROM evaluations {where}
+            ORDER BY timestamp DESC, filename DESC
+            LIMIT ?
+        """
+        with self._connect() as conn:
+            rows = [dict(row) for row in conn.execute(query, params + [limit + 1])]
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]['timestamp'], rows[-1]['filename'])
+
+        return rows, next_cursor
+
+    def get_summary(self, eval_filename: str):
+        """
+        Vrátí indexový záznam jednoho vyhodnocení (None pokud není v indexu).
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                """
+                SELECT filename, timestamp, score, grade, audio_file, image_filename
+                FROM evaluations WHERE filename = ?
+                """,
+                (eval_filename,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def load(self, eval_filename: str):
+        """
+        Načte celé vyhodnocení z JSON souboru (None pokud neexistuje).
+        """
+        eval_filepath = os.path.join(self.evaluations_dir, os.path.basename(eval_filename))
+        try:
+            with open(eval_filepath, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def import_json_files(self) -> int:
+        """
+        Naimportuje do indexu všechny existující evaluation_*.json soubory.
+
+        Starým vyhodnocením bez audio_file se audio dohledá podle timestampu
+        (jednou při importu, ne při každém requestu).
+
+        Returns:
+            int: Počet naimportovaných souborů
+        """
+        imported = 0
+        with self._import_lock, self._connect() as conn:
+            for eval_file in sorted(glob.glob(os.path.join(self.evaluations_dir, 'evaluation_*.json'))):
+                try:
+                    with open(eval_file, 'r', encoding='utf-8') as f:
+                        evaluation = json.load(f)
+                except Exception as e:
+                    logger.error(f"Error loading evaluation {eval_file}: {e}")
+                    continue
+
+                eval_filename = os.path.basename(eval_file)
+                if 'audio_file' not in evaluation:
+                    timestamp = _timestamp_from_filename(eval_filename, raw=True)
+                    audio_file = f'dictation_{timestamp}.mp3'
+                    if os.path.exists(os.path.join(self.audio_dir, audio_file)):
+                        evaluation['audio_file'] = audio_file
+
+                self._index_row(conn, evaluation, eval_filename)
+                imported += 1
+
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('imported_at', ?)",
+                         (datetime.now().isoformat(),))
+        return imported
+
+    def ensure_imported(self) -> int:
+        """
+        Spustí import JSON souborů, pokud ještě nikdy neproběhl.
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'imported_at'").fetchone()
+        if row is not None:
+            return 0
+        return self.import_json_files()
+
+
+def encode_cursor(timestamp: str, filename: str) -> str:
+    """
+    Zakóduje pozici v seznamu do neprůhledného kurzoru.
+    """
+    raw = json.dumps([timestamp, filename]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> tuple[str, str]:
+    """
+    Dekóduje kurzor; při neplatném kurzoru vyhodí ValueError.
+    """
+    try:
+        timestamp, filename = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return str(timestamp), str(filename)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def _timestamp_from_filename(eval_filename: str, raw: bool = False) -> str:
+    """
+    Odvodí timestamp z názvu souboru evaluation_YYYYMMDD_HHMMSS[_xxxxxxxx].json.
+    """
+    timestamp = eval_filename.replace('evaluation_', '').replace('.json', '')
+    # Novější názvy mají za časem náhodnou příponu
+    match = re.match(r'\d{8}_\d{6}', timestamp)
+    if match:
+        timestamp = match.group(0)
+    if raw:
+        return timestamp
+    try:
+        return datetime.strptime(timestamp, '%Y%m%d_%H%M%S').isoformat()
+    except ValueError:
+        return timestamp
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] != 'import':
+        print("Použití:")
+        print(f"  python {sys.argv[0]} import")
+        sys.exit(1)
+
+    store = EvaluationStore()
+    count = store.import_json_files()
+    print(f"✓ Naimportováno {count} vyhodnocení do {store.db_path}")
@@ -1,30 +1,78 @@
 """
 Modul pro vyhodnocení diktátu pomocí LLM
 """
-from google import genai
 from datetime import datetime
+import itertools
 import json
+import logging
 import os
-from dotenv import load_dotenv
-from gemini_retry import retry_with_backoff
+import re
+import gemini_gateway
+import metrics
+from gemini_retry import with_retry
+from text_diff import compare_texts
 
-# Načtení environment variables z .env souboru
-load_dotenv()
-
-# Konfigurace Google Gemini klienta
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY not found in environment variables. Please set it in .env file.")
+logger = logging.getLogger(__name__)
 
 GEMINI_EVAL_MODEL = os.getenv('GEMINI_EVAL_MODEL', 'gemini-2.5-flash')
 
-gemini_client = genai.Client(api_key=GEMINI_API_KEY)
+# Lokální porovnání textů před voláním LLM (0 = posílat do LLM celé texty jako dřív)
+LOCAL_PREDIFF = os.getenv('EVAL_LOCAL_PREDIFF', '1').lower() in ('1', 'true', 'yes')
+
+# Strukturovaná odpověď (JSON podle EVALUATION_SCHEMA) místo volného textu s nadpisy
+STRUCTURED_OUTPUT = os.getenv('EVAL_STRUCTURED', '1').lower() in ('1', 'true', 'yes')
+# Limit výstupních tokenů strukturované a streamované odpovědi (u modelů 2.5 včetně tokenů přemýšlení)
+MAX_OUTPUT_TOKENS = int(os.getenv('EVAL_MAX_OUTPUT_TOKENS', 4096))
+# Rozpočet tokenů přemýšlení v rámci MAX_OUTPUT_TOKENS (prázdné = výchozí chování modelu,
+# 0 = bez přemýšlení; modely bez přemýšlení potřebují prázdné)
+THINKING_BUDGET = os.getenv('EVAL_THINKING_BUDGET', '1024')
+
+ERROR_KIND_LABELS = {
+    'spelling': 'pravopis',
+    'diacritics': 'diakritika',
+    'missing': 'chybějící slovo',
+    'extra': 'slovo navíc',
+    'case': 'velké/malé písmeno',
+    'punctuation': 'interpunkce'
+}
+
+# Kategorie chyb ve strukturovaném vyhodnocení (kategorie lokálního porovnání + gramatika)
+ERROR_CATEGORIES = list(ERROR_KIND_LABELS) + ['grammar', 'other']
+ERROR_CATEGORY_LABELS = {**ERROR_KIND_LABELS, 'grammar': 'gramatika', 'other': 'jiné'}
 
+# Schéma odpovědi (podmnožina OpenAPI, kterou přijímá response_schema v Gemini API)
+EVALUATION_SCHEMA = {
+    'type': 'OBJECT',
+    'properties': {
+        'summary': {'type': 'STRING', 'description': 'Celkové hodnocení (1-2 věty)'},
+        'errors': {
+            'type': 'ARRAY',
+            'items': {
+                'type': 'OBJECT',
+                'properties': {
+                    'sentence': {'type': 'INTEGER', 'description': 'Číslo věty (od 1)'},
+                    'expected': {'type': 'STRING', 'description': 'Správný tvar (prázdné, pokud je slovo navíc)'},
+                    'written': {'type': 'STRING', 'description': 'Co žák napsal (prázdné, pokud slovo chybí)'},
+                    'category': {'type': 'STRING', 'enum': ERROR_CATEGORIES},
+                    'explanation': {'type': 'STRING', 'description': 'Krátké vysvětlení pravidla'}
+                },
+                'required': ['sentence', 'expected', 'written', 'category', 'explanation'],
+                'propertyOrdering': ['sentence', 'expected', 'written', 'category', 'explanation']
+            }
+        },
+        'praise': {'type': 'STRING', 'description': 'Co bylo dobře'},
+        'recommendations': {'type': 'STRING', 'description': 'Co zlepšit'},
+        'score': {'type': 'INTEGER', 'minimum': 0, 'maximum': 100}
+    },
+    'required': ['summary', 'errors', 'praise', 'recommendations', 'score'],
+    'propertyOrdering': ['summary', 'errors', 'praise', 'recommendations', 'score']
+}
 
-@retry_with_backoff(max_retries=5, initial_delay=1.0, backoff_factor=2.0, max_delay=60.0)
+
+@with_retry(breaker_key=GEMINI_EVAL_MODEL)
 def _call_gemini_api(prompt: str) -> str:
     """
-    Volá Gemini API s retry/backoff logikou.
+    Volá Gemini API s retry logikou.
     
     Args:
         prompt: Prompt pro API
@@ -32,12 +80,14 @@ def _call_gemini_api(prompt: str) -> str:
     Returns:
         str: Text odpovědi z API
     """
-    response = gemini_client.models.generate_content(
+    from google.genai import types
+
+    response = gemini_gateway.generate_content(
         model=GEMINI_EVAL_MODEL,
         contents=prompt,
-        config=genai.types.GenerateContentConfig(
+        config=types.GenerateContentConfig(
             temperature=0.1,  # Nižší teplota pro konzistentní vyhodnocení
-            max_output_tokens=16384  # Zvýšený limit pro delší vyhodnocení (16k)
+            max_output_tokens=MAX_OUTPUT_TOKENS
         )
     )
     
@@ -47,41 +97,184 @@ def _call_gemini_api(prompt: str) -> str:
         raise ValueError("No text in response from Gemini API")
 
 
-def evaluate_dictation(original_text: str, written_text: str) -> dict:
+class StructuredOutputError(ValueError):
     """
-    Vyhodnotí diktát porovnáním originálního a napsaného textu.
+    Strukturovaná odpověď je useknutá (MAX_TOKENS) nebo není platný JSON.
+    
+    Opakovat stejný request nemá smysl, vyhodnocení místo toho přejde
+    na textový formát.
+    """
+
+
+def _thinking_config():
+    """
+    ThinkingConfig podle EVAL_THINKING_BUDGET (None = nenastavovat).
+    """
+    from google.genai import types
+
+    if THINKING_BUDGET.strip() == '':
+        return None
+    return types.ThinkingConfig(thinking_budget=int(THINKING_BUDGET))
+
+
+@with_retry(breaker_key=GEMINI_EVAL_MODEL)
+def _call_gemini_structured(prompt: str) -> dict:
+    """
+    Volá Gemini API s odpovědí omezenou na EVALUATION_SCHEMA.
     
     Args:
-        original_text: Originální nadiktovaný text
-        written_text: Text přečtený z fotky diktátu
+        prompt: Prompt pro API
+        
+    Returns:
+        dict: Rozparsovaná odpověď podle schématu
     
+    Raises:
+        StructuredOutputError: Useknutá nebo neplatná odpověď
+    """
+    from google.genai import types
+
+    response = gemini_gateway.generate_content(
+        model=GEMINI_EVAL_MODEL,
+        contents=prompt,
+        config=types.GenerateContentConfig(
+            temperature=0.1,
+            max_output_tokens=MAX_OUTPUT_TOKENS,
+            thinking_config=_thinking_config(),
+            response_mime_type='application/json',
+            response_schema=EVALUATION_SCHEMA
+        )
+    )
+    
+    candidates = getattr(response, 'candidates', None) or []
+    if candidates and candidates[0].finish_reason == types.FinishReason.MAX_TOKENS:
+        raise StructuredOutputError(f"Evaluation response truncated at {MAX_OUTPUT_TOKENS} output tokens")
+    if not (hasattr(response, 'text') and response.text):
+        raise ValueError("No text in response from Gemini API")
+    return _parse_structured(response.text)
+
+
+def _parse_structured(text: str) -> dict:
+    """
+    Rozparsuje JSON odpověď podle EVALUATION_SCHEMA.
+    
+    Raises:
+        StructuredOutputError: Text není JSON objekt
+    """
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise StructuredOutputError(f"Invalid JSON in evaluation response: {e}")
+    if not isinstance(data, dict):
+        raise StructuredOutputError("Evaluation response is not a JSON object")
+    return data
+
+
+@with_retry(breaker_key=GEMINI_EVAL_MODEL)
+def _open_gemini_stream(prompt: str, structured: bool = False):
+    """
+    Otevře streamované volání Gemini API a počká na první část odpovědi.
+    
+    Chyby do první části (429, výpadek spojení) se opakují jako u běžného
+    volání, chyba uprostřed streamu se už neopakuje (část textu je odeslaná).
+    
+    Args:
+        prompt: Prompt pro API
+        structured: Odpověď jako JSON podle EVALUATION_SCHEMA
+        
     Returns:
-        dict: {
-            'summary': str,  # Celkové shrnutí
-            'errors': list,  # Seznam chyb
-            'score': float,  # Skóre 0-100
-            'details': str,  # Detailní vyhodnocení
-            'timestamp': str
-        }
+        tuple: (první část, generátor dalších částí)
+    """
+    from google.genai import types
+
+    schema = {'response_mime_type': 'application/json', 'response_schema': EVALUATION_SCHEMA} if structured else {}
+    stream = gemini_gateway.generate_content_stream(
+        model=GEMINI_EVAL_MODEL,
+        contents=prompt,
+        config=types.GenerateContentConfig(
+            temperature=0.1,
+            max_output_tokens=MAX_OUTPUT_TOKENS,
+            thinking_config=_thinking_config(),
+            **schema
+        )
+    )
+    first = next(stream, None)
+    if first is None:
+        raise ValueError("No text in response from Gemini API")
+    return first, stream
+
+
+def _parse_partial_json(text: str):
     """
+    Rozparsuje začátek JSON objektu z rozpracovaného streamu.
     
-    prompt = f"""Jsi učitel českého jazyka. Vyhodnoť prosím tento diktát od žáka.
+    Doplní uzavírací uvozovky a závorky; neúplný klíč nebo hodnotu na konci
+    zahodí. Slouží jen pro průběžné zobrazení, výsledek se parsuje celý.
+    
+    Returns:
+        dict | None: Dosud známá pole, None pokud zatím nic
+    """
+    candidate = text.strip()
+    for _ in range(8):
+        if not candidate:
+            return None
+        try:
+            data = json.loads(candidate + _json_closing(candidate))
+            return data if isinstance(data, dict) else None
+        except json.JSONDecodeError:
+            pass
+        # Zahodíme poslední (neúplnou) položku až po předchozí čárku nebo otevírací závorku
+        cut = max(candidate.rfind(','), candidate.rfind('{'), candidate.rfind('['))
+        if cut <= 0:
+            return None
+        candidate = candidate[:cut + 1] if candidate[cut] in '{[' else candidate[:cut]
+    return None
 
-ORIGINÁLNÍ TEXT (co bylo nadiktováno):
-{original_text}
 
-NAPSANÝ TEXT (co žák napsal):
-{written_text}
+def _json_closing(text: str) -> str:
+    """
+    Znaky, které uzavřou otevřený řetězec a závorky na konci useknutého JSON.
+    """
+    stack = []
+    in_string = False
+    escape = False
+    for char in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in '{[':
+            stack.append('}' if char == '{' else ']')
+        elif char in '}]' and stack:
+            stack.pop()
+    closing = ''.join(reversed(stack))
+    if in_string:
+        # Useknutá escape sekvence by řetězec neuzavřela
+        return ('' if not escape else '\\') + '"' + closing
+    return closing
 
-Vyhodnoť diktát a poskytni:
-1. Celkové hodnocení (1-2 věty)
-2. Seznam konkrétních chyb (pravopis, interpunkce, chybějící slova)
-3. Pochvalu za to, co bylo správně
-4. Doporučení pro zlepšení
 
-Buď konstruktivní a povzbuzující. Pamatuj, že je to žák základní školy.
+def _format_instructions(structured: bool, score: int | None = None) -> str:
+    """
+    Závěr promptu s požadovaným formátem odpovědi (JSON, nebo text s nadpisy).
+    """
+    if structured:
+        score_rule = (f"Do pole score uveď {score} - skóre je už spočítané z nalezených chyb."
+                      if score is not None else "Do pole score uveď skóre 0-100.")
+        return f"""Vrať odpověď jako JSON podle zadaného schématu:
+- summary: celkové hodnocení
+- errors: každá chyba zvlášť - číslo věty (od 1), správný tvar (expected), co žák napsal (written),
+  kategorie a krátké vysvětlení pravidla srozumitelné pro žáka
+- praise: co bylo dobře
+- recommendations: co zlepšit
+{score_rule}
+V textových polích nepoužívej markdown."""
 
-DŮLEŽITÉ PRAVIDLO FORMÁTOVÁNÍ:
+    return f"""DŮLEŽITÉ PRAVIDLO FORMÁTOVÁNÍ:
 - NEPOUŽÍVEJ MARKDOWN syntaxi (žádné hvězdičky, podtržítka apod.)
 - Použij jen prostý text
 - Nepoužívej tučný text (bold), kurzívu nebo jiné formátování
@@ -102,46 +295,377 @@ POCHVALA:
 DOPORUČENÍ:
 [co zlepšit]
 
-SKÓRE: [číslo 0-100]
+SKÓRE: {score if score is not None else '[číslo 0-100]'}
 """
 
+
+def _build_full_prompt(original_text: str, written_text: str, structured: bool = False) -> str:
+    """
+    Prompt s celými texty (bez lokálního porovnání).
+    """
+    return f"""Jsi učitel českého jazyka. Vyhodnoť prosím tento diktát od žáka.
+
+ORIGINÁLNÍ TEXT (co bylo nadiktováno):
+{original_text}
+
+NAPSANÝ TEXT (co žák napsal):
+{written_text}
+
+Vyhodnoť diktát a poskytni:
+1. Celkové hodnocení (1-2 věty)
+2. Seznam konkrétních chyb (pravopis, interpunkce, chybějící slova)
+3. Pochvalu za to, co bylo správně
+4. Doporučení pro zlepšení
+
+Buď konstruktivní a povzbuzující. Pamatuj, že je to žák základní školy.
+
+{_format_instructions(structured)}"""
+
+
+def _format_error(error: dict) -> str:
+    label = ERROR_KIND_LABELS.get(error['kind'], error['kind'])
+    if not error['written']:
+        return f"chybí „{error['expected']}“ ({label})"
+    if not error['expected']:
+        return f"navíc „{error['written']}“ ({label})"
+    return f"„{error['written']}“ místo „{error['expected']}“ ({label})"
+
+
+def _build_diff_prompt(diff: dict, structured: bool = False) -> str:
+    """
+    Prompt jen s chybnými větami a chybami nalezenými lokálním porovnáním.
+    """
+    correct = sum(1 for sentence in diff['sentences'] if sentence['correct'])
+    wrong_sentences = '\n'.join(
+        f"{sentence['index'] + 1}. nadiktováno: {sentence['original']}\n   napsáno: {sentence['written']}"
+        for sentence in diff['sentences'] if not sentence['correct']
+    )
+    errors = '\n'.join(f"- věta {error['sentence'] + 1}: {_format_error(error)}" for error in diff['errors'])
+    score = round(diff['score'])
+
+    return f"""Jsi učitel českého jazyka. Vyhodnoť prosím tento diktát od žáka.
+
+Počet vět v diktátu: {len(diff['sentences'])}, z toho bez chyby: {correct}.
+Níže jsou jen věty s chybami (co bylo nadiktováno a co žák napsal):
+{wrong_sentences}
+
+Automaticky nalezené rozdíly:
+{errors}
+
+Vyhodnoť diktát a poskytni:
+1. Celkové hodnocení (1-2 věty)
+2. Seznam konkrétních chyb - vysvětli každou chybu výše (proč se píše správný tvar, jaké pravidlo platí)
+3. Pochvalu za to, co bylo správně (včetně bezchybných vět)
+4. Doporučení pro zlepšení
+
+Skóre je už spočítané z nalezených chyb, v odpovědi ho uveď beze změny.
+Buď konstruktivní a povzbuzující. Pamatuj, že je to žák základní školy.
+
+{_format_instructions(structured, score)}"""
+
+
+def _perfect_evaluation_text(num_sentences: int) -> str:
+    """
+    Vyhodnocení bezchybného diktátu (bez volání LLM), ve stejném formátu jako od LLM.
+    """
+    return f"""HODNOCENÍ: Výborně! Diktát je napsaný úplně bez chyby.
+
+CHYBY:
+- žádné chyby
+
+POCHVALA:
+Všech {num_sentences} vět je napsaných správně včetně pravopisu, diakritiky, velkých písmen a interpunkce.
+
+DOPORUČENÍ:
+Jen tak dál, pravidelné procvičování se vyplácí.
+
+SKÓRE: 100"""
+
+
+def _perfect_structured(num_sentences: int) -> dict:
+    """
+    Strukturované vyhodnocení bezchybného diktátu (bez volání LLM).
+    """
+    return {
+        'summary': 'Výborně! Diktát je napsaný úplně bez chyby.',
+        'errors': [],
+        'praise': f"Všech {num_sentences} vět je napsaných správně včetně pravopisu, diakritiky, velkých písmen a interpunkce.",
+        'recommendations': 'Jen tak dál, pravidelné procvičování se vyplácí.',
+        'score': 100
+    }
+
+
+def _normalize_structured(data: dict, score: float | None = None) -> dict:
+    """
+    Doplní chybějící pole a sjednotí typy odpovědi podle schématu.
+    
+    Args:
+        data: Odpověď LLM
+        score: Skóre z lokálního porovnání (má přednost před skóre od LLM)
+    """
+    errors = []
+    for error in data.get('errors') or []:
+        if not isinstance(error, dict):
+            continue
+        category = error.get('category')
+        try:
+            sentence = int(error.get('sentence'))
+        except (TypeError, ValueError):
+            sentence = None
+        errors.append({
+            'sentence': sentence,
+            'expected': str(error.get('expected') or ''),
+            'written': str(error.get('written') or ''),
+            'category': category if category in ERROR_CATEGORIES else 'other',
+            'explanation': str(error.get('explanation') or '')
+        })
+
+    if score is None:
+        try:
+            score = min(100, max(0, float(data.get('score'))))
+        except (TypeError, ValueError):
+            score = None
+
+    return {
+        'summary': str(data.get('summary') or ''),
+        'errors': errors,
+        'praise': str(data.get('praise') or ''),
+        'recommendations': str(data.get('recommendations') or ''),
+        'score': score
+    }
+
+
+def _render_evaluation_text(structured: dict) -> str:
+    """
+    Převede strukturované vyhodnocení na text s nadpisy (pro starší klienty a výpisy).
+    """
+    errors = []
+    for error in structured['errors']:
+        label = ERROR_CATEGORY_LABELS.get(error['category'], error['category'])
+        prefix = f"věta {error['sentence']}: " if error['sentence'] else ''
+        if not error['written']:
+            detail = f"chybí „{error['expected']}“"
+        elif not error['expected']:
+            detail = f"navíc „{error['written']}“"
+        else:
+            detail = f"„{error['written']}“ místo „{error['expected']}“"
+        explanation = f" - {error['explanation']}" if error['explanation'] else ''
+        errors.append(f"- {prefix}{detail} ({label}){explanation}")
+    score = structured['score']
+
+    return f"""HODNOCENÍ: {structured['summary']}
+
+CHYBY:
+{chr(10).join(errors) or '- žádné chyby'}
+
+POCHVALA:
+{structured['praise']}
+
+DOPORUČENÍ:
+{structured['recommendations']}
+
+SKÓRE: {round(score) if score is not None else '-'}"""
+
+
+def _parse_score(evaluation_text: str):
+    """
+    Vytáhne skóre z řádku 'SKÓRE: ...' odpovědi LLM (None pokud chybí).
+    """
+    score_match = re.search(r'SKÓRE:\s*(\d+)', evaluation_text)
+    if score_match:
+        return min(100, max(0, float(score_match.group(1))))
+    return None
+
+
+def _fallback_text_evaluation(error: Exception, diff: dict | None, original_text: str, written_text: str) -> str:
+    """
+    Vyhodnocení v textovém formátu, když strukturovaná odpověď selhala (useknutý JSON).
+    """
+    logger.warning(f"Structured evaluation failed ({error}), falling back to text format")
+    metrics.record_error('evaluate_structured')
+    prompt = _build_diff_prompt(diff) if diff else _build_full_prompt(original_text, written_text)
+    return _call_gemini_api(prompt)
+
+
+def _build_result(original_text: str, written_text: str, evaluation_text: str, llm_called: bool,
+                  diff: dict | None, structured: dict | None = None) -> dict:
+    """
+    Sestaví výsledek vyhodnocení (společné pro evaluate_dictation a evaluate_dictation_stream).
+    """
+    if structured:
+        score = structured['score']
+    else:
+        score = diff['score'] if diff else _parse_score(evaluation_text)
+    
+    result = {
+        'evaluation_text': evaluation_text,
+        'original_text': original_text,
+        'written_text': written_text,
+        'score': score,
+        'llm_called': llm_called,
+        'timestamp': datetime.now().isoformat()
+    }
+    if structured:
+        result['structured'] = structured
+    if diff:
+        result['diff'] = {'errors': diff['errors'], 'sentences': diff['sentences']}
+    
+    return result
+
+
+@metrics.timed('evaluate')
+def evaluate_dictation(original_text: str, written_text: str) -> dict:
+    """
+    Vyhodnotí diktát porovnáním originálního a napsaného textu.
+    
+    Nejdřív texty lokálně porovná (text_diff). Bezchybný diktát se vyhodnotí
+    bez LLM, jinak LLM dostane jen chybné věty a nalezené chyby. Skóre je
+    deterministické z lokálního porovnání.
+    
+    Ve strukturovaném režimu (EVAL_STRUCTURED) LLM vrací JSON podle
+    EVALUATION_SCHEMA, který se ukládá přímo jako 'structured';
+    evaluation_text se z něj jen vykreslí.
+    
+    Args:
+        original_text: Originální nadiktovaný text
+        written_text: Text přečtený z fotky diktátu
+    
+    Returns:
+        dict: {
+            'evaluation_text': str,  # Slovní hodnocení
+            'structured': dict,  # Hodnocení podle EVALUATION_SCHEMA (jen ve strukturovaném režimu)
+            'score': float,  # Skóre 0-100
+            'llm_called': bool,  # Zda se volalo LLM
+            'diff': dict,  # Chyby a věty z lokálního porovnání
+            'timestamp': str
+        }
+    """
     try:
-        # Volání Google Gemini API s retry/backoff logikou
-        evaluation_text = _call_gemini_api(prompt)
+        diff = compare_texts(original_text, written_text) if LOCAL_PREDIFF else None
+        structured = None
         
-        # Parsování odpovědi
-        result = {
-            'evaluation_text': evaluation_text,
-            'original_text': original_text,
-            'written_text': written_text,
-            'timestamp': datetime.now().isoformat()
-        }
+        if diff and diff['perfect']:
+            if STRUCTURED_OUTPUT:
+                structured = _perfect_structured(len(diff['sentences']))
+            else:
+                evaluation_text = _perfect_evaluation_text(len(diff['sentences']))
+            llm_called = False
+        else:
+            # Volání Google Gemini API s retry logikou
+            if diff:
+                prompt = _build_diff_prompt(diff, STRUCTURED_OUTPUT)
+            else:
+                prompt = _build_full_prompt(original_text, written_text, STRUCTURED_OUTPUT)
+            if STRUCTURED_OUTPUT:
+                try:
+                    structured = _normalize_structured(_call_gemini_structured(prompt), diff['score'] if diff else None)
+                except StructuredOutputError as e:
+                    evaluation_text = _fallback_text_evaluation(e, diff, original_text, written_text)
+            else:
+                evaluation_text = _call_gemini_api(prompt)
+            llm_called = True
         
-        # Pokus o extrakci skóre
-        try:
-            if 'SKÓRE:' in evaluation_text:
-                score_line = [line for line in evaluation_text.split('\n') if 'SKÓRE:' in line][0]
-                # Extrahuj první číslo ze skóre (před lomítkem nebo celé číslo)
-                import re
-                score_match = re.search(r'SKÓRE:\s*(\d+)', score_line)
-                if score_match:
-                    score = float(score_match.group(1))
-                    result['score'] = min(100, max(0, score))
-                else:
-                    result['score'] = None
-        except:
-            result['score'] = None
+        if structured:
+            evaluation_text = _render_evaluation_text(structured)
         
-        return result
+        return _build_result(original_text, written_text, evaluation_text, llm_called, diff, structured)
         
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Evaluation failed: {e}")
+        metrics.record_error('evaluate')
         return {
             'error': str(e),
             'timestamp': datetime.now().isoformat()
         }
 
+def evaluate_dictation_stream(original_text: str, written_text: str):
+    """
+    Vyhodnotí diktát jako evaluate_dictation, ale průběh vrací postupně,
+    jak ho Gemini generuje (streamované volání).
+    
+    Ve strukturovaném režimu se streamuje JSON podle EVALUATION_SCHEMA:
+    po každé části se rozparsuje dosavadní začátek a pošle se jako
+    ('partial', dict); výsledek obsahuje celé 'structured' jako
+    evaluate_dictation. V textovém režimu se posílají části textu
+    ('delta', str). Bezchybný diktát se vyhodnotí bez LLM.
+    
+    Args:
+        original_text: Originální nadiktovaný text
+        written_text: Text přečtený z fotky diktátu
+    
+    Yields:
+        tuple: ('partial', dict) nebo ('delta', str) průběžně, nakonec ('result', dict)
+            se stejným obsahem jako evaluate_dictation (včetně {'error': ...})
+    """
+    from google.genai import types
+
+    try:
+        with metrics.timer('evaluate'):
+            diff = compare_texts(original_text, written_text) if LOCAL_PREDIFF else None
+            structured = None
+            
+            if diff and diff['perfect']:
+                if STRUCTURED_OUTPUT:
+                    structured = _perfect_structured(len(diff['sentences']))
+                    evaluation_text = _render_evaluation_text(structured)
+                    yield 'partial', structured
+                else:
+                    evaluation_text = _perfect_evaluation_text(len(diff['sentences']))
+                    yield 'delta', evaluation_text
+                llm_called = False
+            else:
+                if diff:
+                    prompt = _build_diff_prompt(diff, STRUCTURED_OUTPUT)
+                else:
+                    prompt = _build_full_prompt(original_text, written_text, STRUCTURED_OUTPUT)
+                first, stream = _open_gemini_stream(prompt, STRUCTURED_OUTPUT)
+                parts = []
+                partial = None
+                truncated = False
+                try:
+                    for chunk in itertools.chain([first], stream):
+                        candidates = getattr(chunk, 'candidates', None) or []
+                        if candidates and candidates[0].finish_reason == types.FinishReason.MAX_TOKENS:
+                            truncated = True
+                        text = getattr(chunk, 'text', None)
+                        if not text:
+                            continue
+                        parts.append(text)
+                        if not STRUCTURED_OUTPUT:
+                            yield 'delta', text
+                            continue
+                        current = _parse_partial_json(''.join(parts))
+                        if current and current != partial:
+                            partial = current
+                            yield 'partial', partial
+                finally:
+                    # Při přerušení (klient zavřel spojení) uvolníme slot modelu
+                    stream.close()
+                response_text = ''.join(parts).strip()
+                
+                if STRUCTURED_OUTPUT:
+                    try:
+                        if truncated:
+                            raise StructuredOutputError(f"Evaluation response truncated at {MAX_OUTPUT_TOKENS} output tokens")
+                        structured = _normalize_structured(_parse_structured(response_text), diff['score'] if diff else None)
+                        evaluation_text = _render_evaluation_text(structured)
+                    except StructuredOutputError as e:
+                        evaluation_text = _fallback_text_evaluation(e, diff, original_text, written_text)
+                else:
+                    evaluation_text = response_text
+                if not evaluation_text:
+                    raise ValueError("No text in response from Gemini API")
+                llm_called = True
+        
+        yield 'result', _build_result(original_text, written_text, evaluation_text, llm_called, diff, structured)
+        
+    except Exception as e:
+        logger.exception(f"Evaluation stream failed: {e}")
+        metrics.record_error('evaluate')
+        yield 'result', {
+            'error': str(e),
+            'timestamp': datetime.now().isoformat()
+        }
 
 if __name__ == '__main__':
     # Test vyhodnocení
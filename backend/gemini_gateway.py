@@ -0,0 +1,259 @@
+"""
+Modul se sdíleným klientem pro Gemini API
+
+Všechna volání Gemini (generování diktátu, OCR, vyhodnocení) jdou přes
+jednoho klienta se společným poolem HTTP spojení. Pro každý model se navíc
+hlídá počet souběžných volání (semafor) a počet requestů za minutu
+(token bucket), takže nárazová zátěž (celá třída najednou) čeká ve frontě
+místo toho, aby všechna volání najednou narazila na 429.
+
+Limity platí pro jeden proces - při více gunicorn workerech je potřeba
+kvótu rozdělit (GEMINI_RPM / počet workerů).
+
+Klient (a s ním google.genai a httpx) se vytváří líně přes registry až při
+prvním volání, chybějící GEMINI_API_KEY proto neshodí import aplikace.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+import registry
+
+# Načtení environment variables z .env souboru
+load_dotenv()
+
+# Výchozí limity pro každý model
+DEFAULT_MAX_CONCURRENCY = int(os.getenv('GEMINI_MAX_CONCURRENCY', 4))
+DEFAULT_RPM = float(os.getenv('GEMINI_RPM', 60))
+DEFAULT_BURST = int(os.getenv('GEMINI_BURST', 5))
+# Jak dlouho smí volání čekat ve frontě, než se vzdá (v sekundách); plná fronta se
+# opakuje v rámci GEMINI_RETRY_DEADLINE, proto je čekání kratší než tento rozpočet
+QUEUE_TIMEOUT = float(os.getenv('GEMINI_QUEUE_TIMEOUT', 30))
+# Velikost sdíleného poolu HTTP spojení
+HTTP_MAX_CONNECTIONS = int(os.getenv('GEMINI_HTTP_MAX_CONNECTIONS', 20))
+# Jiný endpoint API (proxy, lokální fake server pro benchmarky); prázdné = výchozí Google
+BASE_URL = os.getenv('GEMINI_BASE_URL') or None
+
+
+class GatewayBusyError(RuntimeError):
+    """
+    Volání se nedočkalo volného slotu / tokenu v rámci QUEUE_TIMEOUT.
+    """
+
+
+class TokenBucket:
+    """
+    Token bucket: `rate` tokenů za sekundu, nejvýše `capacity` naráz.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, timeout: float) -> bool:
+        """
+        Počká na token; vrátí False, pokud se ho nedočká do timeoutu.
+        """
+        if self.rate <= 0:
+            return True
+
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    @property
+    def tokens(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+
+class ModelLimiter:
+    """
+    Limit souběžnosti (semafor) a rychlosti (token bucket) pro jeden model.
+    """
+
+    def __init__(self, max_concurrency: int, rpm: float, burst: int):
+        self.max_concurrency = max(1, max_concurrency)
+        self.rpm = rpm
+        self._semaphore = threading.BoundedSemaphore(self.max_concurrency)
+        self._bucket = TokenBucket(rpm / 60.0, burst)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    @contextmanager
+    def slot(self, timeout: float = QUEUE_TIMEOUT):
+        """
+        Počká na volný slot a token, po skončení bloku slot uvolní.
+        """
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            self.waiting += 1
+        try:
+            acquired = self._semaphore.acquire(timeout=timeout)
+            if acquired and not self._bucket.acquire(max(0.0, deadline - time.monotonic())):
+                self._semaphore.release()
+                acquired = False
+        finally:
+            with self._lock:
+                self.waiting -= 1
+
+        if not acquired:
+            with self._lock:
+                self.rejected += 1
+            raise GatewayBusyError(f"Gemini gateway busy: no free slot within {timeout:g}s")
+
+        with self._lock:
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'max_concurrency': self.max_concurrency,
+                'rpm': self.rpm,
+                'in_flight': self.in_flight,
+                'waiting': self.waiting,
+                'rejected': self.rejected,
+                'tokens': round(self._bucket.tokens, 2)
+            }
+
+
+def _parse_model_limits(value: str) -> dict:
+    """
+    Převede 'gemini-3-pro-preview=2:25,gemini-2.5-flash=8:300'
+    na {model: (max_concurrency, rpm)}.
+    """
+    limits = {}
+    for item in value.split(','):
+        if '=' not in item:
+            continue
+        model, spec = item.split('=', 1)
+        concurrency, _, rpm = spec.partition(':')
+        limits[model.strip()] = (
+            int(concurrency) if concurrency.strip() else DEFAULT_MAX_CONCURRENCY,
+            float(rpm) if rpm.strip() else DEFAULT_RPM
+        )
+    return limits
+
+
+MODEL_LIMITS = _parse_model_limits(os.getenv('GEMINI_MODEL_LIMITS', ''))
+
+
+def _create_client():
+    """
+    Vytvoří klienta Gemini API - jeden klient = jeden pool HTTP spojení pro celý proces.
+    """
+    api_key = os.getenv('GEMINI_API_KEY')
+    if not api_key:
+        raise ValueError("GEMINI_API_KEY not found in environment variables. Please set it in .env file.")
+
+    import httpx
+    from google import genai
+
+    return genai.Client(
+        api_key=api_key,
+        http_options=genai.types.HttpOptions(
+            base_url=BASE_URL,
+            client_args={
+                'limits': httpx.Limits(
+                    max_connections=HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_MAX_CONNECTIONS
+                )
+            }
+        )
+    )
+
+
+registry.register('gemini_client', _create_client)
+
+
+def get_client():
+    """
+    Vrátí sdíleného klienta Gemini API (při prvním volání ho vytvoří).
+    """
+    return registry.get('gemini_client')
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(model: str) -> ModelLimiter:
+    """
+    Vrátí (případně vytvoří) limiter pro model.
+    """
+    with _limiters_lock:
+        if model not in _limiters:
+            max_concurrency, rpm = MODEL_LIMITS.get(model, (DEFAULT_MAX_CONCURRENCY, DEFAULT_RPM))
+            _limiters[model] = ModelLimiter(max_concurrency, rpm, DEFAULT_BURST)
+        return _limiters[model]
+
+
+def generate_content(model: str, contents, config=None):
+    """
+    Zavolá models.generate_content přes sdíleného klienta s limity modelu.
+
+    Args:
+        model: Název modelu
+        contents: Obsah requestu (text nebo seznam částí)
+        config: Volitelný GenerateContentConfig
+
+    Returns:
+        Odpověď Gemini API
+    """
+    with get_limiter(model).slot():
+        return get_client().models.generate_content(model=model, contents=contents, config=config)
+
+
+def generate_content_stream(model: str, contents, config=None):
+    """
+    Zavolá models.generate_content_stream přes sdíleného klienta s limity modelu.
+
+    Generátor - slot modelu se obsadí při čtení první části a drží se,
+    dokud se stream nedočte nebo nezavře.
+
+    Args:
+        stejné jako generate_content
+
+    Yields:
+        Části odpovědi Gemini API
+    """
+    with get_limiter(model).slot():
+        yield from get_client().models.generate_content_stream(model=model, contents=contents, config=config)
+
+
+def stats() -> dict:
+    """
+    Vrátí stav limiterů podle modelu (pro /api/health).
+    """
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {model: limiter.stats() for model, limiter in limiters.items()}
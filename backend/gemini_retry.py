@@ -1,68 +1,338 @@
 """
-Modul pro retry/backoff logiku pro Gemini API volání
+Modul pro retry logiku pro Gemini API volání
+
+- chyby se třídí na dočasné (429, 5xx, timeout, výpadek spojení), které má
+  smysl opakovat, a trvalé (ostatní 4xx, chybná odpověď), které se vrací hned
+- pauzy mezi pokusy používají decorrelated jitter, takže se souběžná volání
+  po chybě nerozjedou znovu ve stejný okamžik
+- respektuje se Retry-After / retryDelay ze serveru
+- každé volání má celkový časový rozpočet (deadline)
+- sdílený circuit breaker pro každý model: po sérii výpadků upstreamu
+  všechna volání na chvíli hned selžou místo čekání na timeouty
+- plná lokální fronta (GatewayBusyError) se opakuje jako dočasná chyba,
+  ale stav breakeru nemění - o upstreamu nic neříká
+- počty pokusů, opakování a chyb jsou k dispozici přes retry_metrics()
 """
-import time
 import functools
-from typing import Callable, Any
 import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from typing import Any, Callable
+
+import metrics
+from gemini_gateway import GatewayBusyError
 
 # Nastavení loggeru
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DEFAULT_MAX_ATTEMPTS = int(os.getenv('GEMINI_RETRY_MAX_ATTEMPTS', 5))
+DEFAULT_BASE_DELAY = float(os.getenv('GEMINI_RETRY_BASE_DELAY', 1.0))
+DEFAULT_MAX_DELAY = float(os.getenv('GEMINI_RETRY_MAX_DELAY', 30.0))
+# Celkový rozpočet na jedno volání včetně všech opakování (v sekundách)
+DEFAULT_DEADLINE = float(os.getenv('GEMINI_RETRY_DEADLINE', 90.0))
+# Po kolika výpadcích za sebou se breaker otevře a na jak dlouho
+BREAKER_THRESHOLD = int(os.getenv('GEMINI_BREAKER_THRESHOLD', 5))
+BREAKER_COOLDOWN = float(os.getenv('GEMINI_BREAKER_COOLDOWN', 30.0))
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+# Třídy chyb pro metriky a rozhodování
+RATE_LIMITED = 'rate_limited'
+UPSTREAM = 'upstream'
+NETWORK = 'network'
+LOCAL_BUSY = 'local_busy'
+PERMANENT = 'permanent'
+
+
+class CircuitOpenError(RuntimeError):
+    """
+    Breaker je otevřený - upstream je mimo provoz, volání se ani nezkouší.
+    """
+
+
+def classify_error(error: Exception) -> str:
+    """
+    Zařadí chybu do jedné z tříd RATE_LIMITED / UPSTREAM / NETWORK / LOCAL_BUSY / PERMANENT.
+    """
+    if isinstance(error, GatewayBusyError):
+        return LOCAL_BUSY
+    # google.genai a httpx se načítají líně s klientem - dokud nejsou
+    # načtené, nemůže jít o jejich výjimku (a importovat je kvůli tomu nechceme)
+    genai_errors = sys.modules.get('google.genai.errors')
+    if genai_errors and isinstance(error, genai_errors.APIError):
+        if error.code == 429:
+            return RATE_LIMITED
+        if error.code in RETRYABLE_STATUS_CODES:
+            return UPSTREAM
+        return PERMANENT
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return NETWORK
+    httpx = sys.modules.get('httpx')
+    if httpx and isinstance(error, (httpx.TimeoutException, httpx.TransportError)):
+        return NETWORK
+    return PERMANENT
+
+
+def retry_after_seconds(error: Exception):
+    """
+    Vrátí serverem doporučenou pauzu (Retry-After nebo RetryInfo.retryDelay), jinak None.
+    """
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if headers:
+        value = headers.get('retry-after')
+        if value:
+            try:
+                return max(0.0, float(value))
+            except ValueError:
+                pass
+
+    # Gemini posílá u 429 v těle chyby např. {"@type": "...RetryInfo", "retryDelay": "37s"}
+    details = getattr(error, 'details', None)
+    if isinstance(details, dict):
+        details = details.get('error', details).get('details', [])
+    for detail in details if isinstance(details, list) else []:
+        if isinstance(detail, dict) and 'retryDelay' in detail:
+            match = re.match(r'^([\d.]+)s$', str(detail['retryDelay']))
+            if match:
+                return float(match.group(1))
+    return None
+
+
+class CircuitBreaker:
+    """
+    Sdílený stav upstreamu (jednoho modelu) pro všechna vlákna procesu.
+
+    closed -> po BREAKER_THRESHOLD výpadcích za sebou open -> po cooldownu
+    half-open (projde jedno zkušební volání) -> closed / znovu open.
+    Drží i společnou pauzu po 429, aby na server nezkoušela všechna vlákna.
+    """
+
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, cooldown: float = BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+        self._paused_until = 0.0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now: float) -> str:
+        if self._opened_at is None:
+            return 'closed'
+        if now - self._opened_at < self.cooldown:
+            return 'open'
+        return 'half_open'
+
+    def before_call(self) -> float:
+        """
+        Propustí volání, nebo vyhodí CircuitOpenError.
+
+        Returns:
+            float: Kolik sekund ještě počkat kvůli společné pauze po 429
+        """
+        with self._lock:
+            now = time.monotonic()
+            state = self._state(now)
+            if state == 'open' or (state == 'half_open' and self._probe_in_flight):
+                raise CircuitOpenError('Gemini API is unavailable (circuit open), try again later')
+            if state == 'half_open':
+                self._probe_in_flight = True
+            return max(0.0, self._paused_until - now)
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self, error_class: str, pause: float | None = None):
+        with self._lock:
+            now = time.monotonic()
+            if pause:
+                self._paused_until = max(self._paused_until, now + pause)
+
+            if error_class == PERMANENT:
+                # Upstream odpověděl, jen request byl špatně - výpadek to není
+                self._failures = 0
+                self._opened_at = None
+            elif error_class in (UPSTREAM, NETWORK):
+                self._failures += 1
+                if self._probe_in_flight or self._failures >= self.threshold:
+                    if self._opened_at is None or self._probe_in_flight:
+                        logger.warning(f"Circuit breaker opened after {self._failures} failure(s)")
+                    self._opened_at = now
+            self._probe_in_flight = False
 
-def retry_with_backoff(
-    max_retries: int = 5,
-    initial_delay: float = 1.0,
-    backoff_factor: float = 2.0,
-    max_delay: float = 60.0
+    def release_probe(self):
+        with self._lock:
+            self._probe_in_flight = False
+
+
+_breakers = {}
+_metrics = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(key: str) -> CircuitBreaker:
+    with _registry_lock:
+        if key not in _breakers:
+            _breakers[key] = CircuitBreaker()
+        return _breakers[key]
+
+
+def _record(name: str, **increments):
+    with _registry_lock:
+        counters = _metrics.setdefault(name, {
+            'calls': 0, 'attempts': 0, 'retries': 0, 'successes': 0, 'failures': 0,
+            'circuit_rejections': 0, 'sleep_seconds': 0.0, 'errors': {}
+        })
+        for key, value in increments.items():
+            if key == 'error':
+                counters['errors'][value] = counters['errors'].get(value, 0) + 1
+            else:
+                counters[key] += value
+
+
+def retry_metrics() -> dict:
+    """
+    Vrátí metriky opakování podle funkce a stav breakerů podle modelu.
+    """
+    with _registry_lock:
+        functions = {name: {**m, 'errors': dict(m['errors']), 'sleep_seconds': round(m['sleep_seconds'], 2)}
+                     for name, m in _metrics.items()}
+        breakers = dict(_breakers)
+    return {
+        'functions': functions,
+        'breakers': {key: breaker.state for key, breaker in breakers.items()}
+    }
+
+
+def _collect_metrics() -> list:
+    """
+    Převede retry_metrics() na metriky pro /api/metrics.
+    """
+    snapshot = retry_metrics()
+    functions = snapshot['functions']
+    families = []
+    for key in ('calls', 'attempts', 'retries', 'successes', 'failures', 'circuit_rejections'):
+        families.append((
+            f"diktator_gemini_{key}_total", 'counter', f"Gemini calls through with_retry: {key}",
+            [({'function': name}, m[key]) for name, m in functions.items()]
+        ))
+    families.append((
+        'diktator_gemini_retry_sleep_seconds_total', 'counter', 'Time spent sleeping between retries',
+        [({'function': name}, m['sleep_seconds']) for name, m in functions.items()]
+    ))
+    families.append((
+        'diktator_gemini_errors_total', 'counter', 'Gemini errors by class',
+        [({'function': name, 'error_class': error_class}, count)
+         for name, m in functions.items() for error_class, count in m['errors'].items()]
+    ))
+    families.append((
+        'diktator_gemini_breaker_open', 'gauge', 'Circuit breaker state (1 = open or half-open)',
+        [({'model': key}, 0 if state == 'closed' else 1) for key, state in snapshot['breakers'].items()]
+    ))
+    return families
+
+
+metrics.registry.register_collector(_collect_metrics)
+
+
+def with_retry(
+    breaker_key: str,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    base_delay: float = DEFAULT_BASE_DELAY,
+    max_delay: float = DEFAULT_MAX_DELAY,
+    deadline: float = DEFAULT_DEADLINE
 ):
     """
-    Dekorátor pro retry s exponential backoff.
-    
+    Dekorátor pro retry Gemini volání.
+
     Args:
-        max_retries: Maximální počet pokusů (včetně prvního)
-        initial_delay: Počáteční delay v sekundách
-        backoff_factor: Násobitel pro exponential backoff
-        max_delay: Maximální delay v sekundách
-    
+        breaker_key: Klíč sdíleného circuit breakeru (název modelu)
+        max_attempts: Maximální počet pokusů (včetně prvního)
+        base_delay: Minimální pauza mezi pokusy v sekundách
+        max_delay: Maximální pauza mezi pokusy v sekundách
+        deadline: Celkový časový rozpočet volání v sekundách
+
     Returns:
         Dekorovaná funkce s retry logikou
     """
     def decorator(func: Callable) -> Callable:
+        name = func.__name__
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs) -> Any:
-            delay = initial_delay
-            last_exception = None
-            
-            for attempt in range(1, max_retries + 1):
+            breaker = get_breaker(breaker_key)
+            give_up_at = time.monotonic() + deadline
+            delay = base_delay
+            _record(name, calls=1)
+
+            for attempt in range(1, max_attempts + 1):
+                try:
+                    pause = breaker.before_call()
+                except CircuitOpenError:
+                    _record(name, circuit_rejections=1, failures=1)
+                    raise
+
+                if pause:
+                    if time.monotonic() + pause > give_up_at:
+                        breaker.release_probe()
+                        _record(name, failures=1, error=RATE_LIMITED)
+                        raise TimeoutError(f"{name}: rate limited, retry-after exceeds deadline")
+                    _record(name, sleep_seconds=pause)
+                    time.sleep(pause)
+
+                _record(name, attempts=1)
                 try:
-                    logger.info(f"Attempt {attempt}/{max_retries} for {func.__name__}")
-                    result = func(*args, **kwargs)
-                    
-                    if attempt > 1:
-                        logger.info(f"{func.__name__} succeeded on attempt {attempt}")
-                    
-                    return result
-                    
+                    with metrics.timer(f"gemini:{name}"):
+                        result = func(*args, **kwargs)
                 except Exception as e:
-                    last_exception = e
-                    
-                    if attempt == max_retries:
-                        logger.error(f"{func.__name__} failed after {max_retries} attempts: {str(e)}")
+                    error_class = classify_error(e)
+                    server_delay = retry_after_seconds(e) if error_class == RATE_LIMITED else None
+                    if error_class == LOCAL_BUSY:
+                        # Request se k upstreamu vůbec nedostal - breaker (ani počet výpadků) neměníme
+                        breaker.release_probe()
+                    else:
+                        breaker.record_failure(error_class, server_delay)
+                    _record(name, error=error_class)
+
+                    if error_class == PERMANENT:
+                        _record(name, failures=1)
+                        raise
+
+                    # Decorrelated jitter: náhodně mezi base_delay a 3× předchozí pauzou
+                    delay = min(max_delay, random.uniform(base_delay, delay * 3))
+                    sleep_for = max(delay, server_delay or 0.0)
+                    remaining = give_up_at - time.monotonic()
+
+                    if attempt == max_attempts or sleep_for > remaining:
+                        logger.error(f"{name} failed after {attempt} attempt(s): {e}")
+                        _record(name, failures=1)
                         raise
-                    
-                    logger.warning(f"{func.__name__} failed on attempt {attempt}: {str(e)}")
-                    logger.info(f"Retrying in {delay:.1f} seconds...")
-                    
-                    time.sleep(delay)
-                    
-                    # Exponential backoff
-                    delay = min(delay * backoff_factor, max_delay)
-            
-            # Toto by nemělo nastat, ale pro jistotu
-            if last_exception:
-                raise last_exception
-                
+
+                    logger.warning(f"{name} failed on attempt {attempt} ({error_class}): {e}")
+                    logger.info(f"Retrying in {sleep_for:.1f} seconds...")
+                    _record(name, retries=1, sleep_seconds=sleep_for)
+                    time.sleep(sleep_for)
+                    continue
+
+                breaker.record_success()
+                _record(name, successes=1)
+                if attempt > 1:
+                    logger.info(f"{name} succeeded on attempt {attempt}")
+                return result
+
         return wrapper
     return decorator
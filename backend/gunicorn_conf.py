@@ -0,0 +1,50 @@
+"""
+Konfigurace gunicorn pro produkční provoz
+
+Spuštění (z kořene projektu):
+    gunicorn -c backend/gunicorn_conf.py
+
+Práce serveru je převážně I/O (Gemini API, gTTS, ffmpeg v podprocesu),
+proto se používají vláknové workery (gthread): málo procesů, hodně vláken.
+Vše lze přenastavit přes environment variables.
+"""
+import multiprocessing
+import os
+
+# Adresář s moduly backendu (app.py importuje dictation, tts_generator, ...)
+chdir = os.path.dirname(os.path.abspath(__file__))
+wsgi_app = 'app:create_app()'
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+
+# Workery - výchozí počet procesů podle CPU, ale max. 4 (hlavní zátěž je čekání na API)
+worker_class = 'gthread'
+workers = int(os.getenv('GUNICORN_WORKERS', min(4, multiprocessing.cpu_count() * 2)))
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+
+# Vyhodnocení s retry může trvat i několik minut
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 300))
+# Po SIGTERM mají rozběhnuté requesty tolik času na dokončení
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 60))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Volitelná recyklace workerů proti postupnému růstu paměti (audio buffery)
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 0))  # 0 = vypnuto
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 50))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def worker_exit(server, worker):
+    """
+    Při ukončení workeru počká na běžící úlohy z fronty a na dokončení
+    postupně generovaných audio souborů (jinak by zůstaly useknuté).
+
+    Úlohy, které ještě nezačaly, zůstanou na disku a spustí se po restartu.
+    """
+    from app import job_queue
+    from tts_generator import wait_for_progressive
+    job_queue.shutdown(wait=True)
+    wait_for_progressive(timeout=graceful_timeout)
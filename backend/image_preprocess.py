@@ -0,0 +1,98 @@
+"""
+Modul pro předzpracování fotek diktátů před uložením a OCR
+
+Fotka z telefonu má typicky 12+ Mpx a několik MB. Pro přečtení rukopisu
+stačí výrazně menší obrázek, proto se:
+- otočí podle EXIF orientace (telefony ukládají fotku naležato + příznak)
+- zmenší na max. rozměr OCR_IMAGE_MAX_DIM (JPEG se dekóduje rovnou
+  zmenšený přes draft mode, takže se nedekóduje celých 12 Mpx)
+- volitelně převede do odstínů šedi s automatickým kontrastem
+- uloží jako JPEG s kvalitou OCR_IMAGE_QUALITY
+"""
+from __future__ import annotations
+
+import io
+import os
+from typing import TYPE_CHECKING
+import metrics
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+# Výchozí nastavení
+DEFAULT_MAX_DIM = int(os.getenv('OCR_IMAGE_MAX_DIM', 2048))  # 0 = nezmenšovat
+DEFAULT_GRAYSCALE = os.getenv('OCR_IMAGE_GRAYSCALE', '1').lower() in ('1', 'true', 'yes')
+DEFAULT_QUALITY = int(os.getenv('OCR_IMAGE_QUALITY', 85))
+# Draft dekódování smí skončit až o 10 % pod max_dim (4032 px fotka -> 2016 px)
+DRAFT_TOLERANCE = 0.9
+
+
+def preprocess_image(
+    img: Image.Image,
+    max_dim: int = DEFAULT_MAX_DIM,
+    grayscale: bool = DEFAULT_GRAYSCALE
+) -> Image.Image:
+    """
+    Připraví otevřený obrázek pro OCR.
+
+    Args:
+        img: Obrázek otevřený přes Image.open (ještě nenačtený)
+        max_dim: Maximální delší strana v pixelech (0 = nezmenšovat)
+        grayscale: Převést do odstínů šedi a natáhnout kontrast
+
+    Returns:
+        Image.Image: Upravený obrázek v režimu RGB nebo L
+    """
+    # Pillow se načte až při prvním nahrání fotky, ne při importu aplikace
+    from PIL import Image, ImageOps
+
+    if img.format == 'JPEG':
+        # Dekódování rovnou ve zmenšeném měřítku (1/2, 1/4, 1/8) a u šedi jen
+        # jasové složky. Měřítko se zvolí tak, aby delší strana neklesla pod
+        # DRAFT_TOLERANCE * max_dim, dotažení na přesnou velikost řeší thumbnail.
+        width, height = img.size
+        scale = min(1.0, max_dim * DRAFT_TOLERANCE / max(width, height)) if max_dim else 1.0
+        img.draft('L' if grayscale else 'RGB', (int(width * scale), int(height * scale)))
+
+    img = ImageOps.exif_transpose(img)
+
+    if max_dim and max(img.size) > max_dim:
+        img.thumbnail((max_dim, max_dim), Image.LANCZOS)
+
+    if grayscale:
+        img = ImageOps.autocontrast(img.convert('L'), cutoff=1)
+    elif img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    return img
+
+
+def encode_jpeg(img: Image.Image, quality: int = DEFAULT_QUALITY) -> memoryview:
+    """
+    Zakóduje obrázek do JPEG (optimalizované Huffmanovy tabulky).
+
+    Vrací pohled přímo do bufferu (bez kopie), který lze zapsat do souboru,
+    zahashovat i poslat do OCR.
+    """
+    buffer = io.BytesIO()
+    img.save(buffer, 'JPEG', quality=quality, optimize=True)
+    return buffer.getbuffer()
+
+
+@metrics.timed('image_preprocess')
+def prepare_upload(stream, **options) -> memoryview:
+    """
+    Otevře nahranou fotku, předzpracuje ji a vrátí JPEG bajty.
+
+    Args:
+        stream: Soubor nebo stream s obrázkem (např. file.stream z Flasku)
+        **options: max_dim, grayscale, quality
+
+    Returns:
+        memoryview: JPEG připravený k uložení a OCR
+    """
+    from PIL import Image
+
+    quality = options.pop('quality', DEFAULT_QUALITY)
+    img = preprocess_image(Image.open(stream), **options)
+    return encode_jpeg(img, quality)
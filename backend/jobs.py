@@ -0,0 +1,231 @@
+"""
+Modul pro asynchronní zpracování dlouhých úloh (audio, vyhodnocení)
+
+Úloha se uloží jako JSON soubor do adresáře úloh a spustí se v poolu
+vláken. Stav (queued/running/done/failed), průběh a výsledek se průběžně
+zapisují do stejného souboru, takže je lze číst i z jiného procesu
+a nedokončené úlohy se po restartu serveru spustí znovu.
+"""
+import contextvars
+import json
+import logging
+import os
+import re
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+# Stavy úlohy
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+JOB_ID_PATTERN = re.compile(r'^job_[0-9]{8}_[0-9]{6}_[0-9a-f]{8}$')
+DEFAULT_RETENTION_DAYS = 7
+
+# Identifikace tohoto procesu v zámcích (PID se po restartu kontejneru opakuje)
+_PROCESS_TOKEN = f"{os.getpid()}:{uuid.uuid4().hex}"
+
+
+class JobQueue:
+    """
+    Fronta úloh perzistovaná na disku se zpracováním v poolu vláken.
+    """
+
+    def __init__(self, jobs_dir: str, max_workers: int = 2):
+        self.jobs_dir = jobs_dir
+        self.handlers = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        os.makedirs(jobs_dir, exist_ok=True)
+
+    def register(self, kind: str, handler: Callable):
+        """
+        Zaregistruje handler pro typ úlohy.
+
+        Handler dostane (payload, progress) a vrací výsledek (dict).
+        progress(fraction, message) zapíše průběh úlohy. Výjimka z handleru
+        označí úlohu jako failed.
+        """
+        self.handlers[kind] = handler
+
+    def submit(self, kind: str, payload: dict) -> dict:
+        """
+        Uloží novou úlohu a zařadí ji ke zpracování.
+
+        Returns:
+            dict: Záznam úlohy (obsahuje 'id')
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+
+        now = datetime.now()
+        job = {
+            'id': f"job_{now.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}",
+            'kind': kind,
+            'status': QUEUED,
+            'progress': 0.0,
+            'message': '',
+            'payload': payload,
+            'result': None,
+            'error': None,
+            'created_at': now.isoformat(),
+            'updated_at': now.isoformat()
+        }
+        self._write(job)
+        # Úloha běží v kontextu požadavku, který ji založil (trace id v logu)
+        self._executor.submit(contextvars.copy_context().run, self._run, job['id'])
+        return job
+
+    def get(self, job_id: str):
+        """
+        Vrátí záznam úlohy, nebo None pokud neexistuje.
+        """
+        if not JOB_ID_PATTERN.match(job_id):
+            return None
+        try:
+            with open(self._path(job_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def resume(self, retention_days: int = DEFAULT_RETENTION_DAYS):
+        """
+        Znovu zařadí nedokončené úlohy (po restartu) a smaže staré dokončené.
+        """
+        cutoff = datetime.now() - timedelta(days=retention_days)
+        resumed = 0
+
+        for name in sorted(os.listdir(self.jobs_dir)):
+            if not name.endswith('.json'):
+                continue
+            job = self.get(name[:-len('.json')])
+            if job is None:
+                continue
+
+            if job['status'] in (QUEUED, RUNNING):
+                self._executor.submit(self._run, job['id'])
+                resumed += 1
+            elif datetime.fromisoformat(job['updated_at']) < cutoff:
+                try:
+                    os.remove(self._path(job['id']))
+                except FileNotFoundError:
+                    pass
+
+        if resumed:
+            logger.info(f"Resumed {resumed} unfinished job(s) from {self.jobs_dir}")
+        return resumed
+
+    def shutdown(self, wait: bool = True):
+        """
+        Zastaví pool; nedokončené úlohy zůstanou na disku pro resume().
+        """
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _run(self, job_id: str):
+        # Zámek brání tomu, aby stejnou úlohu zpracovaly dva procesy
+        if not self._claim(job_id):
+            return
+
+        try:
+            job = self.get(job_id)
+            if job is None or job['status'] in (DONE, FAILED):
+                return
+
+            handler = self.handlers.get(job['kind'])
+            if handler is None:
+                self._update(job, status=FAILED, error=f"Unknown job kind: {job['kind']}")
+                return
+
+            self._update(job, status=RUNNING, message='started')
+
+            def progress(fraction: float, message: str = ''):
+                self._update(job, progress=round(min(1.0, max(0.0, fraction)), 3), message=message)
+
+            try:
+                result = handler(job['payload'], progress)
+                self._update(job, status=DONE, progress=1.0, message='done', result=result)
+            except Exception as e:
+                logger.exception(f"Job {job_id} failed: {e}")
+                self._update(job, status=FAILED, message='failed', error=str(e))
+        finally:
+            self._release(job_id)
+
+    def _update(self, job: dict, **fields):
+        with self._lock:
+            job.update(fields)
+            job['updated_at'] = datetime.now().isoformat()
+            self._write(job)
+
+    def _write(self, job: dict):
+        path = self._path(job['id'])
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(job, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _lock_path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.lock")
+
+    def _claim(self, job_id: str) -> bool:
+        lock_path = self._lock_path(job_id)
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            # Zámek po spadlém procesu převezmeme
+            if self._lock_owner_alive(lock_path):
+                return False
+            try:
+                os.remove(lock_path)
+            except FileNotFoundError:
+                pass
+            return self._claim(job_id)
+
+        with os.fdopen(fd, 'w') as f:
+            f.write(_PROCESS_TOKEN)
+        return True
+
+    def _release(self, job_id: str):
+        try:
+            os.remove(self._lock_path(job_id))
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _lock_owner_alive(lock_path: str) -> bool:
+        try:
+            with open(lock_path, 'r') as f:
+                token = f.read().strip()
+        except FileNotFoundError:
+            return False
+        if not token:
+            # Zámek právě vzniká v jiném procesu
+            return True
+        try:
+            pid = int(token.split(':', 1)[0])
+        except ValueError:
+            return False
+        if pid == os.getpid():
+            return token == _PROCESS_TOKEN
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+
+def public_job_view(job: dict) -> dict:
+    """
+    Vrátí záznam úlohy bez vstupních dat (payload) pro API.
+    """
+    return {key: value for key, value in job.items() if key != 'payload'}
@@ -1,30 +1,49 @@
 #!/usr/bin/env python3
 """
 Skript pro ruční vyhodnocení diktátu z existující fotky
+
+Jedna fotka:
+    python manual_evaluate.py <dictation_soubor> <fotka>
+Celá třída (adresář fotek k jednomu diktátu, nebo manifest):
+    python manual_evaluate.py --batch <adresář|manifest> [--dictation <dictation_soubor>]
 """
+import argparse
+import csv
+import hashlib
+import re
 import sys
 import os
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from ocr_processor import extract_text_from_image
 from evaluator import evaluate_dictation
+from evaluation_store import EvaluationStore
+from image_preprocess import prepare_upload
 from datetime import datetime
 
 # Cesty
 BASE_DIR = Path(__file__).parent.parent
-DATA_DIR = BASE_DIR / 'data'
+# DATA_DIR jako v app.py, aby CLI zapisovalo do stejného úložiště a indexu jako server
+DATA_DIR = Path(os.getenv('DATA_DIR') or BASE_DIR / 'data')
 DICTATIONS_DIR = DATA_DIR / 'dictations'
 UPLOADS_DIR = DATA_DIR / 'uploads'
 EVALUATIONS_DIR = DATA_DIR / 'evaluations'
 
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp'}
+# Souběžnost dávky - skutečná volání Gemini stejně omezuje gemini_gateway
+DEFAULT_BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', 4))
+
 
-def manual_evaluate(dictation_file: str, image_file: str):
+def manual_evaluate(dictation_file: str, image_file: str, refresh_ocr: bool = False):
     """
     Vyhodnotí diktát z existujících souborů
     
     Args:
         dictation_file: Název dictation JSON souboru (např. dictation_grade6_20251120_152322.json)
         image_file: Název fotky (např. evaluation_20251120_152809.jpg)
+        refresh_ocr: Přečíst fotku znovu i když je výsledek v OCR cache
     """
     
     # Načtení dictation souboru
@@ -33,8 +52,7 @@ def manual_evaluate(dictation_file: str, image_file: str):
         print(f"❌ Dictation soubor nenalezen: {dictation_path}")
         return False
     
-    with open(dictation_path, 'r', encoding='utf-8') as f:
-        dictation = json.load(f)
+    dictation = _load_dictation(dictation_file)
     
     original_text = dictation.get('full_text', '')
     if not original_text:
@@ -55,14 +73,15 @@ def manual_evaluate(dictation_file: str, image_file: str):
     
     # OCR - extrakce textu
     print("\n📸 Provádím OCR (čtení textu z fotky)...")
-    ocr_result = extract_text_from_image(str(image_path))
+    ocr_result = extract_text_from_image(str(image_path), use_cache=not refresh_ocr)
     
     if 'error' in ocr_result:
         print(f"❌ OCR selhalo: {ocr_result['error']}")
         return False
     
     written_text = ocr_result['extracted_text']
-    print(f"✓ Text úspěšně přečten z fotky ({len(written_text)} znaků)")
+    source = " (z OCR cache)" if ocr_result.get('cached') else ""
+    print(f"✓ Text úspěšně přečten z fotky ({len(written_text)} znaků){source}")
     
     # Vyhodnocení
     print("\n🤖 Vyhodnocuji diktát pomocí LLM...")
@@ -73,24 +92,12 @@ def manual_evaluate(dictation_file: str, image_file: str):
         return False
     
     # Přidání metadat
-    evaluation['image_filename'] = image_file
-    evaluation['ocr_text'] = written_text
+    _add_metadata(evaluation, dictation, dictation_file, image_file, written_text)
+    eval_filename = _eval_filename(image_file)
     
-    # Odvození audio filename z dictation souboru
-    timestamp = dictation_file.replace('dictation_grade', 'dictation_').replace('.json', '').replace('dictation_', '')
-    audio_filename = f"dictation_{timestamp}.mp3"
-    audio_path = DATA_DIR / 'audio' / audio_filename
-    if audio_path.exists():
-        evaluation['audio_file'] = audio_filename
-    
-    # Uložení evaluation
-    # Použijeme timestamp z fotky pro konzistenci
-    eval_timestamp = image_file.replace('evaluation_', '').replace('.jpg', '')
-    eval_filename = f"evaluation_{eval_timestamp}.json"
-    eval_path = EVALUATIONS_DIR / eval_filename
-    
-    with open(eval_path, 'w', encoding='utf-8') as f:
-        json.dump(evaluation, f, ensure_ascii=False, indent=2)
+    # Uložení do JSON souboru i do indexu pro /api/evaluations
+    store = EvaluationStore(str(EVALUATIONS_DIR), str(DATA_DIR / 'audio'))
+    store.save(evaluation, eval_filename)
     
     print(f"✓ Vyhodnocení uloženo: {eval_filename}")
     
@@ -110,24 +117,253 @@ def manual_evaluate(dictation_file: str, image_file: str):
     return True
 
 
+def _load_dictation(dictation_file: str) -> dict:
+    with open(DICTATIONS_DIR / dictation_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _add_metadata(evaluation: dict, dictation: dict, dictation_file: str, image_file: str, written_text: str):
+    """
+    Doplní do vyhodnocení fotku, OCR text, ročník a odkaz na audio.
+    """
+    evaluation['image_filename'] = image_file
+    evaluation['ocr_text'] = written_text
+    if dictation.get('grade'):
+        evaluation['grade'] = dictation['grade']
+    
+    # Odvození audio filename z dictation souboru
+    timestamp = dictation_file.replace('dictation_grade', 'dictation_').replace('.json', '').replace('dictation_', '')
+    audio_filename = f"dictation_{timestamp}.mp3"
+    audio_path = DATA_DIR / 'audio' / audio_filename
+    if audio_path.exists():
+        evaluation['audio_file'] = audio_filename
+
+
+def _eval_filename(image_file: str) -> str:
+    # Použijeme název fotky (bez přípony) pro konzistenci; id musí projít EVALUATION_ID_PATTERN
+    eval_id = re.sub(r'[^\w-]', '_', Path(image_file).stem.replace('evaluation_', '', 1))
+    return f"evaluation_{eval_id}.json"
+
+
+def _load_batch(source: Path, dictation_file: str | None) -> list[tuple[str, Path]]:
+    """
+    Načte dvojice (dictation soubor, cesta k fotce) z adresáře nebo manifestu.
+    
+    - adresář: všechny fotky v něm, všechny k jednomu dictation souboru (--dictation)
+    - manifest .csv: řádky "dictation,image" (hlavička volitelná)
+    - manifest .json: [{"dictation": "...", "image": "..."}, ...]
+    
+    Fotky z manifestu se hledají relativně k manifestu, jinak v data/uploads.
+    """
+    if source.is_dir():
+        if not dictation_file:
+            raise ValueError("Pro adresář s fotkami je potřeba --dictation <dictation_soubor>")
+        images = sorted(p for p in source.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+        return [(dictation_file, image) for image in images]
+    
+    if source.suffix.lower() == '.json':
+        with open(source, 'r', encoding='utf-8') as f:
+            rows = [(item.get('dictation') or dictation_file, item['image']) for item in json.load(f)]
+    else:
+        with open(source, 'r', encoding='utf-8', newline='') as f:
+            rows = [(row[0].strip() or dictation_file, row[1].strip())
+                    for row in csv.reader(f) if len(row) >= 2 and row[0].strip() != 'dictation']
+    
+    pairs = []
+    for dictation, image in rows:
+        if not dictation:
+            raise ValueError(f"Chybí dictation soubor pro fotku {image}")
+        image_path = source.parent / image
+        pairs.append((dictation, image_path if image_path.exists() else UPLOADS_DIR / image))
+    return pairs
+
+
+def _import_image(image_path: Path) -> str:
+    """
+    Vrátí název fotky v data/uploads; fotky odjinud tam zkopíruje
+    (předzpracované stejně jako při uploadu přes API).
+    """
+    if image_path.parent.resolve() == UPLOADS_DIR.resolve():
+        return image_path.name
+    
+    # Deterministický název, aby navázání po pádu nevytvářelo kopie
+    safe_stem = re.sub(r'[^\w-]', '_', image_path.stem)
+    digest = hashlib.sha1(str(image_path.resolve()).encode('utf-8')).hexdigest()[:8]
+    image_file = f"evaluation_batch_{safe_stem}_{digest}.jpg"
+    target = UPLOADS_DIR / image_file
+    if not target.exists():
+        UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
+        with open(image_path, 'rb') as f:
+            image_bytes = prepare_upload(f)
+        tmp_path = target.with_suffix('.jpg.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(image_bytes)
+        os.replace(tmp_path, target)
+    return image_file
+
+
+def _evaluate_one(dictation: dict, dictation_file: str, image_path: Path, refresh_ocr: bool) -> tuple[dict, str]:
+    """
+    OCR + vyhodnocení jedné fotky (pro dávku, chyby jako výjimky).
+    """
+    if not image_path.exists():
+        raise FileNotFoundError(f"Fotka nenalezena: {image_path}")
+    image_file = _import_image(image_path)
+    
+    ocr_result = extract_text_from_image(str(UPLOADS_DIR / image_file), use_cache=not refresh_ocr)
+    if 'error' in ocr_result:
+        raise RuntimeError(f"OCR selhalo: {ocr_result['error']}")
+    written_text = ocr_result['extracted_text']
+    
+    evaluation = evaluate_dictation(dictation['full_text'], written_text)
+    if 'error' in evaluation:
+        raise RuntimeError(f"Vyhodnocení selhalo: {evaluation['error']}")
+    
+    _add_metadata(evaluation, dictation, dictation_file, image_file, written_text)
+    return evaluation, _eval_filename(image_file)
+
+
+def batch_evaluate(source: str, dictation_file: str | None = None, workers: int = DEFAULT_BATCH_WORKERS,
+                   refresh_ocr: bool = False) -> bool:
+    """
+    Vyhodnotí celou třídu najednou.
+    
+    Fotky se zpracovávají souběžně (max. `workers` najednou, OCR jedné fotky
+    se tak překrývá s vyhodnocením jiné). Každý hotový výsledek se hned
+    zapíše do checkpointu, po pádu se dávka spuštěná se stejnými argumenty
+    naváže. Na konci se vše uloží do evaluation store jednou transakcí.
+    
+    Args:
+        source: Adresář s fotkami nebo manifest (.csv / .json)
+        dictation_file: Dictation soubor pro adresář (nebo výchozí pro manifest)
+        workers: Max. počet souběžně zpracovávaných fotek
+        refresh_ocr: Přečíst fotky znovu i když jsou v OCR cache
+    """
+    source_path = Path(source)
+    try:
+        pairs = _load_batch(source_path, dictation_file)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"❌ Nelze načíst dávku: {e}")
+        return False
+    
+    if not pairs:
+        print("❌ V dávce nejsou žádné fotky")
+        return False
+    
+    # Načtení dictation souborů (každý jednou)
+    dictations = {}
+    for dictation in sorted({dictation for dictation, _ in pairs}):
+        if not (DICTATIONS_DIR / dictation).exists():
+            print(f"❌ Dictation soubor nenalezen: {DICTATIONS_DIR / dictation}")
+            return False
+        dictations[dictation] = _load_dictation(dictation)
+        if not dictations[dictation].get('full_text'):
+            print(f"❌ V dictation souboru {dictation} chybí full_text")
+            return False
+    
+    # Checkpoint hotových výsledků (JSON lines), klíčem je cesta k fotce
+    batch_id = hashlib.sha1(f"{source_path.resolve()}|{dictation_file}".encode('utf-8')).hexdigest()[:12]
+    checkpoint_path = EVALUATIONS_DIR / '.batch' / f"{batch_id}.jsonl"
+    checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+    done = {}
+    if checkpoint_path.exists():
+        with open(checkpoint_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    done[entry['image_path']] = (entry['evaluation'], entry['eval_filename'])
+                except (json.JSONDecodeError, KeyError):
+                    continue  # Neúplný poslední řádek po pádu
+        print(f"↻ Navazuji na checkpoint, hotové fotky: {len(done)}")
+    
+    pending = [(dictation, image) for dictation, image in pairs if str(image) not in done]
+    total = len(pairs)
+    failed = []
+    started = time.monotonic()
+    print(f"📚 Dávka: fotky celkem {total}, zbývá {len(pending)}, souběžně {workers}\n")
+    
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor, \
+            open(checkpoint_path, 'a', encoding='utf-8') as checkpoint:
+        futures = {
+            executor.submit(_evaluate_one, dictations[dictation], dictation, image, refresh_ocr): image
+            for dictation, image in pending
+        }
+        for future in as_completed(futures):
+            image = futures[future]
+            try:
+                evaluation, eval_filename = future.result()
+            except Exception as e:
+                failed.append(image)
+                print(f"❌ [{len(done) + len(failed)}/{total}] {image.name}: {e}")
+                continue
+            
+            done[str(image)] = (evaluation, eval_filename)
+            checkpoint.write(json.dumps({
+                'image_path': str(image),
+                'evaluation': evaluation,
+                'eval_filename': eval_filename
+            }, ensure_ascii=False) + '\n')
+            checkpoint.flush()
+            os.fsync(checkpoint.fileno())
+            
+            finished = len(done) + len(failed)
+            elapsed = time.monotonic() - started
+            remaining = elapsed / max(1, finished - (total - len(pending))) * (total - finished)
+            score = evaluation.get('score')
+            print(f"✓ [{finished}/{total}] {image.name}: skóre {score if score is not None else '?'}"
+                  f"  (zbývá ~{remaining:.0f} s)")
+    
+    # Uložení všech výsledků do JSON souborů a indexu jednou transakcí
+    store = EvaluationStore(str(EVALUATIONS_DIR), str(DATA_DIR / 'audio'))
+    store.save_many(list(done.values()))
+    print(f"\n✓ Uložená vyhodnocení: {len(done)}")
+    
+    if failed:
+        print(f"❌ Nevyhodnocené fotky ({len(failed)}), spusťte dávku znovu (hotové se přeskočí):")
+        for image in failed:
+            print(f"   {image}")
+        return False
+    
+    checkpoint_path.unlink(missing_ok=True)
+    scores = [evaluation['score'] for evaluation, _ in done.values() if evaluation.get('score') is not None]
+    if scores:
+        print(f"🎯 Průměrné skóre třídy: {sum(scores) / len(scores):.1f}/100")
+    print("\n✅ Hotovo! Diktáty se zobrazí na /predesle")
+    return True
+
+
 if __name__ == '__main__':
-    if len(sys.argv) < 3:
-        print("Použití:")
-        print(f"  python {sys.argv[0]} <dictation_soubor> <fotka>")
-        print()
-        print("Příklad:")
-        print(f"  python {sys.argv[0]} dictation_grade6_20251120_152322.json evaluation_20251120_152809.jpg")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(
+        description='diktátOR - ruční vyhodnocení diktátu z existující fotky',
+        epilog=(
+            "Příklady:\n"
+            f"  python {sys.argv[0]} dictation_grade6_20251120_152322.json evaluation_20251120_152809.jpg\n"
+            f"  python {sys.argv[0]} --batch fotky_6A/ --dictation dictation_grade6_20251120_152322.json\n"
+            f"  python {sys.argv[0]} --batch manifest.csv --workers 6"
+        ),
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('dictation_file', nargs='?', help='Dictation soubor (např. dictation_grade6_20251120_152322.json)')
+    parser.add_argument('image_file', nargs='?', help='Fotka v data/uploads (např. evaluation_20251120_152809.jpg)')
+    parser.add_argument('--batch', metavar='ZDROJ', help='Adresář s fotkami nebo manifest (.csv "dictation,image" / .json)')
+    parser.add_argument('--dictation', help='Dictation soubor pro dávku z adresáře')
+    parser.add_argument('--workers', type=int, default=DEFAULT_BATCH_WORKERS, help='Počet souběžně zpracovávaných fotek')
+    parser.add_argument('--refresh-ocr', action='store_true', help='Přečíst fotku znovu, i když je výsledek v OCR cache')
+    args = parser.parse_args()
     
-    dictation_file = sys.argv[1]
-    image_file = sys.argv[2]
+    if not args.batch and not (args.dictation_file and args.image_file):
+        parser.print_help()
+        sys.exit(1)
     
     print("=" * 60)
     print("diktátOR - Ruční vyhodnocení diktátu")
     print("=" * 60)
     print()
     
-    success = manual_evaluate(dictation_file, image_file)
+    if args.batch:
+        success = batch_evaluate(args.batch, args.dictation or args.dictation_file, args.workers, args.refresh_ocr)
+    else:
+        success = manual_evaluate(args.dictation_file, args.image_file, refresh_ocr=args.refresh_ocr)
     
     if success:
         sys.exit(0)
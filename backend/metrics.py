@@ -0,0 +1,227 @@
+"""
+Modul pro metriky (latence a propustnost jednotlivých fází) a trace id
+
+Každá fáze pipeline (generování vět, gTTS, dekódování/kódování MP3,
+předzpracování fotky, OCR, vyhodnocení, zápis výsledku, jednotlivé pokusy
+volání Gemini) se měří přes timer(stage) / @timed(stage) do histogramu
+diktator_stage_duration_seconds a počítadla chyb. render() vrací vše
+v textovém formátu Prometheus pro /api/metrics.
+
+Trace id požadavku se drží v ContextVar a logging filtr ho doplní do
+každého záznamu logu ([trace_id]). Do vláken poolu se předává přes
+contextvars.copy_context() (fronta úloh, souběžné OCR stránek).
+
+Metriky jsou pro jeden proces - při více gunicorn workerech má každý
+worker vlastní hodnoty (Prometheus je sčítá podle instance).
+"""
+import contextvars
+import functools
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable
+
+# Hranice histogramů v sekundách (od rychlých lokálních fází po pomalé LLM volání)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+LOG_FORMAT = '%(asctime)s %(levelname)s [%(trace_id)s] %(name)s: %(message)s'
+
+_trace_id = contextvars.ContextVar('trace_id', default='-')
+
+
+class Histogram:
+    """
+    Histogram s pevnými hranicemi (kumulativní buckety jako v Prometheu).
+    """
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    """
+    Počítadla a histogramy podle (název, štítky) a collectory pro metriky jiných modulů.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+        self._collectors = []
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def register_collector(self, collector: Callable):
+        """
+        Přidá collector - funkci vracející [(název, typ, nápověda, [(štítky, hodnota)])].
+
+        Slouží pro metriky, které si jiný modul počítá sám (retry, cache, limiter).
+        """
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """
+        Vrátí všechny metriky v textovém formátu Prometheus.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (h.buckets, list(h.counts), h.total, h.sum) for key, h in self._histograms.items()}
+
+        lines = []
+        for name, samples in _group(counters).items():
+            lines += self._header(name, 'counter')
+            lines += [f"{name}{_labels(labels)} {_number(value)}" for labels, value in samples]
+
+        for name, samples in _group(histograms).items():
+            lines += self._header(name, 'histogram')
+            for labels, (buckets, counts, total, total_sum) in samples:
+                for bound, count in zip(buckets, counts):
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', _number(bound)),))} {count}")
+                lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {total}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(total_sum)}")
+                lines.append(f"{name}_count{_labels(labels)} {total}")
+
+        for collector in self._collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                logging.getLogger(__name__).warning(f"Metrics collector failed: {e}")
+                continue
+            for name, metric_type, help_text, samples in families:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                lines += [f"{name}{_labels(tuple(sorted(labels.items())))} {_number(value)}"
+                          for labels, value in samples]
+
+        return '\n'.join(lines) + '\n'
+
+    def _header(self, name: str, metric_type: str) -> list[str]:
+        help_text = self._help.get(name, name)
+        return [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+
+
+def _group(series: dict) -> dict:
+    grouped = {}
+    for (name, labels), value in sorted(series.items()):
+        grouped.setdefault(name, []).append((labels, value))
+    return grouped
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+registry = MetricsRegistry()
+registry.describe('diktator_stage_duration_seconds', 'Duration of pipeline stages')
+registry.describe('diktator_stage_errors_total', 'Pipeline stages that raised an exception')
+registry.describe('diktator_http_request_duration_seconds', 'HTTP request duration by endpoint')
+registry.describe('diktator_http_requests_total', 'HTTP requests by endpoint, method and status')
+
+
+@contextmanager
+def timer(stage: str):
+    """
+    Změří dobu bloku jako fázi `stage` (výjimka se započítá do chyb a propaguje).
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        # GeneratorExit (zavřený stream) ani KeyboardInterrupt nejsou chybou fáze
+        record_error(stage)
+        raise
+    finally:
+        registry.observe('diktator_stage_duration_seconds', time.perf_counter() - start, stage=stage)
+
+
+def record_error(stage: str):
+    """
+    Započítá chybu fáze, která chybu nevyhazuje, ale vrací ({'error': ...}).
+    """
+    registry.inc('diktator_stage_errors_total', stage=stage)
+
+
+def timed(stage: str):
+    """
+    Dekorátor: každé volání funkce se měří jako fáze `stage`.
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def get_trace_id() -> str:
+    return _trace_id.get()
+
+
+def set_trace_id(trace_id: str | None = None) -> str:
+    """
+    Nastaví trace id pro aktuální kontext (request, úlohu), vrátí ho.
+    """
+    trace_id = trace_id or new_trace_id()
+    _trace_id.set(trace_id)
+    return trace_id
+
+
+class TraceIdFilter(logging.Filter):
+    """
+    Doplní do záznamu logu atribut trace_id z aktuálního kontextu.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = _trace_id.get()
+        return True
+
+
+def configure_logging(level: int = logging.INFO):
+    """
+    Nastaví root logger tak, aby každý záznam nesl trace id požadavku.
+    """
+    root = logging.getLogger()
+    if not root.handlers:
+        logging.basicConfig(level=level)
+    for handler in root.handlers:
+        if not any(isinstance(f, TraceIdFilter) for f in handler.filters):
+            handler.addFilter(TraceIdFilter())
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
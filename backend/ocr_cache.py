@@ -0,0 +1,157 @@
+"""
+Modul pro perzistentní cache výsledků OCR
+
+Klíčem je hash z (SHA-256 bajtů obrázku, model, verze promptu), hodnotou
+je přečtený text. Opakované vyhodnocení stejné fotky (manual_evaluate.py,
+opětovné odeslání z telefonu, retry uploadu) tak stojí jen výpočet hashe
+místo dalšího volání Gemini. Záznamy starší než TTL se ignorují, při
+překročení počtu záznamů se mažou nejdéle nepoužité (LRU podle mtime).
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Výchozí nastavení
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.getenv('DATA_DIR') or os.path.join(os.path.dirname(BASE_DIR), 'data')
+DEFAULT_CACHE_DIR = os.path.join(DATA_DIR, 'ocr_cache')
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_TTL_DAYS = 30
+
+
+class OcrCache:
+    """
+    On-disk LRU cache výsledků OCR s TTL a počítadly zásahů.
+    """
+
+    def __init__(self, cache_dir: str, max_entries: int, ttl_seconds: float):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = None  # Spočítá se líně při prvním zápisu
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(image_bytes, model: str, prompt_version: str) -> str:
+        """
+        Vytvoří klíč cache z obsahu obrázku, modelu a verze promptu.
+        """
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        payload = json.dumps([digest, model, str(prompt_version)])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str):
+        """
+        Vrátí přečtený text z cache, nebo None při minutí / prošlém záznamu.
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            if time.time() - entry['cached_at'] > self.ttl_seconds:
+                os.remove(path)
+                raise FileNotFoundError(path)
+            # Označíme záznam jako čerstvě použitý (LRU)
+            os.utime(path, None)
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return entry['extracted_text']
+
+    def put(self, key: str, extracted_text: str, model: str):
+        """
+        Uloží výsledek OCR do cache a případně uvolní místo.
+        """
+        path = self._path(key)
+        existed = os.path.exists(path)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'extracted_text': extracted_text,
+                'model': model,
+                'cached_at': time.time()
+            }, f, ensure_ascii=False)
+        # Atomické nahrazení, aby souběžné čtení nevidělo poloviční soubor
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._count()
+            elif not existed:
+                self._entries += 1
+            if self._entries > self.max_entries:
+                self._evict()
+
+    def _count(self) -> int:
+        return sum(1 for entry in os.scandir(self.cache_dir) if entry.name.endswith('.json'))
+
+    def _evict(self):
+        """
+        Smaže nejdéle nepoužité záznamy, dokud jich nezbude max. 90 % limitu.
+        """
+        entries = [e for e in os.scandir(self.cache_dir) if e.name.endswith('.json')]
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        target = int(self.max_entries * 0.9)
+        count = len(entries)
+
+        for entry in entries:
+            if count <= target:
+                break
+            try:
+                os.remove(entry.path)
+                count -= 1
+                self.evictions += 1
+            except FileNotFoundError:
+                continue
+
+        self._entries = count
+
+    def stats(self) -> dict:
+        """
+        Vrátí počítadla zásahů/minutí a aktuální počet záznamů.
+        """
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._count()
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else None,
+                'entries': self._entries,
+                'max_entries': self.max_entries
+            }
+
+
+_ocr_cache = None
+_ocr_cache_lock = threading.Lock()
+
+
+def get_ocr_cache():
+    """
+    Vrátí sdílenou instanci cache, nebo None pokud je cache vypnutá (OCR_CACHE_MAX_ENTRIES=0).
+    """
+    global _ocr_cache
+    with _ocr_cache_lock:
+        if _ocr_cache is None:
+            max_entries = int(os.getenv('OCR_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES))
+            if max_entries <= 0:
+                return None
+            cache_dir = os.getenv('OCR_CACHE_DIR', DEFAULT_CACHE_DIR)
+            ttl_days = float(os.getenv('OCR_CACHE_TTL_DAYS', DEFAULT_TTL_DAYS))
+            _ocr_cache = OcrCache(cache_dir, max_entries, ttl_days * 24 * 3600)
+        return _ocr_cache
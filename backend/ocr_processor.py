@@ -5,29 +5,43 @@ Používá Google Gemini pro přímé OCR z obrázků.
 - Výborné výsledky, podobné Google Lens
 - Zachovává původní chyby v psaní pro následné hodnocení
 """
-from google import genai
 from datetime import datetime
+import contextvars
+import hashlib
+import logging
 import os
-from dotenv import load_dotenv
-from gemini_retry import retry_with_backoff
+from concurrent.futures import ThreadPoolExecutor
+import gemini_gateway
+import metrics
+from gemini_retry import with_retry
+from ocr_cache import OcrCache, get_ocr_cache
 
-# Načtení environment variables z .env souboru
-load_dotenv()
-
-# Konfigurace Google Gemini klienta
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY not found in environment variables. Please set it in .env file.")
+logger = logging.getLogger(__name__)
 
 GEMINI_OCR_MODEL = os.getenv('GEMINI_OCR_MODEL', 'gemini-2.5-flash')
 
-gemini_client = genai.Client(api_key=GEMINI_API_KEY)
+# Prompt pro OCR - při jakékoli změně zvyšte OCR_PROMPT_VERSION (je součástí klíče OCR cache)
+OCR_PROMPT_VERSION = '1'
+OCR_PROMPT = """Přečti prosím text z tohoto obrázku diktátu od žáka základní školy.
+
+DŮLEŽITÉ INSTRUKCE:
+- Přečti PŘESNĚ to, co tam dítě napsalo - znak po znaku
+- NEUPRAVUJ gramatiku ani pravopis!
+- Pokud je slovo napsané špatně, zapiš ho špatně
+- Zachovej všechny chyby v psaní
+- Vrať text větu po větě, každou na novém řádku
+- Nepiš nic dalšího, jen samotný přečtený text"""
+OCR_PAGES_PROMPT = OCR_PROMPT + """
+- Obrázky jsou postupně stránky jednoho diktátu, přečti je v pořadí, v jakém jsou poslané, a text navaž"""
+
+# Více stránek: 'parallel' = každá stránka zvlášť a souběžně, 'single' = všechny v jednom requestu
+OCR_MULTIPAGE_MODE = os.getenv('OCR_MULTIPAGE_MODE', 'parallel')
 
 
-@retry_with_backoff(max_retries=5, initial_delay=1.0, backoff_factor=2.0, max_delay=60.0)
+@with_retry(breaker_key=GEMINI_OCR_MODEL)
 def _call_gemini_ocr_api(image_bytes: bytes, mime_type: str, prompt: str) -> str:
     """
-    Volá Gemini API pro OCR s retry/backoff logikou.
+    Volá Gemini API pro OCR s retry logikou.
     
     Args:
         image_bytes: Bytes obrázku
@@ -37,10 +51,12 @@ def _call_gemini_ocr_api(image_bytes: bytes, mime_type: str, prompt: str) -> str
     Returns:
         str: Extrahovaný text z obrázku
     """
-    response = gemini_client.models.generate_content(
+    from google.genai import types
+
+    response = gemini_gateway.generate_content(
         model=GEMINI_OCR_MODEL,
         contents=[
-            genai.types.Part.from_bytes(
+            types.Part.from_bytes(
                 data=image_bytes,
                 mime_type=mime_type
             ),
@@ -54,67 +70,202 @@ def _call_gemini_ocr_api(image_bytes: bytes, mime_type: str, prompt: str) -> str
         raise ValueError("No text in response from Gemini API")
 
 
-def extract_text_from_image(image_path: str) -> dict:
+MIME_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp'
+}
+
+
+@with_retry(breaker_key=GEMINI_OCR_MODEL)
+def _call_gemini_ocr_pages_api(pages: list, prompt: str) -> str:
+    """
+    Volá Gemini API pro OCR více stránek najednou (jeden request, obrázky v pořadí stránek).
+    
+    Args:
+        pages: Seznam dvojic (image_bytes, mime_type)
+        prompt: Prompt pro OCR
+        
+    Returns:
+        str: Extrahovaný text ze všech stránek
+    """
+    from google.genai import types
+
+    parts = [types.Part.from_bytes(data=image_bytes, mime_type=mime_type) for image_bytes, mime_type in pages]
+    response = gemini_gateway.generate_content(
+        model=GEMINI_OCR_MODEL,
+        contents=parts + [prompt]
+    )
+    
+    if hasattr(response, 'text') and response.text:
+        return response.text.strip()
+    else:
+        raise ValueError("No text in response from Gemini API")
+
+
+def extract_text_from_image(image_path: str, use_cache: bool = True) -> dict:
     """
     Extrahuje text přímo z obrázku pomocí Google Gemini.
     
     Args:
         image_path: Cesta k obrázku
+        use_cache: False = nečíst z OCR cache a obrázek přečíst znovu
     
     Returns:
-        dict: {
-            'extracted_text': str,
-            'method': str,
-            'timestamp': str
-        }
+        dict: viz extract_text_from_bytes
     """
     try:
         # Načtení obrázku jako bytes
         with open(image_path, 'rb') as image_file:
             image_bytes = image_file.read()
-        
-        # Určení MIME typu
-        ext = os.path.splitext(image_path)[1].lower()
-        mime_types = {
-            '.jpg': 'image/jpeg',
-            '.jpeg': 'image/jpeg',
-            '.png': 'image/png',
-            '.gif': 'image/gif',
-            '.webp': 'image/webp'
+    except Exception as e:
+        logger.exception(f"Reading image {image_path} failed: {e}")
+        return {
+            'error': str(e),
+            'timestamp': datetime.now().isoformat()
         }
-        mime_type = mime_types.get(ext, 'image/jpeg')
-        
-        # Prompt pro OCR
-        prompt = """Přečti prosím text z tohoto obrázku diktátu od žáka základní školy.
+    
+    # Určení MIME typu
+    ext = os.path.splitext(image_path)[1].lower()
+    mime_type = MIME_TYPES.get(ext, 'image/jpeg')
+    
+    return extract_text_from_bytes(image_bytes, mime_type, use_cache=use_cache)
 
-DŮLEŽITÉ INSTRUKCE:
-- Přečti PŘESNĚ to, co tam dítě napsalo - znak po znaku
-- NEUPRAVUJ gramatiku ani pravopis!
-- Pokud je slovo napsané špatně, zapiš ho špatně
-- Zachovej všechny chyby v psaní
-- Vrať text větu po větě, každou na novém řádku
-- Nepiš nic dalšího, jen samotný přečtený text"""
+
+@metrics.timed('ocr')
+def extract_text_from_bytes(image_bytes, mime_type: str = 'image/jpeg', use_cache: bool = True) -> dict:
+    """
+    Extrahuje text z obrázku v paměti (bez čtení z disku).
+    
+    Args:
+        image_bytes: Obrázek jako bytes nebo memoryview
+        mime_type: MIME typ obrázku
+        use_cache: False = nečíst z OCR cache a obrázek přečíst znovu
+    
+    Returns:
+        dict: {
+            'extracted_text': str,
+            'method': str,
+            'cached': bool,  # Výsledek pochází z OCR cache
+            'timestamp': str
+        }
+    """
+    try:
+        # Cache výsledků podle obsahu obrázku (use_cache=False vynutí nové čtení)
+        cache = get_ocr_cache()
+        cache_key = OcrCache.make_key(image_bytes, GEMINI_OCR_MODEL, OCR_PROMPT_VERSION)
+        extracted_text = cache.get(cache_key) if cache and use_cache else None
+        cached = extracted_text is not None
         
-        # Volání Google Gemini API s retry/backoff logikou
-        extracted_text = _call_gemini_ocr_api(image_bytes, mime_type, prompt)
+        if not cached:
+            # Volání Google Gemini API s retry logikou (SDK vyžaduje bytes)
+            if isinstance(image_bytes, memoryview):
+                image_bytes = image_bytes.tobytes()
+            extracted_text = _call_gemini_ocr_api(image_bytes, mime_type, OCR_PROMPT)
+            if cache:
+                cache.put(cache_key, extracted_text, GEMINI_OCR_MODEL)
         
         result = {
             'extracted_text': extracted_text,
             'method': f'gemini ({GEMINI_OCR_MODEL})',
+            'cached': cached,
             'timestamp': datetime.now().isoformat()
         }
         
         return result
         
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"OCR failed: {e}")
+        metrics.record_error('ocr')
         return {
             'error': str(e),
             'timestamp': datetime.now().isoformat()
         }
 
 
+
+def extract_text_from_pages(pages: list, use_cache: bool = True, mode: str | None = None) -> dict:
+    """
+    Extrahuje text z více stránek jednoho diktátu a spojí ho v pořadí stránek.
+    
+    Args:
+        pages: Seznam dvojic (image_bytes, mime_type) v pořadí stránek
+        use_cache: False = nečíst z OCR cache a stránky přečíst znovu
+        mode: 'parallel' (stránky souběžně, každá zvlášť) nebo 'single'
+              (jeden request se všemi stránkami); výchozí OCR_MULTIPAGE_MODE
+    
+    Returns:
+        dict: jako extract_text_from_bytes, navíc 'pages' (počet stránek)
+    """
+    if len(pages) == 1:
+        result = extract_text_from_bytes(pages[0][0], pages[0][1], use_cache=use_cache)
+        if 'error' not in result:
+            result['pages'] = 1
+        return result
+    
+    mode = mode or OCR_MULTIPAGE_MODE
+    if mode == 'single':
+        return _extract_text_single_request(pages, use_cache)
+    
+    # Každá stránka zvlášť (vlastní záznam v OCR cache), souběžně; každé
+    # vlákno dostane kopii kontextu volajícího (trace id v logu)
+    contexts = [contextvars.copy_context() for _ in pages]
+    with ThreadPoolExecutor(max_workers=len(pages), thread_name_prefix='ocr-page') as executor:
+        results = list(executor.map(
+            lambda context, page: context.run(extract_text_from_bytes, page[0], page[1], use_cache=use_cache),
+            contexts, pages
+        ))
+    
+    for page_number, result in enumerate(results, 1):
+        if 'error' in result:
+            return {
+                'error': f"Page {page_number}: {result['error']}",
+                'timestamp': datetime.now().isoformat()
+            }
+    
+    return {
+        'extracted_text': '\n'.join(result['extracted_text'] for result in results),
+        'method': f'gemini ({GEMINI_OCR_MODEL})',
+        'cached': all(result['cached'] for result in results),
+        'pages': len(pages),
+        'timestamp': datetime.now().isoformat()
+    }
+
+
+@metrics.timed('ocr')
+def _extract_text_single_request(pages: list, use_cache: bool) -> dict:
+    try:
+        # Klíč cache ze všech stránek v daném pořadí
+        digests = b''.join(hashlib.sha256(image_bytes).digest() for image_bytes, _ in pages)
+        cache = get_ocr_cache()
+        cache_key = OcrCache.make_key(digests, GEMINI_OCR_MODEL, f"{OCR_PROMPT_VERSION}-pages")
+        extracted_text = cache.get(cache_key) if cache and use_cache else None
+        cached = extracted_text is not None
+        
+        if not cached:
+            pages = [(bytes(image_bytes), mime_type) for image_bytes, mime_type in pages]
+            extracted_text = _call_gemini_ocr_pages_api(pages, OCR_PAGES_PROMPT)
+            if cache:
+                cache.put(cache_key, extracted_text, GEMINI_OCR_MODEL)
+        
+        return {
+            'extracted_text': extracted_text,
+            'method': f'gemini ({GEMINI_OCR_MODEL}, single request)',
+            'cached': cached,
+            'pages': len(pages),
+            'timestamp': datetime.now().isoformat()
+        }
+        
+    except Exception as e:
+        logger.exception(f"OCR failed: {e}")
+        metrics.record_error('ocr')
+        return {
+            'error': str(e),
+            'timestamp': datetime.now().isoformat()
+        }
+
 if __name__ == '__main__':
     # Test s ukázkovým obrázkem (pokud existuje)
     test_image = '/tmp/test_dictation.jpg'
@@ -0,0 +1,57 @@
+"""
+Modul s registrem líně vytvářených sdílených objektů
+
+Drahé objekty (klient Gemini API s poolem spojení apod.) se nevytvářejí
+při importu modulu, ale až při prvním použití přes get(name). Import
+app.py nebo manual_evaluate.py tak nenačítá google.genai a nespadne na
+chybějícím GEMINI_API_KEY - chyba se projeví až u volání, které klienta
+opravdu potřebuje (a vrátí se jako běžná chyba endpointu).
+"""
+import threading
+from typing import Any, Callable
+
+_factories = {}
+_instances = {}
+_lock = threading.Lock()
+
+
+def register(name: str, factory: Callable[[], Any]):
+    """
+    Zaregistruje továrnu pro objekt `name` (objekt se zatím nevytváří).
+    """
+    with _lock:
+        _factories[name] = factory
+
+
+def get(name: str) -> Any:
+    """
+    Vrátí objekt `name`, při prvním volání ho vytvoří továrnou.
+
+    Pokud továrna selže, výjimka se propaguje a další volání to zkusí znovu.
+    """
+    instance = _instances.get(name)
+    if instance is not None:
+        return instance
+
+    with _lock:
+        if name not in _instances:
+            if name not in _factories:
+                raise KeyError(f"Unknown registry entry: {name}")
+            _instances[name] = _factories[name]()
+        return _instances[name]
+
+
+def reset(name: str):
+    """
+    Zahodí vytvořený objekt (další get() ho vytvoří znovu, např. po změně klíče).
+    """
+    with _lock:
+        _instances.pop(name, None)
+
+
+def stats() -> dict:
+    """
+    Vrátí, které zaregistrované objekty už byly vytvořeny (pro /api/health).
+    """
+    with _lock:
+        return {name: name in _instances for name in _factories}
@@ -0,0 +1,175 @@
+"""
+Modul pro lokální porovnání nadiktovaného a napsaného textu
+
+Texty se rozdělí na slova a interpunkci a zarovnají se přes difflib
+(po slovech, s ohledem na velká písmena a diakritiku). Výsledkem je
+seznam chyb, rozdělení původních vět na správné/chybné a deterministické
+skóre. Evaluator podle toho pošle do LLM jen chybné věty, nebo LLM
+u bezchybného diktátu nevolá vůbec.
+"""
+import difflib
+import re
+import unicodedata
+
+TOKEN_PATTERN = re.compile(r'\w+|[^\w\s]')
+SENTENCE_END = {'.', '?', '!'}
+NO_SPACE_BEFORE = {'.', ',', '?', '!', ':', ';', ')'}
+
+# Druhy chyb a jejich váha ve skóre (interpunkce a velké písmeno jsou "poloviční" chyby)
+ERROR_WEIGHTS = {
+    'spelling': 1.0,
+    'diacritics': 1.0,
+    'missing': 1.0,
+    'extra': 1.0,
+    'case': 0.5,
+    'punctuation': 0.5
+}
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Rozdělí text na slova a interpunkční znaménka.
+    """
+    return TOKEN_PATTERN.findall(text)
+
+
+def detokenize(tokens: list[str]) -> str:
+    """
+    Složí tokeny zpět do textu (interpunkce bez mezery před sebou).
+    """
+    text = ''
+    for token in tokens:
+        if text and token not in NO_SPACE_BEFORE:
+            text += ' '
+        text += token
+    return text
+
+
+def strip_diacritics(text: str) -> str:
+    """
+    Odstraní diakritiku ('čárky a háčky'): 'koláč' -> 'kolac'.
+    """
+    decomposed = unicodedata.normalize('NFD', text)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def is_punctuation(token: str) -> bool:
+    return not (token[0].isalnum() or token[0] == '_')
+
+
+def classify_replacement(expected: str, written: str) -> str:
+    """
+    Určí druh chyby u záměny jednoho tokenu za jiný.
+    """
+    if is_punctuation(expected) or is_punctuation(written):
+        return 'punctuation'
+    if expected.lower() == written.lower():
+        return 'case'
+    if strip_diacritics(expected) == strip_diacritics(written):
+        return 'diacritics'
+    return 'spelling'
+
+
+def _sentence_index(tokens: list[str]) -> list[int]:
+    """
+    Ke každému tokenu vrátí pořadí věty, do které patří.
+    """
+    index = []
+    sentence = 0
+    for token in tokens:
+        index.append(sentence)
+        if token in SENTENCE_END:
+            sentence += 1
+    return index
+
+
+def compare_texts(original_text: str, written_text: str) -> dict:
+    """
+    Zarovná napsaný text na originál a vrátí chyby, věty a skóre.
+
+    Args:
+        original_text: Nadiktovaný text
+        written_text: Text přečtený z fotky
+
+    Returns:
+        dict: {
+            'perfect': bool,        # Žádná chyba
+            'score': float,         # Deterministické skóre 0-100
+            'errors': list[dict],   # {sentence, kind, expected, written}
+            'sentences': list[dict] # {index, original, written, correct}
+        }
+    """
+    expected_tokens = tokenize(original_text)
+    written_tokens = tokenize(written_text)
+    sentence_of = _sentence_index(expected_tokens)
+    num_sentences = (sentence_of[-1] + 1) if sentence_of else 0
+
+    matcher = difflib.SequenceMatcher(None, expected_tokens, written_tokens, autojunk=False)
+    errors = []
+    written_by_sentence = [[] for _ in range(num_sentences)]
+
+    def owner(i: int) -> int:
+        # Věta, ke které patří pozice i v originále (vložení na konci -> poslední věta)
+        return sentence_of[min(i, len(sentence_of) - 1)] if sentence_of else 0
+
+    def add_error(kind: str, i: int, expected: list[str], written: list[str]):
+        errors.append({
+            'sentence': owner(i),
+            'kind': kind,
+            'expected': detokenize(expected),
+            'written': detokenize(written)
+        })
+
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        # Napsané tokeny přiřadíme větám originálu (kvůli výpisu chybných vět)
+        for j in range(j1, j2):
+            if tag == 'insert':
+                target = owner(max(i1 - 1, 0))
+            else:
+                target = owner(i1 + min(j - j1, i2 - i1 - 1))
+            if written_by_sentence:
+                written_by_sentence[target].append(written_tokens[j])
+
+        if tag == 'equal':
+            continue
+        if tag == 'delete':
+            for i in range(i1, i2):
+                kind = 'punctuation' if is_punctuation(expected_tokens[i]) else 'missing'
+                add_error(kind, i, [expected_tokens[i]], [])
+        elif tag == 'insert':
+            for j in range(j1, j2):
+                kind = 'punctuation' if is_punctuation(written_tokens[j]) else 'extra'
+                add_error(kind, max(i1 - 1, 0), [], [written_tokens[j]])
+        elif i2 - i1 == j2 - j1:
+            # Stejný počet tokenů - porovnáváme po jednom (přesnější druh chyby)
+            for offset in range(i2 - i1):
+                expected, written = expected_tokens[i1 + offset], written_tokens[j1 + offset]
+                add_error(classify_replacement(expected, written), i1 + offset, [expected], [written])
+        else:
+            add_error('spelling', i1, expected_tokens[i1:i2], written_tokens[j1:j2])
+
+    erroneous = {error['sentence'] for error in errors}
+    sentences = []
+    start = 0
+    for index in range(num_sentences):
+        end = start
+        while end < len(expected_tokens) and sentence_of[end] == index:
+            end += 1
+        sentences.append({
+            'index': index,
+            'original': detokenize(expected_tokens[start:end]),
+            'written': detokenize(written_by_sentence[index]),
+            'correct': index not in erroneous
+        })
+        start = end
+
+    num_words = sum(1 for token in expected_tokens if not is_punctuation(token)) or 1
+    penalty = sum(ERROR_WEIGHTS[error['kind']] for error in errors)
+    score = round(max(0.0, 100.0 * (1 - penalty / num_words)), 1)
+
+    return {
+        'perfect': not errors,
+        'score': score,
+        'errors': errors,
+        'sentences': sentences
+    }
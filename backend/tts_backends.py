@@ -0,0 +1,187 @@
+"""
+Modul s TTS backendy (zaměnitelná syntéza řeči)
+
+Backend převede text jedné věty na dekódovaný klip (AudioSegment):
+- gtts: Google Translate TTS přes síť (výchozí, původní chování)
+- espeak: lokální espeak-ng s českým hlasem, bez sítě a bez limitů
+
+espeak-ng renderuje každou větu ve vlastním procesu, takže souběžná
+syntéza z poolu vláken v tts_generator běží na všech jádrech CPU
+(počet souběžných syntéz pro lokální backend = TTS_LOCAL_WORKERS).
+
+Backend se volí pro nasazení (TTS_BACKEND) nebo pro jeden request
+(pole tts_backend v /api/dictate). Instance se vytváří líně přes registry.
+"""
+from __future__ import annotations
+
+import abc
+import os
+import shutil
+import struct
+import subprocess
+import tempfile
+from typing import TYPE_CHECKING
+
+import metrics
+import registry
+
+if TYPE_CHECKING:
+    # pydub se načte až při první syntéze (viz _segment_from_wav, GTTSBackend)
+    from pydub import AudioSegment
+
+DEFAULT_BACKEND = os.getenv('TTS_BACKEND', 'gtts')
+
+# espeak-ng: rychlost v slovech za minutu (běžná / pomalá řeč), hlas prázdný = podle jazyka
+ESPEAK_BINARY = os.getenv('ESPEAK_BINARY', 'espeak-ng')
+ESPEAK_VOICE = os.getenv('ESPEAK_VOICE', '')
+ESPEAK_RATE = int(os.getenv('ESPEAK_RATE', 160))
+ESPEAK_SLOW_RATE = int(os.getenv('ESPEAK_SLOW_RATE', 120))
+ESPEAK_TIMEOUT = 60
+
+
+class TTSBackend(abc.ABC):
+    """
+    Rozhraní TTS backendu.
+    """
+
+    name = ''
+    # Výchozí počet souběžných syntéz (None = TTS_MAX_WORKERS)
+    default_workers = None
+
+    def available(self) -> bool:
+        """
+        Vrátí True, pokud backend v tomto nasazení může běžet.
+        """
+        return True
+
+    @abc.abstractmethod
+    def synthesize(self, text: str, lang: str, slow: bool) -> AudioSegment:
+        """
+        Syntetizuje jednu větu a vrátí dekódovaný klip (bez úpravy rychlosti).
+        """
+
+    def save(self, text: str, output_path: str, lang: str, slow: bool, bitrate: str):
+        """
+        Syntetizuje text rovnou do MP3 souboru.
+        """
+        self.synthesize(text, lang, slow).export(output_path, format='mp3', bitrate=bitrate)
+
+
+class GTTSBackend(TTSBackend):
+    """
+    Google Translate TTS (gtts) - každá věta je jeden request na Google.
+    """
+
+    name = 'gtts'
+
+    def synthesize(self, text: str, lang: str, slow: bool) -> AudioSegment:
+        # gtts (a s ním requests) se načte až při první syntéze, ne při importu aplikace
+        from gtts import gTTS
+        from pydub import AudioSegment
+
+        fd, clip_file = tempfile.mkstemp(suffix='.mp3')
+        os.close(fd)
+        try:
+            with metrics.timer('tts_request'):
+                gTTS(text=text, lang=lang, slow=slow).save(clip_file)
+            with metrics.timer('mp3_decode'):
+                return AudioSegment.from_mp3(clip_file)
+        finally:
+            os.remove(clip_file)
+
+    def save(self, text: str, output_path: str, lang: str, slow: bool, bitrate: str):
+        from gtts import gTTS
+
+        # gTTS vrací MP3 přímo, bez dekódování a nového kódování
+        with metrics.timer('tts_request'):
+            gTTS(text=text, lang=lang, slow=slow).save(output_path)
+
+
+class EspeakBackend(TTSBackend):
+    """
+    Lokální syntéza přes espeak-ng (WAV na stdout, bez dočasných souborů).
+    """
+
+    name = 'espeak'
+    default_workers = int(os.getenv('TTS_LOCAL_WORKERS', os.cpu_count() or 4))
+
+    def available(self) -> bool:
+        return shutil.which(ESPEAK_BINARY) is not None
+
+    def synthesize(self, text: str, lang: str, slow: bool) -> AudioSegment:
+        command = [
+            ESPEAK_BINARY, '-v', ESPEAK_VOICE or lang,
+            '-s', str(ESPEAK_SLOW_RATE if slow else ESPEAK_RATE),
+            '-b', '1',  # Vstup v UTF-8
+            '--stdout', '--stdin'
+        ]
+        with metrics.timer('tts_render'):
+            # Text jde přes stdin, aby se věta začínající '-' nebrala jako přepínač
+            result = subprocess.run(command, input=text.encode('utf-8'), capture_output=True, timeout=ESPEAK_TIMEOUT)
+        if result.returncode != 0:
+            raise RuntimeError(f"espeak-ng failed: {result.stderr.decode('utf-8', errors='replace').strip()}")
+        return _segment_from_wav(result.stdout)
+
+
+def _segment_from_wav(data: bytes) -> AudioSegment:
+    """
+    Dekóduje WAV ze stdout espeak-ng.
+
+    Při zápisu do roury espeak-ng nezná délku předem a velikosti v hlavičce
+    nejsou platné, proto se chunky procházejí ručně a data se berou do konce.
+    """
+    from pydub import AudioSegment
+
+    if data[:4] != b'RIFF' or data[8:12] != b'WAVE':
+        raise ValueError('espeak-ng did not return WAV data')
+
+    position = 12
+    fmt = None
+    while position + 8 <= len(data):
+        chunk_id = data[position:position + 4]
+        size = struct.unpack('<I', data[position + 4:position + 8])[0]
+        start = position + 8
+
+        if chunk_id == b'fmt ':
+            _, channels, frame_rate, _, _, bits = struct.unpack('<HHIIHH', data[start:start + 16])
+            fmt = (channels, frame_rate, bits // 8)
+        elif chunk_id == b'data':
+            if fmt is None:
+                raise ValueError('WAV fmt chunk missing')
+            channels, frame_rate, sample_width = fmt
+            frames = data[start:min(len(data), start + size)]
+            frames = frames[:len(frames) - len(frames) % (channels * sample_width)]
+            return AudioSegment(data=frames, sample_width=sample_width, frame_rate=frame_rate, channels=channels)
+
+        position = start + size + (size & 1)
+
+    raise ValueError('WAV data chunk not found')
+
+
+BACKENDS = {
+    GTTSBackend.name: GTTSBackend,
+    EspeakBackend.name: EspeakBackend
+}
+
+for _name, _backend_class in BACKENDS.items():
+    registry.register(f"tts_backend:{_name}", _backend_class)
+
+
+def get_backend(name: str | None = None) -> TTSBackend:
+    """
+    Vrátí backend podle názvu (výchozí TTS_BACKEND).
+
+    Raises:
+        ValueError: Neznámý backend
+    """
+    name = name or DEFAULT_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown TTS backend '{name}' (available: {', '.join(BACKENDS)})")
+    return registry.get(f"tts_backend:{name}")
+
+
+def available_backends() -> dict:
+    """
+    Vrátí {název: dostupnost} všech backendů (pro /api/health a validaci requestu).
+    """
+    return {name: get_backend(name).available() for name in BACKENDS}
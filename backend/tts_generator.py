@@ -1,42 +1,212 @@
 """
-Modul pro generování TTS audio pomocí Google TTS (gtts)
+Modul pro generování TTS audio (gTTS nebo lokální espeak-ng, viz tts_backends)
 """
-from gtts import gTTS
+from __future__ import annotations
+
 import os
+import logging
 from datetime import datetime
-from pydub import AudioSegment
-import tempfile
+import threading
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+from clip_cache import ClipCache, get_clip_cache
+from tts_backends import get_backend
+import metrics
+
+if TYPE_CHECKING:
+    # pydub se načítá až v backendech při první syntéze, ne při importu aplikace
+    from pydub import AudioSegment
+
+logger = logging.getLogger(__name__)
 
 # Výchozí nastavení
 DEFAULT_LANG = 'cs'  # Čeština
 DEFAULT_SLOW = True  # Pomalá řeč pro lepší srozumitelnost
+DEFAULT_MAX_WORKERS = int(os.getenv('TTS_MAX_WORKERS', 4))  # Max. souběžných volání síťového TTS
+FULL_TEXT_SENTENCE_GAP_MS = 400  # Mezera mezi větami při čtení celého textu
+SAMPLE_DTYPES = {1: 'uint8', 2: 'int16', 4: 'int32'}  # sample_width -> dtype PCM
 
+# Postupné (streamované) generování
+PARTIAL_SUFFIX = '.partial'  # Značka souboru, který se ještě generuje
+# Značka, která se tak dlouho neobnovila, patří generování, které skončilo s workerem
+PARTIAL_STALE_SECONDS = float(os.getenv('AUDIO_PARTIAL_STALE_SECONDS', 60))
+MP3_BITRATE = '128k'
+STREAM_MP3_PARAMETERS = ['-write_xing', '0', '-id3v2_version', '0', '-map_metadata', '-1']
 
-def generate_audio(text: str, output_path: str, slow: bool = DEFAULT_SLOW, lang: str = DEFAULT_LANG):
+
+def generate_audio(
+    text: str,
+    output_path: str,
+    slow: bool = DEFAULT_SLOW,
+    lang: str = DEFAULT_LANG,
+    backend: str | None = None
+):
     """
-    Generuje audio soubor z textu pomocí Google TTS.
+    Generuje audio soubor z textu.
     
     Args:
         text: Text k přečtení
         output_path: Cesta k výstupnímu MP3 souboru
         slow: Pomalá řeč (True/False)
         lang: Jazyk (výchozí: 'cs')
+        backend: TTS backend (výchozí: TTS_BACKEND)
     
     Returns:
         str: Cesta k vygenerovanému souboru
     """
-    tts = gTTS(text=text, lang=lang, slow=slow)
-    tts.save(output_path)
+    get_backend(backend).save(text, output_path, lang, slow, MP3_BITRATE)
     return output_path
 
 
+def adjust_speed(clip: AudioSegment, speed_factor: float) -> AudioSegment:
+    """
+    Zpomalí (nebo zrychlí) klip převzorkováním v NumPy.
+    
+    Výsledek odpovídá původnímu postupu přes `_spawn` s nižším frame_rate
+    a `set_frame_rate` (mění se tempo i výška hlasu), ale bez mezikopií
+    surových dat a bez audioop.
+    
+    Args:
+        clip: Vstupní klip
+        speed_factor: Faktor rychlosti (0.85 = 85% rychlosti)
+    
+    Returns:
+        AudioSegment: Upravený klip se stejným frame_rate
+    """
+    return adjust_speed_batch([clip], speed_factor)[0]
+
+
+@metrics.timed('speed_adjust')
+def adjust_speed_batch(clips: list[AudioSegment], speed_factor: float) -> list[AudioSegment]:
+    """
+    Upraví rychlost všech klipů naráz.
+    
+    Indexy a váhy lineární interpolace závisí jen na speed_factor, spočítají
+    se proto jednou pro nejdelší klip a sdílí je všechny klipy v dávce.
+    Výstupy všech klipů se zapisují do jednoho předalokovaného pole.
+    Klipy musí mít stejný formát (sample_width, channels).
+    
+    Args:
+        clips: Vstupní klipy
+        speed_factor: Faktor rychlosti (0.85 = 85% rychlosti)
+    
+    Returns:
+        list[AudioSegment]: Upravené klipy ve stejném pořadí
+    """
+    if not clips or speed_factor == 1.0:
+        return list(clips)
+    
+    import numpy as np
+    
+    sample_width = clips[0].sample_width
+    channels = clips[0].channels
+    dtype = SAMPLE_DTYPES[sample_width]
+    
+    frames = [np.frombuffer(clip.raw_data, dtype=dtype).reshape(-1, channels) for clip in clips]
+    out_lengths = [int(len(f) / speed_factor) for f in frames]
+    out_offsets = np.concatenate(([0], np.cumsum(out_lengths)[:-1]))
+    
+    # Pozice ve vstupu pro j-tý výstupní vzorek je j * speed_factor
+    position = np.arange(max(out_lengths), dtype=np.float64) * speed_factor
+    index = position.astype(np.intp)
+    next_index = index + 1
+    fraction = (position - index).astype(np.float32)[:, None]
+    
+    output = np.empty((sum(out_lengths), channels), dtype=dtype)
+    source = np.empty((max(len(f) for f in frames) + 1, channels), dtype=np.float32)
+    
+    adjusted = []
+    for clip, samples, offset, length in zip(clips, frames, out_offsets, out_lengths):
+        # Vstup s jedním zopakovaným vzorkem na konci (soused pro poslední pozici)
+        n = len(samples)
+        source[:n] = samples
+        source[n] = samples[-1] if n else 0
+        
+        # Lineární interpolace: a + (b - a) * fraction
+        a = np.take(source, index[:length], axis=0)
+        b = np.take(source, next_index[:length], axis=0)
+        b -= a
+        b *= fraction[:length]
+        b += a
+        np.copyto(output[offset:offset + length], b, casting='unsafe')
+        adjusted.append(clip._spawn(output[offset:offset + length].tobytes()))
+    
+    return adjusted
+
+
+def synthesize_sentences(
+    sentences: list[str],
+    slow: bool = DEFAULT_SLOW,
+    speed_factor: float = 0.9,
+    lang: str = DEFAULT_LANG,
+    max_workers: int | None = None,
+    backend: str | None = None
+) -> list[AudioSegment]:
+    """
+    Syntetizuje věty paralelně v omezeném poolu vláken.
+    
+    Každá unikátní věta se syntetizuje jen jednou, výsledky se vrací
+    ve stejném pořadí jako vstupní věty. Klipy se nejdřív hledají
+    v perzistentní cache (clip_cache); chybějící se syntetizují paralelně,
+    zpomalí se jednou dávkou (adjust_speed_batch) a uloží do cache.
+    
+    Args:
+        sentences: List vět
+        slow: Pomalá řeč (True/False)
+        speed_factor: Faktor zpomalení audio
+        lang: Jazyk
+        max_workers: Max. počet souběžných syntéz (výchozí: TTS_MAX_WORKERS,
+            u lokálního backendu TTS_LOCAL_WORKERS)
+        backend: TTS backend (výchozí: TTS_BACKEND)
+    
+    Returns:
+        list[AudioSegment]: Klipy v pořadí vět
+    """
+    tts_backend = get_backend(backend)
+    unique_sentences = list(dict.fromkeys(sentences))
+    cache = get_clip_cache()
+    keys = {
+        sentence: ClipCache.make_key(sentence, lang, slow, speed_factor, tts_backend.name)
+        for sentence in unique_sentences
+    }
+    
+    clip_by_sentence = {}
+    if cache is not None:
+        for sentence in unique_sentences:
+            cached = cache.get(keys[sentence])
+            if cached is not None:
+                clip_by_sentence[sentence] = cached
+    
+    missing = [sentence for sentence in unique_sentences if sentence not in clip_by_sentence]
+    if missing:
+        workers = max(1, min(max_workers or tts_backend.default_workers or DEFAULT_MAX_WORKERS, len(missing)))
+        
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tts') as executor:
+            raw_clips = list(executor.map(
+                lambda sentence: tts_backend.synthesize(sentence, lang, slow),
+                missing
+            ))
+        
+        # Zpomalíme všechny nové klipy naráz
+        for sentence, clip in zip(missing, adjust_speed_batch(_normalize_clips(raw_clips), speed_factor)):
+            clip_by_sentence[sentence] = clip
+            if cache is not None:
+                cache.put(keys[sentence], clip)
+    
+    return [clip_by_sentence[sentence] for sentence in sentences]
+
+
 def generate_dictation_audio(
     sentences: list[str],
     output_path: str,
     pause_duration: float = 5.0,
     slow: bool = True,  # Výchozí: pomalá řeč
     speed_factor: float = 0.9,  # Faktor zpomalení (0.85 = 85% rychlosti, čím nižší, tím pomalejší)
-    lang: str = DEFAULT_LANG
+    lang: str = DEFAULT_LANG,
+    max_workers: int | None = None,
+    backend: str | None = None
 ) -> str:
     """
     Generuje audio pro diktát se speciální strukturou:
@@ -55,94 +225,281 @@ def generate_dictation_audio(
         slow: Pomalá řeč pro celé věty (True/False)
         speed_factor: Faktor zpomalení audio (0.85 = 85% rychlosti, výchozí)
         lang: Jazyk (výchozí: 'cs')
+        max_workers: Max. počet souběžných volání TTS (výchozí: TTS_MAX_WORKERS)
+        backend: TTS backend (výchozí: TTS_BACKEND)
     
     Returns:
         str: Cesta k vygenerovanému souboru
     """
-    # Vytvoříme dočasný adresář pro jednotlivé audio soubory
-    temp_dir = tempfile.mkdtemp()
+    # Syntéza všech vět paralelně, výsledky jsou v pořadí vět
+    sentence_clips = synthesize_sentences(sentences, slow, speed_factor, lang, max_workers, backend)
+    
+    # Celé rozložení diktátu spočítáme předem a každý klip i pauzu
+    # zapíšeme do enkodéru právě jednou (bez opakovaného kopírování bufferu)
+    layout = [item for part in _dictation_layout(len(sentence_clips), pause_duration) for item in part]
+    with open(output_path, 'wb') as f:
+        _encode_layout(layout, sentence_clips, f)
+    
+    return output_path
+
+
+def generate_dictation_audio_progressive(
+    sentences: list[str],
+    output_path: str,
+    pause_duration: float = 5.0,
+    slow: bool = True,
+    speed_factor: float = 0.9,
+    lang: str = DEFAULT_LANG,
+    max_workers: int | None = None,
+    backend: str | None = None
+) -> str:
+    """
+    Generuje audio pro diktát postupně do rostoucího MP3 souboru.
+    
+    Synchronně zakóduje jen první část (úvodní čtení + první věta) a vrátí
+    se, zbylé věty se kódují a připojují na konec souboru ve vlákně na pozadí.
+    Dokud se soubor generuje, vedle něj existuje značka `<soubor>.partial`
+    (viz is_audio_in_progress), podle které server soubor streamuje. Po každé
+    připojené části se obnoví mtime značky (viz PARTIAL_STALE_SECONDS).
+    
+    Args:
+        stejné jako generate_dictation_audio
+    
+    Returns:
+        str: Cesta k (zatím neúplnému) souboru
+    """
+    sentence_clips = synthesize_sentences(sentences, slow, speed_factor, lang, max_workers, backend)
+    parts = _dictation_layout(len(sentence_clips), pause_duration)
+    
+    marker_path = output_path + PARTIAL_SUFFIX
+    open(marker_path, 'w').close()
     
     try:
-        # Pauzy
-        sentence_pause = AudioSegment.silent(duration=int(pause_duration * 1000))  # 2 sekundy mezi opakováním věty
-        between_sentences_pause = AudioSegment.silent(duration=3000)  # Pauza mezi větami
-        
-        # Spojíme audio pro všechny věty
-        combined = AudioSegment.empty()
-        
-        # Krok 1: Přečteme všechny věty naráz pomalu
-        full_text = ' '.join(sentences)
-        full_text_file = os.path.join(temp_dir, "full_text_initial.mp3")
-        tts_full_initial = gTTS(text=full_text, lang=lang, slow=slow)
-        tts_full_initial.save(full_text_file)
-        full_text_audio = AudioSegment.from_mp3(full_text_file)
-        # Zpomalíme audio
-        full_text_audio = full_text_audio._spawn(full_text_audio.raw_data, overrides={
-            "frame_rate": int(full_text_audio.frame_rate * speed_factor)
-        }).set_frame_rate(full_text_audio.frame_rate)
-        os.remove(full_text_file)
-        
-        combined += full_text_audio
-        
-        # Krok 2: Pauza po úvodním přečtení
-        combined += between_sentences_pause
-        
-        # Krok 3: Pro každou větu - přečteme ji 3x
-        for i, sentence in enumerate(sentences):
-            # Vygeneruj audio pro celou větu (pomalu)
-            sentence_file = os.path.join(temp_dir, f"sentence_{i}.mp3")
-            tts_sentence = gTTS(text=sentence, lang=lang, slow=slow)
-            tts_sentence.save(sentence_file)
-            sentence_audio = AudioSegment.from_mp3(sentence_file)
-            # Zpomalíme audio
-            sentence_audio = sentence_audio._spawn(sentence_audio.raw_data, overrides={
-                "frame_rate": int(sentence_audio.frame_rate * speed_factor)
-            }).set_frame_rate(sentence_audio.frame_rate)
-            os.remove(sentence_file)
-            
-            # Přečteme větu 3x s pauzami
-            for repeat in range(3):
-                combined += sentence_audio
-                if repeat < 2:  # Pauza mezi opakováními (ne po posledním)
-                    combined += sentence_pause
-            
-            # Pauza před další větou (kromě poslední věty)
-            if i < len(sentences) - 1:
-                combined += between_sentences_pause
-        
-        # Krok 4: Na konci přečteme znovu všechny věty
-        combined += between_sentences_pause  # Pauza před závěrečným čtením
-        
-        full_text_final_file = os.path.join(temp_dir, "full_text_final.mp3")
-        tts_full_final = gTTS(text=full_text, lang=lang, slow=slow)
-        tts_full_final.save(full_text_final_file)
-        full_text_final_audio = AudioSegment.from_mp3(full_text_final_file)
-        # Zpomalíme audio
-        full_text_final_audio = full_text_final_audio._spawn(full_text_final_audio.raw_data, overrides={
-            "frame_rate": int(full_text_final_audio.frame_rate * speed_factor)
-        }).set_frame_rate(full_text_final_audio.frame_rate)
-        os.remove(full_text_final_file)
-        
-        combined += full_text_final_audio
-        
-        # Uložení výsledného souboru
-        combined.export(output_path, format="mp3")
-        
-        return output_path
-        
-    finally:
-        # Vyčištění dočasného adresáře
+        # První část zapíšeme hned, aby mohlo začít přehrávání
+        _append_mp3_part(parts[0], sentence_clips, output_path, truncate=True)
+    except Exception:
+        _remove_marker(marker_path)
+        raise
+    
+    def _finish():
+        try:
+            for part in parts[1:]:
+                _append_mp3_part(part, sentence_clips, output_path)
+                os.utime(marker_path, None)
+        except Exception as e:
+            logger.exception(f"Error while generating {output_path}: {e}")
+        finally:
+            _remove_marker(marker_path)
+            with _progressive_lock:
+                _progressive_threads.discard(thread)
+    
+    thread = threading.Thread(target=_finish, name='tts-progressive', daemon=True)
+    with _progressive_lock:
+        _progressive_threads.add(thread)
+    thread.start()
+    
+    return output_path
+
+
+_progressive_threads = set()
+_progressive_lock = threading.Lock()
+
+
+def wait_for_progressive(timeout: float | None = None):
+    """
+    Počká na dokončení rozběhnutých postupných generování (při ukončení workeru).
+    
+    Args:
+        timeout: Celkový limit čekání v sekundách (None = bez limitu)
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    with _progressive_lock:
+        threads = list(_progressive_threads)
+    for thread in threads:
+        thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+
+def cleanup_stale_markers(directory: str) -> int:
+    """
+    Odstraní značky .partial, které se déle než PARTIAL_STALE_SECONDS neobnovily.
+    
+    Generování, ke kterým patří, skončilo s workerem (recyklace, pád) a už
+    se nedokončí; bez úklidu by se soubor streamoval jako stále rozpracovaný.
+    
+    Returns:
+        int: Počet odstraněných značek
+    """
+    removed = 0
+    cutoff = time.time() - PARTIAL_STALE_SECONDS
+    for name in os.listdir(directory):
+        if not name.endswith(PARTIAL_SUFFIX):
+            continue
+        marker_path = os.path.join(directory, name)
         try:
-            os.rmdir(temp_dir)
-        except:
+            if os.path.getmtime(marker_path) < cutoff:
+                os.remove(marker_path)
+                removed += 1
+        except FileNotFoundError:
             pass
+    return removed
+
+
+def _remove_marker(marker_path: str):
+    """
+    Odstraní značku .partial (mohl ji už odstranit úklid zastaralých značek).
+    """
+    try:
+        os.remove(marker_path)
+    except FileNotFoundError:
+        pass
+
+
+def is_audio_in_progress(path: str) -> bool:
+    """
+    Vrátí True, pokud se audio soubor ještě postupně generuje.
+    """
+    return os.path.exists(path + PARTIAL_SUFFIX)
+
+
+def _dictation_layout(num_sentences: int, pause_duration: float) -> list[list[tuple]]:
+    """
+    Spočítá rozložení diktátu (pořadí klipů a pauz) bez práce s audiem.
+    
+    Položky jsou ('clip', index_věty) nebo ('silence', milisekundy). Výsledek
+    je rozdělený na části: první obsahuje úvodní čtení celého textu a první
+    větu, každá další část jednu větu, poslední závěrečné čtení. Hranice
+    částí leží vždy v pauze, takže při postupném kódování nejsou slyšet.
+    
+    Args:
+        num_sentences: Počet vět
+        pause_duration: Délka pauzy mezi opakováním věty v sekundách
+    
+    Returns:
+        list[list[tuple]]: Části diktátu v pořadí
+    """
+    # Pauzy
+    sentence_pause = ('silence', int(pause_duration * 1000))  # Pauza mezi opakováním věty
+    between_sentences_pause = ('silence', 3000)  # Pauza mezi větami
+    
+    # Krok 1: Přečteme všechny věty naráz pomalu
+    # Celý text skládáme z klipů vět, není potřeba další volání TTS
+    full_text = []
+    for i in range(num_sentences):
+        if i > 0:
+            full_text.append(('silence', FULL_TEXT_SENTENCE_GAP_MS))
+        full_text.append(('clip', i))
+    
+    parts = []
+    part = list(full_text)
+    
+    # Krok 2: Pauza po úvodním přečtení
+    part.append(between_sentences_pause)
+    
+    # Krok 3: Pro každou větu - přečteme ji 3x
+    for i in range(num_sentences):
+        # Přečteme větu 3x s pauzami
+        for repeat in range(3):
+            part.append(('clip', i))
+            if repeat < 2:  # Pauza mezi opakováními (ne po posledním)
+                part.append(sentence_pause)
+        
+        # Pauza před další větou (kromě poslední věty)
+        if i < num_sentences - 1:
+            part.append(between_sentences_pause)
+        
+        parts.append(part)
+        part = []
+    
+    # Krok 4: Na konci přečteme znovu všechny věty
+    part.append(between_sentences_pause)  # Pauza před závěrečným čtením
+    part.extend(full_text)
+    parts.append(part)
+    
+    return parts
+
+
+@metrics.timed('mp3_encode')
+def _encode_layout(layout: list[tuple], clips: list[AudioSegment], out_file, parameters: list[str] | None = None):
+    """
+    Zakóduje rozložení do MP3 jedním průchodem přes stdin ffmpeg.
+    
+    Surová PCM data klipů se posílají do enkodéru přímo (bez spojování
+    AudioSegmentů), ticho se zapisuje z jednoho sdíleného nulového bufferu.
+    Špička paměti je tak dána jen velikostí klipů, ne délkou diktátu.
+    
+    Args:
+        layout: Položky ('clip', index) / ('silence', ms)
+        clips: Klipy vět
+        out_file: Otevřený binární soubor pro výstup MP3
+        parameters: Další parametry pro ffmpeg
+    """
+    from pydub import AudioSegment
+
+    clips = _normalize_clips(clips)
+    sample_width = clips[0].sample_width
+    frame_rate = clips[0].frame_rate
+    channels = clips[0].channels
+    frame_width = sample_width * channels
+    
+    silence = bytes(frame_rate * frame_width)  # 1 sekunda ticha
+    pcm_format = {1: 'u8', 2: 's16le', 4: 's32le'}[sample_width]
+    
+    command = [
+        AudioSegment.converter, '-y', '-loglevel', 'error',
+        '-f', pcm_format, '-ar', str(frame_rate), '-ac', str(channels), '-i', 'pipe:0',
+        '-acodec', 'libmp3lame', '-b:a', MP3_BITRATE
+    ] + (parameters or []) + ['-f', 'mp3', 'pipe:1']
+    
+    process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=out_file, stderr=subprocess.PIPE)
+    try:
+        for kind, value in layout:
+            if kind == 'clip':
+                process.stdin.write(clips[value].raw_data)
+            else:
+                remaining = int(value * frame_rate / 1000) * frame_width
+                while remaining > 0:
+                    chunk = min(remaining, len(silence))
+                    process.stdin.write(silence[:chunk])
+                    remaining -= chunk
+        process.stdin.close()
+    except BrokenPipeError:
+        pass
+    
+    stderr = process.stderr.read()
+    if process.wait() != 0:
+        raise RuntimeError(f"ffmpeg failed: {stderr.decode('utf-8', errors='replace')}")
+
+
+def _normalize_clips(clips: list[AudioSegment]) -> list[AudioSegment]:
+    """
+    Převede klipy na společný formát (podle prvního klipu), aby šly
+    zapsat do jednoho PCM streamu.
+    """
+    reference = clips[0]
+    return [
+        clip if (clip.frame_rate, clip.channels, clip.sample_width) == (reference.frame_rate, reference.channels, reference.sample_width)
+        else clip.set_frame_rate(reference.frame_rate).set_channels(reference.channels).set_sample_width(reference.sample_width)
+        for clip in clips
+    ]
+
+
+def _append_mp3_part(layout: list[tuple], clips: list[AudioSegment], output_path: str, truncate: bool = False):
+    """
+    Zakóduje část do MP3 a připojí ji na konec souboru.
+    
+    MP3 se kóduje bez ID3 tagů a Xing hlavičky s pevným bitrate, takže
+    spojené části tvoří jeden platný stream. První část (truncate=True)
+    soubor přepíše, aby se nepřipojila ke staršímu obsahu.
+    """
+    with open(output_path, 'wb' if truncate else 'ab') as f:
+        _encode_layout(layout, clips, f, STREAM_MP3_PARAMETERS)
 
 
 if __name__ == '__main__':
     # Test s jednou větou
-    print("Testing Google TTS with a simple sentence...")
+    print("Testing TTS with a simple sentence...")
     test_sentence = "Dnes je krásné slunečné počasí."
-    test_output = "/tmp/test_gtts.mp3"
+    test_output = "/tmp/test_tts.mp3"
     
     try:
         generate_audio(test_sentence, test_output)
@@ -152,7 +509,7 @@ if __name__ == '__main__':
         # Test diktátu
         print("\nTesting dictation with 2 sentences...")
         sentences = ["Maminka peče koláč.", "Pes si hraje na zahradě."]
-        test_dictation = "/tmp/test_dictation_gtts.mp3"
+        test_dictation = "/tmp/test_dictation_tts.mp3"
         generate_dictation_audio(sentences, test_dictation, pause_duration=3.0)
         print(f"✓ Dictation audio generated: {test_dictation}")
         print(f"  File size: {os.path.getsize(test_dictation)} bytes")
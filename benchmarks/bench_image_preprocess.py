@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Benchmark předzpracování fotek pro OCR
+
+Porovnává původní uložení fotky (JPEG kvalita 95 bez zmenšení) s
+image_preprocess.prepare_upload: velikost uploadu do Gemini a čas
+zpracování. S --ocr navíc pošle obě varianty do Gemini OCR a změří
+latenci a přesnost (podobnost s referenčním textem, difflib ratio).
+
+Sada fotek: adresář s obrázky (*.jpg, *.jpeg, *.png), ke každé fotce
+volitelně stejnojmenný .txt s přesným přepisem (co žák napsal).
+Bez --images se vygenerují syntetické "fotky" listů (jen velikost a čas).
+
+Použití:
+    python benchmarks/bench_image_preprocess.py [--synthetic 5]
+    python benchmarks/bench_image_preprocess.py --images benchmarks/fixtures/sheets --ocr
+"""
+import argparse
+import difflib
+import glob
+import io
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from PIL import Image, ImageDraw, ImageFilter
+from image_preprocess import prepare_upload
+
+SAMPLE_TEXT = [
+    "Maminka peče koláč s povidly.",
+    "Pes si hraje na zahradě u plotu.",
+    "Bystrý sýkorák sedí na větvi.",
+    "Ve škole jsme psali diktát o zimě.",
+]
+
+
+def legacy_upload(raw: bytes) -> bytes:
+    """Původní postup z /api/evaluate (před předzpracováním)"""
+    img = Image.open(io.BytesIO(raw))
+    if img.mode in ('RGBA', 'LA', 'P'):
+        img = img.convert('RGB')
+    buffer = io.BytesIO()
+    img.save(buffer, 'JPEG', quality=95)
+    return buffer.getvalue()
+
+
+def synthetic_sheet(seed: int) -> tuple[bytes, str]:
+    """
+    Vygeneruje 12 Mpx "fotku" popsaného listu (papír s šumem a textem).
+    """
+    rng = random.Random(seed)
+    width, height = 4032, 3024
+    img = Image.new('RGB', (width, height), (236, 232, 220))
+    draw = ImageDraw.Draw(img)
+    lines = [rng.choice(SAMPLE_TEXT) for _ in range(10)]
+    for i, line in enumerate(lines):
+        draw.text((300, 250 + i * 250), line, fill=(30, 40, 120), font_size=110)
+    # Nerovnoměrné osvětlení a šum jako u fotky z telefonu
+    noise = Image.effect_noise((width, height), 24).convert('RGB')
+    img = Image.blend(img, noise, 0.12).filter(ImageFilter.GaussianBlur(1))
+    buffer = io.BytesIO()
+    img.save(buffer, 'JPEG', quality=92)
+    return buffer.getvalue(), '\n'.join(lines)
+
+
+def load_fixtures(images_dir: str) -> list[tuple[str, bytes, str | None]]:
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(images_dir, '*'))):
+        if os.path.splitext(path)[1].lower() not in ('.jpg', '.jpeg', '.png'):
+            continue
+        with open(path, 'rb') as f:
+            raw = f.read()
+        reference_path = os.path.splitext(path)[0] + '.txt'
+        reference = None
+        if os.path.exists(reference_path):
+            with open(reference_path, 'r', encoding='utf-8') as f:
+                reference = f.read()
+        fixtures.append((os.path.basename(path), raw, reference))
+    return fixtures
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def accuracy(text: str, reference: str | None):
+    if reference is None:
+        return None
+    normalize = lambda value: ' '.join(value.split())
+    return difflib.SequenceMatcher(None, normalize(text), normalize(reference)).ratio()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark předzpracování fotek pro OCR')
+    parser.add_argument('--images', default=None, help='Adresář s fotkami (a volitelnými .txt přepisy)')
+    parser.add_argument('--synthetic', type=int, default=5, help='Počet syntetických fotek bez --images')
+    parser.add_argument('--ocr', action='store_true', help='Změřit i latenci a přesnost Gemini OCR (volá API)')
+    args = parser.parse_args()
+
+    if args.images:
+        fixtures = load_fixtures(args.images)
+    else:
+        fixtures = [(f'synthetic_{i}.jpg', *synthetic_sheet(i)) for i in range(args.synthetic)]
+    if not fixtures:
+        print("Žádné fotky k otestování")
+        sys.exit(1)
+
+    if args.ocr:
+        from ocr_processor import OCR_PROMPT, _call_gemini_ocr_api
+
+    variants = {'legacy (q95)': legacy_upload, 'prepare_upload': prepare_upload_bytes}
+    totals = {name: {'bytes': [], 'prep': [], 'ocr': [], 'acc': []} for name in variants}
+
+    for name, raw, reference in fixtures:
+        print(f"{name} ({len(raw) / 1024:.0f} KB)")
+        for variant, func in variants.items():
+            payload, prep_time = timed(func, raw)
+            stats = totals[variant]
+            stats['bytes'].append(len(payload))
+            stats['prep'].append(prep_time)
+            line = f"  {variant:16s} {len(payload) / 1024:8.0f} KB  prep {prep_time * 1000:7.1f} ms"
+
+            if args.ocr:
+                text, ocr_time = timed(_call_gemini_ocr_api, payload, 'image/jpeg', OCR_PROMPT)
+                stats['ocr'].append(ocr_time)
+                line += f"  ocr {ocr_time:6.2f} s"
+                score = accuracy(text, reference)
+                if score is not None:
+                    stats['acc'].append(score)
+                    line += f"  přesnost {score:.3f}"
+            print(line)
+
+    print("\nSouhrn (medián):")
+    for variant, stats in totals.items():
+        line = (f"  {variant:16s} {statistics.median(stats['bytes']) / 1024:8.0f} KB"
+                f"  prep {statistics.median(stats['prep']) * 1000:7.1f} ms")
+        if stats['ocr']:
+            line += f"  ocr {statistics.median(stats['ocr']):6.2f} s"
+        if stats['acc']:
+            line += f"  přesnost {statistics.mean(stats['acc']):.3f} (průměr)"
+        print(line)
+
+
+def prepare_upload_bytes(raw: bytes) -> bytes:
+    return prepare_upload(io.BytesIO(raw))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark doby importu backendu (studený start)
+
+Každý modul se importuje v čerstvém interpretu (podprocesu), měří se
+čas samotného importu i celého spuštění procesu. Vypíše také, které
+těžké závislosti (google.genai, gtts, numpy, ...) import natáhl - ty se
+mají načítat až při prvním použití. S --top vypíše nejpomalejší
+importy podle `python -X importtime`.
+
+Použití:
+    python benchmarks/bench_import_time.py [--repeat 5] [--modules app manual_evaluate] [--top 10]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+
+DEFAULT_MODULES = ['app', 'manual_evaluate', 'ocr_processor', 'evaluator', 'tts_generator']
+HEAVY_MODULES = ['google.genai', 'httpx', 'gtts', 'numpy', 'PIL.Image', 'pydub']
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'import': elapsed, 'loaded': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def run_probe(module: str, env: dict) -> tuple[float, float, list[str]]:
+    """
+    Naimportuje modul v novém interpretu, vrátí (čas importu, čas procesu, těžké moduly).
+    """
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr.strip()}")
+    probe = json.loads(result.stdout.strip().splitlines()[-1])
+    return probe['import'], wall, probe['loaded']
+
+
+def top_imports(module: str, env: dict, count: int) -> list[tuple[int, str]]:
+    """
+    Vrátí nejpomalejší importy (kumulativní µs) podle -X importtime.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative), name.rstrip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark doby importu backendu')
+    parser.add_argument('--modules', nargs='+', default=DEFAULT_MODULES, help='Moduly z backend/ k měření')
+    parser.add_argument('--repeat', type=int, default=5, help='Počet měření na modul')
+    parser.add_argument('--top', type=int, default=0, help='Vypsat N nejpomalejších importů (-X importtime)')
+    args = parser.parse_args()
+
+    # Import nesmí potřebovat API klíč (klient Gemini vzniká až při prvním volání)
+    env = dict(os.environ)
+    env.pop('GEMINI_API_KEY', None)
+
+    print(f"{'modul':18s} {'import (medián)':>16s} {'proces (medián)':>16s}  těžké závislosti")
+    for module in args.modules:
+        imports, walls = [], []
+        for _ in range(args.repeat):
+            import_time, wall, loaded = run_probe(module, env)
+            imports.append(import_time)
+            walls.append(wall)
+        print(f"{module:18s} {statistics.median(imports) * 1000:13.0f} ms {statistics.median(walls) * 1000:13.0f} ms"
+              f"  {', '.join(loaded) or '-'}")
+
+        if args.top:
+            for cumulative, name in top_imports(module, env, args.top):
+                print(f"    {cumulative / 1000:8.1f} ms  {name.strip()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Mikrobenchmark úpravy rychlosti TTS klipů
+
+Porovnává původní postup (AudioSegment._spawn s nižším frame_rate
++ set_frame_rate) s NumPy převzorkováním v tts_generator, po klipech
+i dávkově. Nepotřebuje síť ani ffmpeg, klipy se generují syntetické.
+
+Použití:
+    python benchmarks/bench_speed_adjust.py [--clips 12] [--seconds 4] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from pydub.generators import Sine
+from tts_generator import adjust_speed, adjust_speed_batch
+
+
+def legacy_adjust_speed(clip, speed_factor):
+    """Původní postup z tts_generator (před NumPy stage)"""
+    return clip._spawn(clip.raw_data, overrides={
+        "frame_rate": int(clip.frame_rate * speed_factor)
+    }).set_frame_rate(clip.frame_rate)
+
+
+def best_of(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark úpravy rychlosti klipů')
+    parser.add_argument('--clips', type=int, default=12, help='Počet klipů (vět)')
+    parser.add_argument('--seconds', type=float, default=4.0, help='Délka jednoho klipu v sekundách')
+    parser.add_argument('--speed', type=float, default=0.9, help='speed_factor')
+    parser.add_argument('--repeat', type=int, default=5, help='Počet opakování (bere se nejlepší)')
+    args = parser.parse_args()
+
+    # gTTS vrací mono 24 kHz, 16 bit
+    clips = [
+        Sine(220 + 20 * i).to_audio_segment(duration=int(args.seconds * 1000))
+        .set_frame_rate(24000).set_channels(1).set_sample_width(2)
+        for i in range(args.clips)
+    ]
+
+    results = {
+        'legacy (_spawn + set_frame_rate)': best_of(
+            lambda: [legacy_adjust_speed(c, args.speed) for c in clips], args.repeat),
+        'numpy per clip (adjust_speed)': best_of(
+            lambda: [adjust_speed(c, args.speed) for c in clips], args.repeat),
+        'numpy batch (adjust_speed_batch)': best_of(
+            lambda: adjust_speed_batch(clips, args.speed), args.repeat),
+    }
+
+    print(f"{args.clips} klipů x {args.seconds:.1f} s, speed_factor={args.speed}, best of {args.repeat}")
+    baseline = results['legacy (_spawn + set_frame_rate)']
+    for name, elapsed in results.items():
+        per_clip_ms = elapsed / args.clips * 1000
+        print(f"  {name:34s} {elapsed * 1000:8.1f} ms celkem  {per_clip_ms:7.2f} ms/klip  {baseline / elapsed:5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Reprodukovatelný benchmark API bez skutečného Gemini a gTTS
+
+Pro každý endpoint (/api/generate, /api/dictate, /api/evaluate) spustí
+čerstvý server aplikace v podprocesu a zatíží ho při několika úrovních
+souběžnosti. Gemini nahrazuje lokální fake server (fake_gemini.py,
+nastavitelná latence a podíl odpovědí 429), gTTS nahrazuje fake, který
+po nastavené latenci vrátí fixture MP3. Cache klipů, OCR cache a zásobník
+diktátů jsou vypnuté, data jdou do dočasného adresáře (DATA_DIR).
+
+Měří se p50/p95/p99 latence, requests/sec, chyby a špičková RSS serveru
+(VmHWM, jen Linux). Výsledky se uloží jako JSON do benchmarks/results/
+a porovnají s předchozím během - zhoršení p95 nebo req/s o víc než
+--threshold se vypíše jako REGRESE. Limity Gemini gateway (GEMINI_RPM,
+GEMINI_MAX_CONCURRENCY, ...) se přebírají z prostředí a ukládají se
+do výsledků.
+
+Potřebuje ffmpeg (fixture MP3, kódování v /api/dictate) a pro /api/dictate
+i ffprobe (dekódování klipů v pydub).
+
+Použití:
+    python benchmarks/bench_suite.py [--endpoints generate dictate evaluate] [--concurrency 1 4 16]
+    python benchmarks/bench_suite.py --duration 20 --latency-ms ocr=2500 --rate-limit 0.05
+    python benchmarks/bench_suite.py --compare benchmarks/results/20260101_120000_abc1234.json
+"""
+import argparse
+import glob
+import io
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import uuid
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+BACKEND_DIR = os.path.join(ROOT_DIR, 'backend')
+sys.path.insert(0, BENCH_DIR)
+
+from fake_gemini import FakeGeminiServer, parse_latencies
+from load_test import run_load_test
+
+DEFAULT_RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+ENDPOINTS = ['generate', 'dictate', 'evaluate']
+ORIGINAL_TEXT = "Maminka peče koláč. Pes si hraje na zahradě. Ve škole jsme psali diktát."
+DICTATE_SENTENCES = [
+    "Maminka peče koláč.",
+    "Pes si hraje na zahradě.",
+    "Ve škole jsme psali diktát.",
+    "Bystrý sýkorák sedí na větvi.",
+    "Babička nese košík hub."
+]
+# Proměnné prostředí, které ovlivňují výsledky a ukládají se k nim
+RECORDED_ENV = [
+    'GEMINI_MAX_CONCURRENCY', 'GEMINI_RPM', 'GEMINI_BURST', 'GEMINI_MODEL_LIMITS',
+    'TTS_MAX_WORKERS', 'OCR_IMAGE_MAX_DIM', 'OCR_IMAGE_GRAYSCALE', 'EVAL_LOCAL_PREDIFF'
+]
+
+
+def make_fixture_mp3(path: str, seconds: float = 1.5):
+    """
+    Vytvoří fixture MP3 (tón 24 kHz mono jako z gTTS), kterou vrací fake TTS.
+    """
+    from pydub.generators import Sine
+    Sine(440).to_audio_segment(duration=int(seconds * 1000)).set_frame_rate(24000).set_channels(1) \
+        .export(path, format='mp3', bitrate='32k')
+
+
+def make_sheet_jpeg() -> bytes:
+    """
+    Syntetická fotka listu s diktátem (velikost typická pro fotku z telefonu po zmenšení v prohlížeči).
+    """
+    from PIL import Image, ImageDraw
+    img = Image.new('RGB', (2048, 1536), (236, 232, 220))
+    draw = ImageDraw.Draw(img)
+    for i, sentence in enumerate(DICTATE_SENTENCES):
+        draw.text((150, 150 + i * 180), sentence, fill=(30, 40, 120), font_size=90)
+    buffer = io.BytesIO()
+    img.save(buffer, 'JPEG', quality=95)
+    return buffer.getvalue()
+
+
+def multipart(fields: dict, files: dict) -> tuple[bytes, str]:
+    """
+    Sestaví tělo multipart/form-data, vrátí (tělo, Content-Type).
+    """
+    boundary = uuid.uuid4().hex
+    body = io.BytesIO()
+    for name, value in fields.items():
+        body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode('utf-8'))
+    for name, (filename, content, mimetype) in files.items():
+        body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                   f'Content-Type: {mimetype}\r\n\r\n'.encode('utf-8'))
+        body.write(content + b'\r\n')
+    body.write(f'--{boundary}--\r\n'.encode('utf-8'))
+    return body.getvalue(), f'multipart/form-data; boundary={boundary}'
+
+
+def endpoint_request(endpoint: str, num_sentences: int) -> tuple[str, bytes, dict]:
+    """
+    Vrátí (cesta, tělo, hlavičky) requestu pro endpoint.
+    """
+    if endpoint == 'generate':
+        body = json.dumps({'grade': 3, 'num_sentences': num_sentences}).encode('utf-8')
+        return '/api/generate', body, {'Content-Type': 'application/json'}
+    if endpoint == 'dictate':
+        sentences = (DICTATE_SENTENCES * num_sentences)[:num_sentences]
+        body = json.dumps({'sentences': sentences, 'pause_duration': 1.0, 'slow': False}).encode('utf-8')
+        return '/api/dictate', body, {'Content-Type': 'application/json'}
+    body, content_type = multipart({'original_text': ORIGINAL_TEXT}, {'image': ('sheet.jpg', make_sheet_jpeg(), 'image/jpeg')})
+    return '/api/evaluate', body, {'Content-Type': content_type}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def peak_rss_mb(pid: int):
+    """
+    Špičková RSS procesu (VmHWM z /proc), None mimo Linux.
+    """
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def start_app_server(args, gemini_url: str, fixture_mp3: str, data_dir: str) -> tuple[subprocess.Popen, str]:
+    """
+    Spustí server aplikace s fake TTS v podprocesu a počká, až odpovídá.
+    """
+    port = free_port()
+    env = {
+        **os.environ,
+        'GEMINI_API_KEY': 'benchmark',
+        'GEMINI_BASE_URL': gemini_url,
+        'DATA_DIR': data_dir,
+        'TTS_CACHE_MAX_MB': '0',
+        'OCR_CACHE_MAX_ENTRIES': '0',
+        'DICTATION_POOL_SIZE': '0',
+        'PYTHONUNBUFFERED': '1'
+    }
+    # Log serveru jde do souboru (rourou by se při zátěži zablokoval)
+    log_path = data_dir + '.log'
+    with open(log_path, 'wb') as log:
+        process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), '--serve', '--port', str(port),
+             '--fixture', fixture_mp3, '--tts-latency-ms', str(args.tts_latency_ms)],
+            cwd=BACKEND_DIR, env=env, stdout=None if args.verbose else log, stderr=None if args.verbose else log
+        )
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            with open(log_path, 'r', encoding='utf-8', errors='replace') as f:
+                raise RuntimeError(f"Server aplikace skončil při startu:\n{f.read()}")
+        try:
+            with urllib.request.urlopen(f'{base_url}/api/health', timeout=1):
+                return process, base_url
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError('Server aplikace nenaběhl do 30 s')
+
+
+def stop_app_server(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def serve(port: int, fixture_mp3: str, tts_latency_ms: float):
+    """
+    Režim podprocesu: aplikace s fake gTTS na werkzeug serveru (vlákno na request).
+    """
+    import gtts
+    from werkzeug.serving import make_server
+
+    class FakeTTS:
+        def __init__(self, text: str, lang: str = 'cs', slow: bool = False, **kwargs):
+            self.text = text
+
+        def save(self, path: str):
+            time.sleep(tts_latency_ms / 1000)
+            shutil.copyfile(fixture_mp3, path)
+
+    gtts.gTTS = FakeTTS
+
+    sys.path.insert(0, BACKEND_DIR)
+    from app import create_app
+    make_server('127.0.0.1', port, create_app(), threaded=True).serve_forever()
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def latest_result(results_dir: str, exclude: str | None = None):
+    paths = sorted(p for p in glob.glob(os.path.join(results_dir, '*.json')) if p != exclude)
+    return paths[-1] if paths else None
+
+
+def compare(current: dict, previous: dict, threshold: float) -> list[str]:
+    """
+    Porovná dva běhy, vrátí seznam regresí (p95 nahoru / req/s dolů o víc než threshold).
+    """
+    previous_rows = {(r['endpoint'], r['concurrency']): r for r in previous['results']}
+    regressions = []
+    print(f"\nPorovnání s {previous['meta']['revision']} ({previous['meta']['started_at']}):")
+    for row in current['results']:
+        before = previous_rows.get((row['endpoint'], row['concurrency']))
+        if not before or not before['requests'] or not row['requests']:
+            continue
+        p95_change = row['p95_ms'] / before['p95_ms'] - 1 if before['p95_ms'] else 0.0
+        rps_change = row['rps'] / before['rps'] - 1 if before['rps'] else 0.0
+        flag = ''
+        if p95_change > threshold or rps_change < -threshold:
+            flag = '  REGRESE'
+            regressions.append(f"{row['endpoint']} c={row['concurrency']}")
+        print(f"  {row['endpoint']:9s} c={row['concurrency']:<3d} p95 {before['p95_ms']:8.1f} -> {row['p95_ms']:8.1f} ms "
+              f"({p95_change:+.0%})  req/s {before['rps']:6.1f} -> {row['rps']:6.1f} ({rps_change:+.0%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark API s lokálním fake Gemini a fake TTS')
+    parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=ENDPOINTS)
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 4, 16])
+    parser.add_argument('--duration', type=float, default=10.0, help='Délka jedné úrovně v sekundách')
+    parser.add_argument('--sentences', type=int, default=5, help='Počet vět pro generate/dictate')
+    parser.add_argument('--latency-ms', default='', help='Latence fake Gemini, např. generate=800,ocr=1500,evaluate=2000')
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='Podíl odpovědí 429 z fake Gemini (0-1)')
+    parser.add_argument('--retry-delay', type=float, default=1.0, help='retryDelay v odpovědích 429 (s)')
+    parser.add_argument('--tts-latency-ms', type=float, default=150, help='Latence jednoho volání fake gTTS')
+    parser.add_argument('--seed', type=int, default=0, help='Seed fake Gemini (věty, 429, jitter)')
+    parser.add_argument('--results-dir', default=DEFAULT_RESULTS_DIR)
+    parser.add_argument('--compare', default=None, help='Výsledek k porovnání (výchozí: poslední v --results-dir)')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Hranice regrese (0.2 = 20 %%)')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Při regresi skončit s kódem 1')
+    parser.add_argument('--verbose', action='store_true', help='Zobrazit výstup serveru aplikace')
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--fixture', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.fixture, args.tts_latency_ms)
+        return
+
+    if not shutil.which('ffmpeg'):
+        print("Chybí ffmpeg (potřebuje ho fixture MP3 i /api/dictate)")
+        sys.exit(1)
+    if 'dictate' in args.endpoints and not shutil.which('ffprobe'):
+        # pydub dekóduje MP3 z gTTS přes ffprobe + ffmpeg
+        print("Chybí ffprobe - /api/dictate se přeskočí")
+        args.endpoints = [endpoint for endpoint in args.endpoints if endpoint != 'dictate']
+
+    work_dir = tempfile.mkdtemp(prefix='diktator-bench-')
+    fixture_mp3 = os.path.join(work_dir, 'fixture.mp3')
+    make_fixture_mp3(fixture_mp3)
+
+    latency_ms = parse_latencies(args.latency_ms)
+    gemini = FakeGeminiServer(latency_ms=latency_ms, rate_limit=args.rate_limit,
+                              retry_delay=args.retry_delay, seed=args.seed).start()
+
+    run = {
+        'meta': {
+            'revision': git_revision(),
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'duration': args.duration,
+            'sentences': args.sentences,
+            'gemini_latency_ms': latency_ms,
+            'rate_limit': args.rate_limit,
+            'tts_latency_ms': args.tts_latency_ms,
+            'seed': args.seed,
+            'env': {name: os.environ[name] for name in RECORDED_ENV if name in os.environ}
+        },
+        'results': []
+    }
+
+    try:
+        for endpoint in args.endpoints:
+            path, body, headers = endpoint_request(endpoint, args.sentences)
+            process, base_url = start_app_server(args, gemini.url, fixture_mp3, os.path.join(work_dir, endpoint))
+            try:
+                # Zahřátí (lazy importy, klient Gemini, první ffmpeg)
+                run_load_test(base_url + path, 'POST', body, 1, 0.01, headers)
+                for concurrency in args.concurrency:
+                    result = run_load_test(base_url + path, 'POST', body, concurrency, args.duration, headers)
+                    result.update(endpoint=endpoint, peak_rss_mb=peak_rss_mb(process.pid))
+                    del result['url']
+                    run['results'].append(result)
+                    print(f"{endpoint:9s} c={concurrency:<3d} {result['rps']:6.1f} req/s  p50 {result['p50_ms']:8.1f} ms"
+                          f"  p95 {result['p95_ms']:8.1f} ms  p99 {result['p99_ms']:8.1f} ms"
+                          f"  chyby {result['errors']:<3d} RSS {result['peak_rss_mb']} MB")
+            finally:
+                stop_app_server(process)
+    finally:
+        gemini.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    run['meta']['fake_gemini_counts'] = gemini.counts
+
+    os.makedirs(args.results_dir, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    output_path = os.path.join(args.results_dir, f"{stamp}_{run['meta']['revision']}.json")
+    previous_path = args.compare or latest_result(args.results_dir)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(run, f, ensure_ascii=False, indent=2)
+    print(f"\nVýsledky uloženy: {os.path.relpath(output_path, ROOT_DIR)}")
+
+    if previous_path:
+        with open(previous_path, 'r', encoding='utf-8') as f:
+            regressions = compare(run, json.load(f), args.threshold)
+        if regressions:
+            print(f"Regrese: {', '.join(regressions)}")
+            if args.fail_on_regression:
+                sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Lokální náhrada Gemini API pro benchmarky
+
+HTTP server s endpointy models/<model>:generateContent a
+:streamGenerateContent (SSE, text po slovech), který odpovídá stejným
+JSON formátem jako Gemini. Druh volání se pozná podle requestu:
+obrázek v inlineData = OCR, prompt "Vygeneruj ..." = generování vět,
+jinak vyhodnocení (JSON, pokud request žádá responseMimeType
+application/json). Latence každého druhu je nastavitelná, část requestů
+může dostat 429 (RESOURCE_EXHAUSTED s retryDelay) jako při vyčerpané kvótě.
+
+Aplikace se na server přesměruje přes GEMINI_BASE_URL=http://127.0.0.1:<port>.
+
+Použití (samostatně):
+    python benchmarks/fake_gemini.py --port 8765 --latency-ms generate=800,ocr=1500,evaluate=2000 --rate-limit 0.05
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_LATENCY_MS = {'generate': 800, 'ocr': 1500, 'evaluate': 2000}
+
+# Text "přečtený" z fotky - záměrně s chybami, aby vyhodnocení volalo LLM
+DEFAULT_OCR_TEXT = "Maminka pece koláč. Pes si hraje na zahradě. Ve škole jsme psaly diktát."
+DEFAULT_EVALUATION_TEXT = """HODNOCENÍ: Diktát je napsaný pěkně, objevilo se jen pár chyb.
+
+CHYBY:
+- "pece" místo "peče" - chybí háček
+- "psaly" místo "psali" - shoda přísudku s podmětem
+
+POCHVALA: Velká písmena a interpunkce jsou správně.
+
+DOPORUČENÍ: Procvič shodu přísudku s podmětem.
+
+SKÓRE: 85"""
+# Odpověď na request s responseMimeType application/json (strukturované vyhodnocení)
+DEFAULT_EVALUATION_JSON = {
+    'summary': 'Diktát je napsaný pěkně, objevilo se jen pár chyb.',
+    'errors': [
+        {'sentence': 1, 'expected': 'peče', 'written': 'pece', 'category': 'diacritics',
+         'explanation': 'Ve slově peče se píše háček.'},
+        {'sentence': 3, 'expected': 'psali', 'written': 'psaly', 'category': 'grammar',
+         'explanation': 'Shoda přísudku s podmětem - my (žáci) psali.'}
+    ],
+    'praise': 'Velká písmena a interpunkce jsou správně.',
+    'recommendations': 'Procvič shodu přísudku s podmětem.',
+    'score': 85
+}
+
+SUBJECTS = ['Maminka', 'Tatínek', 'Babička', 'Pes', 'Kocour', 'Žák', 'Sýkorka', 'Myslivec']
+VERBS = ['vaří', 'hledá', 'nese', 'vidí', 'maluje', 'pozoruje', 'čte', 'sbírá']
+OBJECTS = ['oběd', 'bylinky', 'dárek', 'mýdlo', 'obrázek', 'knihu', 'houby', 'zrní']
+PLACES = ['v kuchyni', 'na zahradě', 'u rybníka', 'v lese', 've škole', 'na výletě', 'v pokoji', 'za domem']
+
+
+def parse_latencies(value: str) -> dict:
+    """
+    Převede 'generate=800,ocr=1500' na {druh: ms} (chybějící druhy mají výchozí hodnotu).
+    """
+    latencies = dict(DEFAULT_LATENCY_MS)
+    for item in filter(None, value.split(',')):
+        kind, _, ms = item.partition('=')
+        latencies[kind.strip()] = float(ms)
+    return latencies
+
+
+class FakeGeminiServer(ThreadingHTTPServer):
+    """
+    Vícevláknový HTTP server předstírající Gemini generateContent.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, latency_ms: dict | None = None, rate_limit: float = 0.0,
+                 retry_delay: float = 1.0, jitter: float = 0.2, ocr_text: str = DEFAULT_OCR_TEXT,
+                 evaluation_text: str = DEFAULT_EVALUATION_TEXT, seed: int = 0):
+        super().__init__(('127.0.0.1', port), FakeGeminiHandler)
+        self.latency_ms = {**DEFAULT_LATENCY_MS, **(latency_ms or {})}
+        self.rate_limit = rate_limit
+        self.retry_delay = retry_delay
+        self.jitter = jitter
+        self.ocr_text = ocr_text
+        self.evaluation_text = evaluation_text
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts = {'generate': 0, 'ocr': 0, 'evaluate': 0, 'rate_limited': 0}
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self) -> 'FakeGeminiServer':
+        threading.Thread(target=self.serve_forever, daemon=True, name='fake-gemini').start()
+        return self
+
+    def roll(self) -> float:
+        with self._lock:
+            return self._random.random()
+
+    def sentences(self, count: int) -> list[str]:
+        # Pokaždé jiné věty, aby se neuplatnila cache klipů ani zásobník
+        with self._lock:
+            rng = self._random
+            return [f"{rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(OBJECTS)} {rng.choice(PLACES)} "
+                    f"{rng.randint(1, 999)}krát." for _ in range(count)]
+
+    def record(self, key: str):
+        with self._lock:
+            self.counts[key] += 1
+
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    server: FakeGeminiServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        stream = ':streamGenerateContent' in self.path
+        if ':generateContent' not in self.path and not stream:
+            self._send(404, {'error': {'code': 404, 'message': 'Not found', 'status': 'NOT_FOUND'}})
+            return
+
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        parts = [part for content in request.get('contents', []) for part in content.get('parts', [])]
+        prompt = '\n'.join(part.get('text', '') for part in parts)
+
+        if any('inlineData' in part or 'inline_data' in part for part in parts):
+            kind = 'ocr'
+        elif prompt.startswith('Vygeneruj'):
+            kind = 'generate'
+        else:
+            kind = 'evaluate'
+
+        server = self.server
+        if server.rate_limit and server.roll() < server.rate_limit:
+            server.record('rate_limited')
+            self._send(429, {'error': {
+                'code': 429,
+                'message': 'Resource has been exhausted (e.g. check quota).',
+                'status': 'RESOURCE_EXHAUSTED',
+                'details': [{
+                    '@type': 'type.googleapis.com/google.rpc.RetryInfo',
+                    'retryDelay': f"{server.retry_delay:g}s"
+                }]
+            }})
+            return
+
+        latency = server.latency_ms.get(kind, 0) / 1000 * (1 + server.jitter * (2 * server.roll() - 1))
+        if not stream:
+            time.sleep(latency)
+        server.record(kind)
+
+        if kind == 'ocr':
+            text = server.ocr_text
+        elif kind == 'generate':
+            match = re.match(r'Vygeneruj (\d+)', prompt)
+            text = '\n'.join(server.sentences(int(match.group(1)) if match else 10))
+        elif request.get('generationConfig', {}).get('responseMimeType') == 'application/json':
+            text = json.dumps(DEFAULT_EVALUATION_JSON, ensure_ascii=False)
+        else:
+            text = server.evaluation_text
+
+        if stream:
+            self._send_stream(text, latency, len(prompt) // 4)
+            return
+
+        self._send(200, {
+            'candidates': [{
+                'content': {'parts': [{'text': text}], 'role': 'model'},
+                'finishReason': 'STOP',
+                'index': 0
+            }],
+            'usageMetadata': {'promptTokenCount': len(prompt) // 4, 'candidatesTokenCount': len(text) // 4}
+        })
+
+    def _send_stream(self, text: str, latency: float, prompt_tokens: int):
+        # Polovina latence do první části (čas do prvního tokenu), zbytek rovnoměrně po slovech
+        chunks = re.findall(r'\S+\s*|\s+', text) or ['']
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+        time.sleep(latency / 2)
+        for i, chunk in enumerate(chunks):
+            candidate = {'content': {'parts': [{'text': chunk}], 'role': 'model'}, 'index': 0}
+            if i == len(chunks) - 1:
+                candidate['finishReason'] = 'STOP'
+            payload = {'candidates': [candidate],
+                       'usageMetadata': {'promptTokenCount': prompt_tokens, 'candidatesTokenCount': i + 1}}
+            try:
+                self.wfile.write(f"data: {json.dumps(payload, ensure_ascii=False)}\r\n\r\n".encode('utf-8'))
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                return  # Klient stream zavřel
+            time.sleep(latency / 2 / len(chunks))
+
+    def _send(self, status: int, payload: dict):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Lokální náhrada Gemini API')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', default='', help='Latence podle druhu, např. generate=800,ocr=1500,evaluate=2000')
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='Podíl requestů, které dostanou 429 (0-1)')
+    parser.add_argument('--retry-delay', type=float, default=1.0, help='retryDelay v odpovědi 429 (s)')
+    args = parser.parse_args()
+
+    server = FakeGeminiServer(args.port, parse_latencies(args.latency_ms), args.rate_limit, args.retry_delay)
+    print(f"Fake Gemini API na {server.url} (GEMINI_BASE_URL={server.url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
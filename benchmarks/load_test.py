@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Jednoduchý zátěžový test HTTP endpointu
+
+Posílá requesty z více vláken po zadanou dobu a vypíše requests/sec
+a latence (p50/p95/p99). Slouží k porovnání vývojového serveru
+(python backend/app.py) a gunicornu (gunicorn -c backend/gunicorn_conf.py).
+
+Použití:
+    python benchmarks/load_test.py --url http://localhost:5000/api/health --concurrency 16 --duration 10
+    python benchmarks/load_test.py --url http://localhost:5000/api/generate --method POST \\
+        --json '{"grade": 3, "num_sentences": 5}'
+"""
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def run_load_test(url: str, method: str, body: bytes | None, concurrency: int, duration: float,
+                  headers: dict | None = None) -> dict:
+    """
+    Spustí zátěžový test a vrátí souhrnné statistiky.
+    
+    headers: hlavičky requestu (výchozí Content-Type: application/json, pokud je tělo)
+    """
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    if headers is None:
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+
+    def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            request = urllib.request.Request(url, data=body, method=method, headers=headers)
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=300) as response:
+                    response.read()
+                ok = True
+            except (urllib.error.URLError, OSError):
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    return {
+        'url': url,
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / wall, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Zátěžový test diktátOR API')
+    parser.add_argument('--url', default='http://localhost:5000/api/health')
+    parser.add_argument('--method', default='GET')
+    parser.add_argument('--json', default=None, help='JSON tělo requestu')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0, help='Délka testu v sekundách')
+    args = parser.parse_args()
+
+    body = json.dumps(json.loads(args.json)).encode('utf-8') if args.json else None
+    result = run_load_test(args.url, args.method.upper(), body, args.concurrency, args.duration)
+
+    print(f"{result['url']} (concurrency {result['concurrency']})")
+    print(f"  requests: {result['requests']}  errors: {result['errors']}")
+    print(f"  {result['rps']} req/s  p50 {result['p50_ms']} ms  p95 {result['p95_ms']} ms  p99 {result['p99_ms']} ms")
+
+
+if __name__ == '__main__':
+    main()
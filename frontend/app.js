@@ -6,6 +6,7 @@ let currentDictation = null;
 let currentImage = null;
 let rotation = 0;
 let originalImageData = null;
+let pages = [];  // Dříve vyfocené stránky vícestránkového diktátu
 
 // DOM Elements
 const generateBtn = document.getElementById('generate-btn');
@@ -30,6 +31,7 @@ const galleryInput = document.getElementById('gallery-input');
 const previewContainer = document.getElementById('preview-container');
 const previewCanvas = document.getElementById('preview-canvas');
 const rotateBtn = document.getElementById('rotate-btn');
+const addPageBtn = document.getElementById('add-page-btn');
 const evaluateBtn = document.getElementById('evaluate-btn');
 
 const evaluationLoading = document.getElementById('evaluation-loading');
@@ -46,6 +48,7 @@ galleryBtn.addEventListener('click', () => galleryInput.click());
 cameraInput.addEventListener('change', handleImageSelect);
 galleryInput.addEventListener('change', handleImageSelect);
 rotateBtn.addEventListener('click', handleRotate);
+addPageBtn.addEventListener('click', handleAddPage);
 evaluateBtn.addEventListener('click', handleEvaluate);
 newDictationBtn.addEventListener('click', resetApp);
 
@@ -91,7 +94,8 @@ async function handleGenerate() {
             body: JSON.stringify({
                 sentences: dictationData.sentences,
                 pause_duration: pauseDuration,
-                slow: true  // true = pomalá řeč pro lepší srozumitelnost
+                slow: true,  // true = pomalá řeč pro lepší srozumitelnost
+                stream: true  // přehrávání může začít dřív, než je celé audio hotové
             })
         });
 
@@ -196,6 +200,29 @@ function handleRotate() {
     drawImageOnCanvas(originalImageData, rotation);
 }
 
+function canvasToBlob() {
+    return new Promise(resolve => {
+        previewCanvas.toBlob(resolve, 'image/jpeg', 0.95);
+    });
+}
+
+// Vícestránkový diktát - aktuální stránka se odloží a vyfotí se další
+async function handleAddPage() {
+    if (!currentImage) return;
+
+    pages.push({
+        blob: await canvasToBlob(),
+        dataUrl: previewCanvas.toDataURL('image/jpeg', 0.9)
+    });
+
+    currentImage = null;
+    originalImageData = null;
+    cameraInput.value = '';
+    galleryInput.value = '';
+    previewContainer.classList.add('hidden');
+    showStatus(`Stránka ${pages.length} uložena, vyfoťte další stránku`, 'success');
+}
+
 async function handleEvaluate() {
     if (!currentImage || !currentDictation) return;
 
@@ -205,19 +232,24 @@ async function handleEvaluate() {
     newDictationBtn.classList.add('hidden');
 
     try {
-        // Převedení canvas na blob
-        const blob = await new Promise(resolve => {
-            previewCanvas.toBlob(resolve, 'image/jpeg', 0.95);
-        });
+        // Převedení canvas na blob (poslední stránka) za dříve přidané stránky
+        const allPages = pages.concat([{
+            blob: await canvasToBlob(),
+            dataUrl: previewCanvas.toDataURL('image/jpeg', 0.9)
+        }]);
 
-        // Upload obrázku
+        // Upload obrázků (všechny stránky v pořadí)
         const formData = new FormData();
-        formData.append('image', blob, 'dictation.jpg');
+        allPages.forEach((page, index) => {
+            formData.append('image', page.blob, `dictation_${index + 1}.jpg`);
+        });
         formData.append('original_text', currentDictation.full_text);
         formData.append('sentences', JSON.stringify(currentDictation.sentences));
         formData.append('audio_filename', currentDictation.audio_filename);
+        formData.append('grade', currentDictation.grade);
 
-        const response = await fetch(`${API_URL}/evaluate`, {
+        // Streamovaná varianta - OCR text a vyhodnocení se zobrazují průběžně
+        const response = await fetch(`${API_URL}/evaluate/stream`, {
             method: 'POST',
             body: formData
         });
@@ -226,7 +258,32 @@ async function handleEvaluate() {
             throw new Error('Chyba při vyhodnocení');
         }
 
-        const evaluation = await response.json();
+        let ocrText = '';
+        let evaluationText = '';
+        let partialStructured = null;
+        let evaluation = null;
+        await readEventStream(response, (event, data) => {
+            if (event === 'ocr') {
+                ocrText = data.ocr_text;
+                showStatus('Text přečten, vyhodnocuji...', 'info');
+                displayPartialResults(ocrText, evaluationText, partialStructured);
+            } else if (event === 'partial') {
+                partialStructured = data.structured;
+                displayPartialResults(ocrText, evaluationText, partialStructured);
+            } else if (event === 'delta') {
+                evaluationText += data.text;
+                displayPartialResults(ocrText, evaluationText, partialStructured);
+            } else if (event === 'result') {
+                evaluation = data;
+            } else if (event === 'error') {
+                throw new Error(data.error);
+            }
+        });
+
+        if (!evaluation) {
+            throw new Error('Vyhodnocení nebylo dokončeno');
+        }
+        pages = allPages;
         displayResults(evaluation);
 
     } catch (error) {
@@ -236,6 +293,62 @@ async function handleEvaluate() {
     }
 }
 
+async function readEventStream(response, onEvent) {
+    // Čtení server-sent events z odpovědi fetch (EventSource umí jen GET)
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const block = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = 'message';
+            let data = '';
+            block.split('\n').forEach(line => {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            });
+            if (data) onEvent(event, JSON.parse(data));
+        }
+    }
+}
+
+function displayPartialResults(ocrText, evaluationText, partialStructured) {
+    // Průběžné zobrazení během streamovaného vyhodnocení (bez skóre)
+    // partialStructured = dosud vygenerovaná pole strukturovaného vyhodnocení
+    let html = '<h3>Vyhodnocuji...</h3>';
+    if (ocrText) {
+        html += `
+            <div class="result-section">
+                <h4>Text přečtený z fotky (OCR):</h4>
+                <div class="text-box" style="background-color: #fff8dc;">${escapeHtml(ocrText)}</div>
+            </div>
+        `;
+    }
+    if (partialStructured || evaluationText) {
+        const formatted = partialStructured
+            ? formatStructuredEvaluation(partialStructured)
+            : formatEvaluationText(evaluationText);
+        html += `
+            <div class="result-section">
+                <h4>Vyhodnocení:</h4>
+                <div class="evaluation-text">${formatted}</div>
+            </div>
+        `;
+    }
+
+    evaluationLoading.classList.add('hidden');
+    results.classList.remove('hidden');
+    results.innerHTML = html;
+}
+
 function displayResults(evaluation) {
     evaluationLoading.classList.add('hidden');
     results.classList.remove('hidden');
@@ -253,12 +366,14 @@ function displayResults(evaluation) {
         </div>`;
     }
     
-    // Fotka diktátu
-    const imageDataUrl = previewCanvas.toDataURL('image/jpeg', 0.9);
+    // Fotka diktátu (všechny stránky)
+    const images = pages.map((page, index) =>
+        `<img src="${page.dataUrl}" alt="Vyfocený diktát - stránka ${index + 1}" style="max-width: 100%; border: 1px solid #ddd; border-radius: 4px; margin-top: 10px;">`
+    ).join('');
     html += `
         <div class="result-section">
             <h4>Vyfocený diktát:</h4>
-            <img src="${imageDataUrl}" alt="Vyfocený diktát" style="max-width: 100%; border: 1px solid #ddd; border-radius: 4px; margin-top: 10px;">
+            ${images}
         </div>
     `;
     
@@ -287,7 +402,7 @@ function displayResults(evaluation) {
         html += `
             <div class="result-section">
                 <h4>Vyhodnocení:</h4>
-                <div class="evaluation-text">${formatEvaluationText(evaluation.evaluation_text)}</div>
+                <div class="evaluation-text">${evaluation.structured ? formatStructuredEvaluation(evaluation.structured) : formatEvaluationText(evaluation.evaluation_text)}</div>
             </div>
         `;
     }
@@ -296,26 +411,12 @@ function displayResults(evaluation) {
     showStatus('Vyhodnocení dokončeno!', 'success');
 }
 
-function formatEvaluationText(text) {
-    // Formátování textu vyhodnocení s lepším zobrazením
-    let formatted = text
-        .replace(/HODNOCENÍ:/g, '<strong>📝 HODNOCENÍ:</strong>')
-        .replace(/CHYBY:/g, '<strong>❌ CHYBY:</strong>')
-        .replace(/POCHVALA:/g, '<strong>👍 POCHVALA:</strong>')
-        .replace(/DOPORUČENÍ:/g, '<strong>💡 DOPORUČENÍ:</strong>')
-        .replace(/SKÓRE:/g, '<strong>🎯 SKÓRE:</strong>');
-    
-    // Převod řádků na <br>
-    formatted = formatted.replace(/\n/g, '<br>');
-    
-    return formatted;
-}
-
 function resetApp() {
     currentDictation = null;
     currentImage = null;
     rotation = 0;
     originalImageData = null;
+    pages = [];
     
     cameraInput.value = '';
     galleryInput.value = '';
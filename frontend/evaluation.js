@@ -0,0 +1,76 @@
+// diktátOR - společné zobrazení vyhodnocení (app.js i predesle.js)
+
+const ERROR_CATEGORY_LABELS = {
+    spelling: 'pravopis',
+    diacritics: 'diakritika',
+    missing: 'chybějící slovo',
+    extra: 'slovo navíc',
+    case: 'velké/malé písmeno',
+    punctuation: 'interpunkce',
+    grammar: 'gramatika',
+    other: 'jiné'
+};
+
+function escapeHtml(value) {
+    // Texty z modelu a OCR se vkládají do innerHTML - vždy je escapujeme
+    return String(value ?? '')
+        .replace(/&/g, '&amp;')
+        .replace(/</g, '&lt;')
+        .replace(/>/g, '&gt;')
+        .replace(/"/g, '&quot;')
+        .replace(/'/g, '&#39;');
+}
+
+function formatEvaluationText(text) {
+    // Formátování textu vyhodnocení s lepším zobrazením
+    let formatted = escapeHtml(text)
+        .replace(/HODNOCENÍ:/g, '<strong>📝 HODNOCENÍ:</strong>')
+        .replace(/CHYBY:/g, '<strong>❌ CHYBY:</strong>')
+        .replace(/POCHVALA:/g, '<strong>👍 POCHVALA:</strong>')
+        .replace(/DOPORUČENÍ:/g, '<strong>💡 DOPORUČENÍ:</strong>')
+        .replace(/SKÓRE:/g, '<strong>🎯 SKÓRE:</strong>');
+    
+    // Převod řádků na <br>
+    formatted = formatted.replace(/\n/g, '<br>');
+    
+    return formatted;
+}
+
+function formatStructuredEvaluation(structured) {
+    // Strukturované vyhodnocení (JSON ze serveru) - chyby jako seznam, bez parsování textu
+    // Při streamování chodí i neúplný objekt - chybějící sekce se vynechají
+    const errors = (structured.errors || []).map(error => {
+        const expected = escapeHtml(error.expected);
+        const written = escapeHtml(error.written);
+        let detail;
+        if (!error.written) {
+            detail = `chybí „${expected}“`;
+        } else if (!error.expected) {
+            detail = `navíc „${written}“`;
+        } else {
+            detail = `„${written}“ místo „${expected}“`;
+        }
+        const sentence = error.sentence ? `věta ${escapeHtml(error.sentence)}: ` : '';
+        const label = error.category
+            ? ` <em>(${escapeHtml(ERROR_CATEGORY_LABELS[error.category] || error.category)})</em>`
+            : '';
+        const explanation = error.explanation ? ` - ${escapeHtml(error.explanation)}` : '';
+        return `<li>${sentence}${detail}${label}${explanation}</li>`;
+    }).join('');
+    
+    const section = (title, body) => `<div class="evaluation-section"><strong>${title}</strong>${body}</div>`;
+    const sections = [];
+    if (structured.summary !== undefined) {
+        sections.push(section('📝 HODNOCENÍ:', `<p>${escapeHtml(structured.summary)}</p>`));
+    }
+    if (structured.errors !== undefined) {
+        sections.push(section('❌ CHYBY:', errors ? `<ul>${errors}</ul>` : '<p>žádné chyby</p>'));
+    }
+    if (structured.praise !== undefined) {
+        sections.push(section('👍 POCHVALA:', `<p>${escapeHtml(structured.praise)}</p>`));
+    }
+    if (structured.recommendations !== undefined) {
+        sections.push(section('💡 DOPORUČENÍ:', `<p>${escapeHtml(structured.recommendations)}</p>`));
+    }
+    return sections.join('');
+}
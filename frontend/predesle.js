@@ -6,10 +6,18 @@ const loading = document.getElementById('loading');
 const evaluationsList = document.getElementById('evaluations-list');
 const noEvaluations = document.getElementById('no-evaluations');
 
+// Stav stránkování
+window.evaluationsData = [];
+let nextCursor = null;
+
 // Načtení a zobrazení předešlých diktátů
+// Seznam obsahuje jen souhrny (čas, skóre), detail se načítá až po kliknutí
 async function loadEvaluations() {
     try {
-        const response = await fetch(`${API_URL}/evaluations`);
+        const url = nextCursor
+            ? `${API_URL}/evaluations/summary?cursor=${encodeURIComponent(nextCursor)}`
+            : `${API_URL}/evaluations/summary`;
+        const response = await fetch(url);
         
         if (!response.ok) {
             throw new Error('Failed to load evaluations');
@@ -19,10 +27,13 @@ async function loadEvaluations() {
         
         loading.classList.add('hidden');
         
-        if (data.evaluations && data.evaluations.length > 0) {
-            // Uložíme data pro globální přístup
-            window.evaluationsData = data.evaluations;
-            displayEvaluations(data.evaluations);
+        const startIndex = window.evaluationsData.length;
+        const evaluations = data.evaluations || [];
+        window.evaluationsData.push(...evaluations);
+        nextCursor = data.next_cursor;
+        
+        if (window.evaluationsData.length > 0) {
+            displayEvaluations(evaluations, startIndex);
         } else {
             noEvaluations.classList.remove('hidden');
         }
@@ -38,8 +49,13 @@ async function loadEvaluations() {
     }
 }
 
-function displayEvaluations(evaluations) {
-    evaluationsList.innerHTML = evaluations.map((evaluation, index) => {
+function displayEvaluations(evaluations, startIndex) {
+    // Tlačítko pro další stránku vždy odstraníme a případně přidáme na konec
+    const moreButton = document.getElementById('load-more-btn');
+    if (moreButton) moreButton.remove();
+    
+    evaluationsList.insertAdjacentHTML('beforeend', evaluations.map((evaluation, offset) => {
+        const index = startIndex + offset;
         const timestamp = evaluation.timestamp || 'N/A';
         const date = new Date(timestamp);
         const dateStr = date.toLocaleString('cs-CZ');
@@ -64,13 +80,19 @@ function displayEvaluations(evaluations) {
                 <div class="evaluation-detail" id="detail-${index}" style="display: none; margin-top: 15px; padding-top: 15px; border-top: 1px solid #ddd;"></div>
             </div>
         `;
-    }).join('');
+    }).join(''));
+    
+    if (nextCursor) {
+        evaluationsList.insertAdjacentHTML('beforeend', `
+            <button id="load-more-btn" class="btn btn-primary" style="display: block; width: 100%; max-width: 400px; margin: 20px auto;"
+                    onclick="loadEvaluations()">Načíst starší diktáty</button>
+        `);
+    }
 }
 
 // Zobrazení detailu vyhodnocení po kliknutí
-function showEvaluationDetail(index) {
-    const evaluations = window.evaluationsData;
-    const evaluation = evaluations[index];
+async function showEvaluationDetail(index) {
+    const summary = window.evaluationsData[index];
     const detailDiv = document.getElementById(`detail-${index}`);
     
     // Pokud je detail již viditelný, skryjeme ho
@@ -79,7 +101,23 @@ function showEvaluationDetail(index) {
         return;
     }
     
-    // Jinak načteme a zobrazíme detail
+    // Jinak načteme a zobrazíme detail (jednou načtený detail si pamatujeme)
+    if (!summary.detail) {
+        try {
+            const response = await fetch(`${API_URL}/evaluations/${encodeURIComponent(summary.id)}`);
+            if (!response.ok) {
+                throw new Error('Failed to load evaluation');
+            }
+            summary.detail = await response.json();
+        } catch (error) {
+            console.error('Error loading evaluation detail:', error);
+            detailDiv.innerHTML = `<div class="status error">Chyba při načítání detailu: ${error.message}</div>`;
+            detailDiv.style.display = 'block';
+            return;
+        }
+    }
+    const evaluation = summary.detail;
+    
     let html = '';
     
     // Audio přehrávač
@@ -95,15 +133,17 @@ function showEvaluationDetail(index) {
         `;
     }
     
-    // Fotka
-    if (evaluation.image_filename) {
-        html += `
-            <div class="result-section" style="margin-bottom: 20px;">
-                <h4>Vyfocený diktát:</h4>
-                <img src="${API_URL}/uploads/${evaluation.image_filename}" 
+    // Fotka (u vícestránkového diktátu všechny stránky)
+    const imageFilenames = evaluation.image_filenames || (evaluation.image_filename ? [evaluation.image_filename] : []);
+    if (imageFilenames.length) {
+        const images = imageFilenames.map(filename => `
+                <img src="${API_URL}/uploads/${filename}" 
                      alt="Vyfocený diktát" 
                      style="max-width: 100%; border: 1px solid #ddd; border-radius: 4px; margin-top: 10px;"
-                     onerror="this.style.display='none';">
+                     onerror="this.style.display='none';">`).join('');
+        html += `
+            <div class="result-section" style="margin-bottom: 20px;">
+                <h4>Vyfocený diktát:</h4>${images}
             </div>
         `;
     }
@@ -138,7 +178,7 @@ function showEvaluationDetail(index) {
             <div class="result-section">
                 <h4>Vyhodnocení:</h4>
                 <div class="evaluation-text" style="line-height: 1.8; color: #333;">
-                    ${formatEvaluationText(evaluation.evaluation_text)}
+                    ${evaluation.structured ? formatStructuredEvaluation(evaluation.structured) : formatEvaluationText(evaluation.evaluation_text)}
                 </div>
             </div>
         `;
@@ -148,21 +188,6 @@ function showEvaluationDetail(index) {
     detailDiv.style.display = 'block';
 }
 
-function formatEvaluationText(text) {
-    // Formátování textu vyhodnocení s lepším zobrazením
-    let formatted = text
-        .replace(/HODNOCENÍ:/g, '<strong>📝 HODNOCENÍ:</strong>')
-        .replace(/CHYBY:/g, '<strong>❌ CHYBY:</strong>')
-        .replace(/POCHVALA:/g, '<strong>👍 POCHVALA:</strong>')
-        .replace(/DOPORUČENÍ:/g, '<strong>💡 DOPORUČENÍ:</strong>')
-        .replace(/SKÓRE:/g, '<strong>🎯 SKÓRE:</strong>');
-    
-    // Převod řádků na <br>
-    formatted = formatted.replace(/\n/g, '<br>');
-    
-    return formatted;
-}
-
 // Inicializace - načtení diktátů při načtení stránky
 console.log('Loading evaluations...');
 loadEvaluations();